@@ -3,21 +3,27 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import datetime
 import io
 import os
 import subprocess
 import sys
-from argparse import ArgumentParser
+import time
+from argparse import ArgumentParser, Namespace
 from builtins import dict
+from builtins import object
 from builtins import input
 from builtins import round
 from builtins import str
+from collections import OrderedDict
 from os import path
 
 from CaseInsensitiveDict import CaseInsensitiveDict
 from future import standard_library
 
-from cloudomate import wallet as wallet_util
+from cloudomate import monitor
+from cloudomate import renewal
+from cloudomate.exceptions.hoster_error import HosterException
 from cloudomate.hoster.vpn.azirevpn import AzireVpn
 from cloudomate.hoster.vps.blueangelhost import BlueAngelHost
 from cloudomate.hoster.vps.ccihosting import CCIHosting
@@ -25,7 +31,13 @@ from cloudomate.hoster.vps.crowncloud import CrownCloud
 from cloudomate.hoster.vps.linevast import LineVast
 from cloudomate.hoster.vps.pulseservers import Pulseservers
 from cloudomate.hoster.vps.undergroundprivate import UndergroundPrivate
-from cloudomate.util.fakeuserscraper import UserScraper
+from cloudomate.purchase_queue import PurchaseQueue, PurchaseWorkerPool, QueueFullError
+from cloudomate.server import CloudomateServer, CloudomateService
+from cloudomate.util import fakeuserscraper
+from cloudomate.util import fleet
+from cloudomate.util import output
+from cloudomate.util import pricing
+from cloudomate.util.instrumentation import get_profiler
 from cloudomate.util.settings import Settings
 from cloudomate.wallet import Wallet
 
@@ -38,6 +50,13 @@ def _map_providers_to_dict(provider_list):
 
 types = ["vps", "vpn"]
 
+# Command line arguments that override a setting, mapped to the key of the setting
+SETTING_ARGUMENTS = dict((key, key) for key in [
+    'email', 'firstname', 'lastname', 'companyname', 'phonenumber', 'password', 'address', 'city', 'state',
+    'countrycode', 'zipcode', 'ns1', 'ns2', 'hostname',
+])
+SETTING_ARGUMENTS['rootpw'] = 'root_password'
+
 providers = CaseInsensitiveDict({
     "vps": _map_providers_to_dict([
         BlueAngelHost,
@@ -54,14 +73,44 @@ providers = CaseInsensitiveDict({
 
 def execute(cmd=sys.argv[1:]):
     parser = ArgumentParser(description="Cloudomate")
+    parser.add_argument("--profile", action="store_true", help="Print the time spent on every hoster request")
+    parser.add_argument("--profile-trace", help="Save a trace of the hoster requests for chrome://tracing")
 
     subparsers = parser.add_subparsers(dest="type")
     add_vps_parsers(subparsers)
     add_vpn_parsers(subparsers)
+    add_parser_serve(subparsers)
+    add_parser_queue(subparsers)
+    add_parser_monitor(subparsers)
+    add_parser_renew(subparsers)
     subparsers.required = True
 
     args = parser.parse_args(cmd)
-    args.func(args)
+    try:
+        if args.profile or args.profile_trace:
+            _run_profiled(args)
+        else:
+            args.func(args)
+    except HosterException as e:
+        print(e, file=sys.stderr)
+        if e.retryable:
+            print("This error may be temporary, please try again later", file=sys.stderr)
+        sys.exit(2)
+
+
+def _run_profiled(args):
+    profiler = get_profiler()
+    profiler.enable()
+    try:
+        args.func(args)
+    finally:
+        profiler.disable()
+        if args.profile:
+            print()
+            profiler.print_summary()
+        if args.profile_trace:
+            profiler.export_trace(args.profile_trace)
+            print("Saved request trace to " + args.profile_trace)
 
 
 def add_vpn_parsers(subparsers):
@@ -93,9 +142,99 @@ def add_vps_parsers(subparsers):
     add_parser_info(vps_subparsers, "vps")
 
 
+def add_parser_serve(subparsers):
+    parser_serve = subparsers.add_parser("serve", help="Serve the commands as an HTTP/JSON API")
+    parser_serve.set_defaults(type="serve", func=serve)
+    parser_serve.add_argument("-c", "--config", help="Set custom config file")
+    parser_serve.add_argument("--host", help="The address to listen on", default="127.0.0.1")
+    parser_serve.add_argument("-p", "--port", help="The port to listen on", type=int, default=8000)
+    parser_serve.add_argument("-w", "--workers", help="The number of concurrent purchases", type=int, default=2)
+    parser_serve.add_argument("--db", help="The queue database file")
+    parser_serve.add_argument("--warm", action="store_true", help="Fetch all options and rates on startup")
+    parser_serve.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+
+
+def add_parser_queue(subparsers):
+    queue_parsers = subparsers.add_parser("queue", help="Manage queued purchases")
+    queue_parsers.set_defaults(type="queue")
+    queue_parsers.add_argument("--db", help="The queue database file")
+    queue_subparsers = queue_parsers.add_subparsers(dest="command")
+    queue_subparsers.required = True
+
+    parser_list = queue_subparsers.add_parser("list", help="List queued purchases")
+    parser_list.add_argument("-s", "--state", help="Only list purchases in this state")
+    parser_list.set_defaults(func=queue_list)
+
+    parser_retry = queue_subparsers.add_parser("retry", help="Queue a failed or interrupted purchase again")
+    parser_retry.add_argument("id", help="The id of the purchase")
+    parser_retry.set_defaults(func=queue_retry)
+
+    parser_work = queue_subparsers.add_parser("work", help="Perform the queued purchases")
+    parser_work.add_argument("-w", "--workers", help="The number of concurrent purchases", type=int, default=4)
+    parser_work.add_argument("--per-hoster", help="The number of concurrent purchases per hoster", type=int,
+                             default=1)
+    parser_work.add_argument("--wait", action="store_true", help="Keep waiting for new purchases when drained")
+    parser_work.set_defaults(func=queue_work)
+
+
+def add_parser_monitor(subparsers):
+    monitor_parsers = subparsers.add_parser("monitor", help="Monitor the usage and expiration of services")
+    monitor_parsers.set_defaults(type="monitor")
+    monitor_parsers.add_argument("--db", help="The usage history file")
+    monitor_subparsers = monitor_parsers.add_subparsers(dest="command")
+    monitor_subparsers.required = True
+
+    parser_run = monitor_subparsers.add_parser("run", help="Poll the status of services on a schedule")
+    parser_run.add_argument("services", nargs="+", metavar="type/provider",
+                            help="The services to monitor, e.g. vps/linevast")
+    parser_run.add_argument("-c", "--config", help="Set custom config file")
+    parser_run.add_argument("--interval", help="The number of seconds between two polls of a service", type=float,
+                            default=monitor.MONITOR_INTERVAL)
+    parser_run.add_argument("--bandwidth", help="Report services that used this fraction of their bandwidth",
+                            type=float, default=monitor.BANDWIDTH_THRESHOLD)
+    parser_run.add_argument("--expiry-days", help="Report services that expire within this number of days",
+                            type=float, default=monitor.EXPIRY_DAYS)
+    parser_run.add_argument("--once", action="store_true", help="Poll once instead of continuously")
+    parser_run.set_defaults(func=monitor_run)
+    _add_identity_argument(parser_run)
+    _add_format_argument(parser_run)
+
+    parser_history = monitor_subparsers.add_parser("history", help="Show the stored samples")
+    parser_history.add_argument("service", nargs="?", metavar="type/provider", help="Only show this service")
+    parser_history.add_argument("--since", help="Only show the samples of the last number of hours", type=float)
+    parser_history.set_defaults(func=monitor_history)
+    _add_format_argument(parser_history)
+
+
+def add_parser_renew(subparsers):
+    parser_renew = subparsers.add_parser("renew", help="Pay the renewal invoices of services before they expire")
+    parser_renew.set_defaults(type="renew", func=renew)
+    parser_renew.add_argument("services", nargs="+", metavar="type/provider",
+                              help="The services to renew, e.g. vps/linevast")
+    parser_renew.add_argument("-c", "--config", help="Set custom config file")
+    parser_renew.add_argument("--days", help="Renew services this number of days before they expire", type=float,
+                              default=renewal.RENEWAL_DAYS)
+    parser_renew.add_argument("--retry", help="The number of seconds after which a renewal that did not extend "
+                                              "the service is retried", type=float, default=renewal.RETRY_INTERVAL)
+    parser_renew.add_argument("--once", action="store_true",
+                              help="Only renew the services that are due now instead of waiting for the others")
+    _add_identity_argument(parser_renew)
+    _add_format_argument(parser_renew)
+
+
 def add_parser_list(subparsers, provider_type):
     parser_list = subparsers.add_parser("list", help="List %s providers" % provider_type.upper())
     parser_list.set_defaults(func=list_providers)
+    _add_format_argument(parser_list)
+
+
+def _add_identity_argument(parser):
+    parser.add_argument("-i", "--identity", help="Use the settings of a named profile, e.g. alice for [user@alice]")
+
+
+def _add_format_argument(parser):
+    parser.add_argument("--format", help="The output format, ndjson rows are written as soon as they are ready",
+                        choices=output.FORMATS, default=output.TEXT)
 
 
 def add_parser_options(subparsers, provider_type):
@@ -103,6 +242,7 @@ def add_parser_options(subparsers, provider_type):
     parser_options.add_argument("provider", help="The specified %s provider" % provider_type.upper(),
                                 choices=providers[provider_type])
     parser_options.set_defaults(func=options)
+    _add_format_argument(parser_options)
 
 
 def add_parser_purchase(subparsers, provider_type):
@@ -124,6 +264,14 @@ def add_parser_purchase(subparsers, provider_type):
     parser_purchase.add_argument("-cc", "--countrycode", help="country code")
     parser_purchase.add_argument("-z", "--zipcode", help="zipcode")
     parser_purchase.add_argument("--randomuser", action="store_true", help="Use random user info")
+    parser_purchase.add_argument("--randomuser-source", help="Generate the random user info offline or scrape it "
+                                                             "from fakeaddressgenerator.com",
+                                 choices=fakeuserscraper.SOURCES, default=fakeuserscraper.OFFLINE)
+    parser_purchase.add_argument("--queue", action="store_true", help="Queue the purchase instead of performing it")
+    parser_purchase.add_argument("--key", help="Idempotency key of the queued purchase")
+    parser_purchase.add_argument("--purchase-id", help="Identifier of the purchase: a failed purchase run again with "
+                                                       "the same identifier resumes, even with --randomuser")
+    _add_identity_argument(parser_purchase)
 
     if provider_type == 'vps':
         parser_purchase.add_argument("option", help="The %s option number (see options)" % provider_type.upper(),
@@ -140,6 +288,8 @@ def add_parser_status(subparsers, provider_type):
     parser_status.add_argument("-e", "--email", help="The login email address")
     parser_status.add_argument("-pw", "--password", help="The login password")
     parser_status.set_defaults(func=status)
+    _add_identity_argument(parser_status)
+    _add_format_argument(parser_status)
 
 
 def add_parser_vps_get_ip(subparsers):
@@ -149,6 +299,8 @@ def add_parser_vps_get_ip(subparsers):
     parser_get_ip.add_argument("-e", "--email", help="The login email address")
     parser_get_ip.add_argument("-pw", "--password", help="The login password")
     parser_get_ip.set_defaults(func=print_ip)
+    _add_identity_argument(parser_get_ip)
+    _add_format_argument(parser_get_ip)
 
 
 def add_parser_vps_ssh(subparsers):
@@ -159,7 +311,10 @@ def add_parser_vps_ssh(subparsers):
     parser_ssh.add_argument("-pw", "--password", help="The login password")
     parser_ssh.add_argument("-p", "--rootpw", help="The root password used to login")
     parser_ssh.add_argument("-u", "--user", help="The user password used to login", default="root")
+    parser_ssh.add_argument("--command", help="Run a command instead of an interactive shell")
     parser_ssh.set_defaults(func=ssh)
+    _add_identity_argument(parser_ssh)
+    _add_fleet_arguments(parser_ssh)
 
 
 def add_parser_info(subparsers, provider_type):
@@ -175,6 +330,8 @@ def add_parser_info(subparsers, provider_type):
         parser_info.add_argument("-o", "--ovpn", help="Save the ovpn file to the specified location")
 
     parser_info.set_defaults(func=info)
+    _add_identity_argument(parser_info)
+    _add_format_argument(parser_info)
 
 
 def add_parser_vps_setrootpw(subparsers):
@@ -184,27 +341,155 @@ def add_parser_vps_setrootpw(subparsers):
     parser_setrootpw.add_argument("-n", "--number", help="The number of the VPS service to change the password for")
     parser_setrootpw.add_argument("-e", "--email", help="The login email address")
     parser_setrootpw.add_argument("-pw", "--password", help="The login password")
-    parser_setrootpw.set_defaults(func=change_root_password_ssh)
+    parser_setrootpw.set_defaults(func=change_root_password_ssh, user='root')
+    _add_identity_argument(parser_setrootpw)
+    _add_fleet_arguments(parser_setrootpw)
 
 
-def print_ip(args):
-    provider = _get_provider(args)
-    name, _ = provider.get_metadata()
-    user_settings = _get_user_settings(args, name)
+def _add_fleet_arguments(parser):
+    parser.add_argument("--all", action="store_true", help="Run on all active services at once")
+    parser.add_argument("-w", "--workers", help="The number of concurrent SSH connections", type=int,
+                        default=fleet.SSH_WORKERS)
+    _add_format_argument(parser)
+
+
+def serve(args):
+    service = CloudomateService(providers, config=args.config, workers=args.workers, queue=PurchaseQueue(args.db))
+    server = CloudomateServer(service, args.host, args.port, verbose=args.verbose).start()
+    if args.warm:
+        service.warm()
+    print("Serving cloudomate at " + server.base_url)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+def queue_list(args):
+    row = "{:34}{:12}{:18}{:8}{:14}{}"
+    print(row.format("Id", "Type", "Provider", "Option", "State", "Result"))
+    for job in PurchaseQueue(args.db).list(args.state):
+        print(row.format(job.id, job.provider_type, job.provider, str(job.option), job.state,
+                         job.result or job.error or ""))
+
+
+def queue_retry(args):
+    try:
+        PurchaseQueue(args.db).retry(args.id)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+
 
-    provider_instance = provider(user_settings)
-    configuration = provider_instance.get_configuration()
-    print(configuration.ip)
+def queue_work(args):
+    pool = PurchaseWorkerPool(PurchaseQueue(args.db), providers, _register, workers=args.workers,
+                              per_hoster=args.per_hoster)
+    pool.run(drain=not args.wait)
+
+
+def monitor_run(args):
+    user_settings = _get_user_settings(args)
+    targets = {}
+    for service in args.services:
+        provider_type, _, name = service.partition('/')
+        provider = _get_provider(Namespace(type=provider_type, provider=name))
+        targets[_monitor_key(provider_type, name, args.identity)] = provider(user_settings)
+
+    writer = output.get_writer(args.format) if _is_structured(args) else None
+
+    def on_event(event):
+        if writer is not None:
+            writer.write(event)
+        else:
+            print("[{}] {}".format(event.key, event.message))
+
+    usage_monitor = monitor.UsageMonitor(targets, monitor.UsageStore(args.db), interval=args.interval,
+                                         bandwidth_threshold=args.bandwidth, expiry_days=args.expiry_days,
+                                         on_event=on_event)
+    try:
+        usage_monitor.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def renew(args):
+    user_settings = _get_user_settings(args)
+    targets = {}
+    for service in args.services:
+        provider_type, _, name = service.partition('/')
+        provider = _get_provider(Namespace(type=provider_type, provider=name))
+        if not provider.supports_renewal:
+            print("Renewing services of {} is not supported".format(provider.get_metadata()[0]), file=sys.stderr)
+            sys.exit(2)
+        targets[_monitor_key(provider_type, name, args.identity)] = provider(user_settings)
+
+    writer = output.get_writer(args.format) if _is_structured(args) else None
+
+    def on_renewal(event):
+        if writer is not None:
+            writer.write(event)
+        else:
+            print("[{}] Paid invoice(s) {}, next renewal at {}".format(
+                event.key, ', '.join(sorted(event.invoices)), _format_timestamp(event.next_due)))
+
+    scheduler = renewal.RenewalScheduler(targets, _get_wallet(user_settings), renewal_days=args.days,
+                                         retry_interval=args.retry, on_renewal=on_renewal)
+    try:
+        scheduler.run(once=args.once)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _monitor_key(provider_type, provider, identity=None):
+    key = '{}/{}'.format(provider_type, provider.lower())
+    return key + '@' + identity if identity else key
+
+
+def monitor_history(args):
+    since = time.time() - args.since * 60 * 60 if args.since is not None else None
+    samples = monitor.UsageStore(args.db).history(args.service.lower() if args.service else None, since)
+    rows = (OrderedDict([('key', sample.key), ('timestamp', sample.timestamp)] + sorted(sample.values.items()))
+            for sample in samples)
+    if _is_structured(args):
+        _write_rows(args, rows)
+        return
+    for row in rows:
+        print("{:24}{:22}{}".format(row.pop('key'), _format_timestamp(row.pop('timestamp')),
+                                    ' '.join('{}={}'.format(name, value) for name, value in row.items())))
+
+
+def _format_timestamp(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def print_ip(args):
+    configuration = CommandContext.of(args).get_configuration()
+    if _is_structured(args):
+        _write_rows(args, [OrderedDict([('ip', configuration.ip)])], single=True)
+    else:
+        print(configuration.ip)
 
 
 def info(args):
-    provider = _get_provider(args)
-    name, _ = provider.get_metadata()
-    user_settings = _get_user_settings(args, name)
+    if _is_structured(args) and getattr(args, 'ovpn', None):
+        print("--ovpn saves the configuration as a file and cannot be combined with --format {}".format(args.format),
+              file=sys.stderr)
+        sys.exit(2)
 
-    config = provider(user_settings).get_configuration()
+    context = CommandContext.of(args)
+    name = context.name
+    config = context.get_configuration()
 
-    if args.type == "vps":
+    if _is_structured(args):
+        _write_rows(args, [config], single=True)
+    elif args.type == "vps":
         print(("Info for " + name))
         _print_info_vps(config)
     elif args.type == "vpn":
@@ -216,14 +501,14 @@ def info(args):
 
 
 def status(args):
-    provider = _get_provider(args)
-    name, _ = provider.get_metadata()
-    print(("Getting status for %s." % name))
-    user_settings = _get_user_settings(args, name)
-    p = provider(user_settings)
-    s = p.get_status()
-
-    if args.type == "vps":
+    context = CommandContext.of(args)
+    if not _is_structured(args):
+        print(("Getting status for %s." % context.name))
+    s = context.hoster.get_status()
+
+    if _is_structured(args):
+        _write_rows(args, [s], single=True)
+    elif args.type == "vps":
         # If we don't currently support usage statistics for this provider
         if s.memory.used == -1.0:
             row = "{:20}" * 2
@@ -246,9 +531,11 @@ def status(args):
 
 
 def options(args):
-    provider = _get_provider(args)
+    provider = CommandContext.of(args).provider
 
-    if args.type == "vps":
+    if _is_structured(args):
+        _write_rows(args, _option_rows(provider))
+    elif args.type == "vps":
         _options_vps(provider)
     elif args.type == "vpn":
         _options_vpn(provider)
@@ -257,29 +544,29 @@ def options(args):
 def purchase(args):
     if "provider" not in vars(args):
         sys.exit(2)
-    provider = _get_provider(args)
-    name, _ = provider.get_metadata()
-    user_settings = _get_user_settings(args, name)
+    context = CommandContext.of(args)
 
     if args.randomuser:
-        _merge_random_user_data(user_settings)
+        _merge_random_user_data(context.settings, args.randomuser_source)
+        if not getattr(args, 'purchase_id', None) and not getattr(args, 'queue', False):
+            print("Pass --purchase-id to be able to resume this purchase if it fails", file=sys.stderr)
 
-    if not _check_provider(provider, user_settings):
+    if not _check_provider(context.provider, context.settings):
         print("Missing option")
         sys.exit(2)
 
     if args.type == 'vps':
-        _purchase_vps(provider, user_settings, args)
+        _purchase_vps(context)
     else:
-        _purchase_vpn(provider, user_settings, args)
+        _purchase_vpn(context)
 
 
 def _check_provider(provider, config):
     return config.verify_options(provider.get_required_settings())
 
 
-def _merge_random_user_data(user_settings):
-    usergenerator = UserScraper()
+def _merge_random_user_data(user_settings, source=fakeuserscraper.OFFLINE):
+    usergenerator = fakeuserscraper.get_user_source(source)
     randomuser = usergenerator.get_user()
     for section in randomuser.keys():
         for key in randomuser[section].keys():
@@ -292,19 +579,26 @@ def _get_user_settings(args, provider=None):
         user_settings.read_settings(filename=args.config)
     else:
         user_settings.read_settings()
+    identity = vars(args).get('identity')
+    if identity:
+        if identity not in user_settings.get_profile_names():
+            print("Profile '{}' does not exist in the config".format(identity), file=sys.stderr)
+            sys.exit(2)
+        user_settings = user_settings.for_profile(identity)
     _merge_arguments(user_settings, provider, vars(args))
     return user_settings
 
 
 def _merge_arguments(config, provider, args):
     for key in args:
-        if args[key] is not None:
-            config.put(provider, key, args[key])
+        if key in SETTING_ARGUMENTS and args[key] is not None:
+            config.put(provider, SETTING_ARGUMENTS[key], args[key])
 
 
-def _purchase_vps(provider, user_settings, args):
+def _purchase_vps(context):
+    args = context.args
     vps_option = args.option
-    configurations = provider.get_options()
+    configurations = context.provider.get_options()
     if not 0 <= vps_option < len(configurations):
         print(('Specified configuration %s is not in range 0-%s' % (vps_option, len(configurations))))
         sys.exit(1)
@@ -321,20 +615,15 @@ def _purchase_vps(provider, user_settings, args):
         str(bandwidth),
         str(vps_option.price))))
 
-    if args.noconfirm or (
-            user_settings.has_key('client', 'noconfirm') and user_settings.get('client', "noconfirm") == "1"):
-        choice = True
-    else:
-        choice = _confirmation("Purchase this option?", default="no")
-    if choice:
-        _register(provider, vps_option, user_settings)
+    if _confirmed(context):
+        _purchase_or_enqueue(context, args.option, vps_option)
     else:
         return False
 
 
-def _purchase_vpn(provider, user_settings, args):
+def _purchase_vpn(context):
     print("Selected configuration:")
-    options = provider.get_options()
+    options = context.provider.get_options()
     option = options[0]
 
     row = "{:18}" * 5
@@ -343,18 +632,35 @@ def _purchase_vpn(provider, user_settings, args):
     speed = "Unlimited" if option.speed == sys.maxsize else option.speed
     print(row.format(option.name, option.protocol, bandwidth, speed, str(option.price)))
 
-    if args.noconfirm or (
-            user_settings.has_key('client', 'noconfirm') and user_settings.get('client', "noconfirm") == "1"):
-        choice = True
-    else:
-        choice = _confirmation("Purchase this option?", default="no")
-
-    if choice:
-        _register(provider, options[0], user_settings)
+    if _confirmed(context):
+        _purchase_or_enqueue(context, 0, option)
     else:
         return False
 
 
+def _confirmed(context):
+    settings = context.settings
+    if context.args.noconfirm or (
+            settings.has_key('client', 'noconfirm') and settings.get('client', "noconfirm") == "1"):
+        return True
+    return _confirmation("Purchase this option?", default="no")
+
+
+def _purchase_or_enqueue(context, index, option):
+    args = context.args
+    if not getattr(args, 'queue', False):
+        return context.hoster.purchase(_get_wallet(context.settings), option,
+                                       purchase_id=getattr(args, 'purchase_id', None))
+
+    try:
+        job = PurchaseQueue().submit(args.type, args.provider, index, context.settings, option_name=option.name,
+                                     idempotency_key=args.key)
+    except QueueFullError as e:
+        print(e)
+        sys.exit(2)
+    print("Queued purchase {} ({})".format(job.id, job.state))
+
+
 def _confirmation(message, default="y"):
     valid_options = {"yes": True, "ye": True, "y": True, "no": False, "n": False}
     if default in valid_options and valid_options[default] is True:
@@ -377,7 +683,40 @@ def _confirmation(message, default="y"):
 
 
 def list_providers(args):
-    _list_providers(args.type)
+    if _is_structured(args):
+        _write_rows(args, _provider_rows(args.type))
+    else:
+        _list_providers(args.type)
+
+
+def _is_structured(args):
+    return getattr(args, 'format', output.TEXT) != output.TEXT
+
+
+def _write_rows(args, rows, single=False):
+    writer = output.get_writer(args.format, single=single)
+    for row in rows:
+        writer.write(row)
+    writer.close()
+
+
+def _provider_rows(provider_type):
+    for key, provider in providers[provider_type].items():
+        name, website = provider.get_metadata()
+        yield OrderedDict([('provider', key), ('name', name), ('website', website)])
+
+
+def _option_rows(provider):
+    options = provider.get_options()
+    estimates = pricing.estimate_option_prices(options, provider.get_gateway())
+    for i, (option, estimate) in enumerate(zip(options, estimates)):
+        row = OrderedDict([('number', i)])
+        row.update(output.to_json(option))
+        for key in ('bandwidth', 'speed'):
+            if row.get(key) == sys.maxsize:
+                row[key] = None  # Unlimited
+        row['estimated_mbtc'] = round(estimate.mbtc, 5)
+        yield row
 
 
 def _print_unknown_provider(provider):
@@ -417,15 +756,12 @@ def _options_vps(p):
     print(row.format("#", "Name", "Cores", "Memory (GB)", "Storage (GB)", "Bandwidth", "Connection (Gbit/s)",
                      "Est. Price (mBTC)", "Price (USD)"))
 
-    for i, option in enumerate(options):
-        bandwidth = "Unlimited" if option.bandwidth == sys.maxsize else str(option.bandwidth)
+    # Calculate the estimated prices of all options at once
+    estimates = pricing.estimate_option_prices(options, p.get_gateway())
 
-        # Calculate the estimated price
-        rate = wallet_util.get_rate("USD")
-        fee = wallet_util.get_network_fee()
-        gateway = p.get_gateway()
-        estimate = gateway.estimate_price(option.price * rate) + fee  # BTC
-        estimate = round(1000 * estimate, 2)  # mBTC
+    for i, (option, estimate) in enumerate(zip(options, estimates)):
+        bandwidth = "Unlimited" if option.bandwidth == sys.maxsize else str(option.bandwidth)
+        estimate = round(estimate.mbtc, 2)  # mBTC
 
         print(row.format(i, option.name, str(option.cores), str(option.memory), str(option.storage), bandwidth,
                          str(option.connection), str(estimate), str(option.price)))
@@ -440,30 +776,82 @@ def _options_vpn(provider):
     row = "{:18}" * 6
     print(row.format("Name", "Protocol", "Bandwidth", "Speed", "Est. Price (mBTC)", "Price (USD)"))
 
-    for option in options:
+    # Calculate the estimated prices of all options at once
+    estimates = pricing.estimate_option_prices(options, provider.get_gateway())
+
+    for option, estimate in zip(options, estimates):
         bandwidth = "Unlimited" if option.bandwidth == sys.maxsize else str(option.bandwidth)
         speed = "Unlimited" if option.speed == sys.maxsize else option.speed
-
-        # Calculate the estimated price
-        rate = wallet_util.get_rate("USD")
-        fee = wallet_util.get_network_fee()
-        gateway = provider.get_gateway()
-        estimate = gateway.estimate_price(option.price * rate) + fee  # BTC
-        estimate = round(1000 * estimate, 2)  # mBTC
+        estimate = round(estimate.mbtc, 2)  # mBTC
 
         print(row.format(option.name, option.protocol, bandwidth, speed, str(estimate), str(option.price)))
 
 
 def _register(provider, vps_option, settings):
+    provider_instance = provider(settings)
+    return provider_instance.purchase(_get_wallet(settings), vps_option)
+
+
+def _get_wallet(settings):
     # For now use standard wallet implementation through Electrum
     # If wallet path is defined in config, use that.
     if settings.has_key('client', 'walletpath'):
-        wallet = Wallet(wallet_path=settings.get('client', 'walletpath'))
-    else:
-        wallet = Wallet()
-
-    provider_instance = provider(settings)
-    provider_instance.purchase(wallet, vps_option)
+        return Wallet(wallet_path=settings.get('client', 'walletpath'))
+    return Wallet()
+
+
+class CommandContext(object):
+    """
+    CommandContext holds what a command needs beyond its arguments. It is built once per invocation and
+    shared by the helpers of the command, so that the settings are read, and the hoster logs in, only once.
+    The provider is resolved when the context is built, the settings, the hoster instance and its
+    configuration on first use.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.provider = _get_provider(args)
+        self._settings = None
+        self._hoster = None
+        self._configuration = None
+        self._configurations = None
+
+    @staticmethod
+    def of(args):
+        """
+        Get the context of the invocation, creating it on first use
+        """
+        context = getattr(args, 'context', None)
+        if context is None:
+            context = args.context = CommandContext(args)
+        return context
+
+    @property
+    def name(self):
+        name, _ = self.provider.get_metadata()
+        return name
+
+    @property
+    def settings(self):
+        if self._settings is None:
+            self._settings = _get_user_settings(self.args, self.name)
+        return self._settings
+
+    @property
+    def hoster(self):
+        if self._hoster is None:
+            self._hoster = self.provider(self.settings)
+        return self._hoster
+
+    def get_configuration(self):
+        if self._configuration is None:
+            self._configuration = self.hoster.get_configuration()
+        return self._configuration
+
+    def get_configurations(self):
+        if self._configurations is None:
+            self._configurations = self.hoster.get_configurations()
+        return self._configurations
 
 
 def _get_provider(args):
@@ -481,38 +869,72 @@ def _get_provider(args):
     return providers[provider_type][provider]
 
 
-def ssh(args, command=None):
-    provider = _get_provider(args)
-    name, _ = provider.get_metadata()
-    user_settings = _get_user_settings(args, name)
-    config = provider(user_settings).get_configuration()
+def ssh(args):
+    context = CommandContext.of(args)
+
+    if args.all:
+        if not args.command:
+            print("A command is required to run on all services", file=sys.stderr)
+            sys.exit(2)
+        if not _run_fleet(args, context.get_configurations(), args.command):
+            sys.exit(2)
+        return
+
+    config = context.get_configuration()
     commandline = ['sshpass', '-p', config.root_password, 'ssh', '-o', 'StrictHostKeyChecking=no',
-                   'root@' + config.ip]
+                   args.user + '@' + config.ip]
 
-    if command:
-        commandline.append(command)
+    if args.command:
+        commandline.append(args.command)
 
     try:
         subprocess.call(commandline)
-        return True
     except OSError as e:
         print(e)
         print('Install sshpass to use this command')
-        return False
+        sys.exit(2)
 
 
 def change_root_password_ssh(args):
-    if ssh(args, 'echo "root:' + args.root_password + '" | chpasswd'):
-        provider = _get_provider(args)
-        name, _ = provider.get_metadata()
-        user_settings = _get_user_settings(args, name)
-        user_settings.put("server", "root_password", args.root_password)
-        user_settings.save_settings()
-        print("Successfully set new root password in the config")
-    else:
-        print("Failed to set the new root password")
+    context = CommandContext.of(args)
+    configurations = context.get_configurations() if args.all else [context.get_configuration()]
+
+    succeeded = _run_fleet(args, configurations, 'echo "root:' + args.root_password + '" | chpasswd')
+    succeeded_ips = set(result.ip for result in succeeded)
+    failed = [config.ip for config in configurations if config.ip not in succeeded_ips]
+    if failed:
+        # The config holds one password for all services, so it is kept while any service has the old one
+        print("Failed to set the new root password on {} of {} services: {}".format(
+            len(failed), len(configurations), ', '.join(failed)), file=sys.stderr)
+        print("The root password in the config was not changed", file=sys.stderr)
         sys.exit(2)
 
+    context.settings.put("server", "root_password", args.root_password)
+    context.settings.save_settings()
+    print("Successfully set new root password in the config", file=sys.stderr)
+
+
+def _run_fleet(args, configurations, command):
+    """
+    Run a command on the services of the configurations and print the results
+    :return: the results of the services on which the command succeeded
+    """
+    targets = [fleet.SshTarget(config.ip, config.root_password, args.user) for config in configurations]
+    with fleet.SshFleet(workers=args.workers) as ssh_fleet:
+        results = ssh_fleet.run(targets, command)
+
+    if _is_structured(args):
+        _write_rows(args, results)
+    else:
+        for result in results:
+            print("[{}] {}".format(result.ip, 'failed to run ssh' if result.exit_code is None
+                                   else 'exit code {}'.format(result.exit_code)))
+            if result.output.strip():
+                print(result.output.rstrip())
+        if any(result.exit_code is None for result in results):
+            print('Install sshpass to use this command')
+    return [result for result in results if result.exit_code == 0]
+
 
 def _print_info_vps(info):
     row = "{:18}" * 2
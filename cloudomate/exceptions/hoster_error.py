@@ -0,0 +1,61 @@
+class HosterException(Exception):
+    """Base class of the exceptions raised when an action on a hoster fails.
+
+    Retryable exceptions are caused by conditions that may be gone on a later attempt, such as an overloaded
+    website. Fatal exceptions need a change of the settings or the option before trying again.
+    """
+    retryable = False
+
+    def __init__(self, msg, hoster=None):
+        super(HosterException, self).__init__(msg)
+        self.hoster = hoster
+
+
+class RetryableHosterException(HosterException):
+    """Exception raised when an action on a hoster failed, but may succeed when retried."""
+    retryable = True
+
+
+class FatalHosterException(HosterException):
+    """Exception raised when an action on a hoster failed and will fail again when retried."""
+    retryable = False
+
+
+class HosterUnavailableException(RetryableHosterException):
+    """Exception raised when the website of a hoster is down or overloaded."""
+
+    def __init__(self, url, status_code, hoster=None):
+        msg = "Hoster unavailable: '{}' responded with status {}".format(url, status_code)
+        super(HosterUnavailableException, self).__init__(msg, hoster)
+        self.url = url
+        self.status_code = status_code
+
+
+class LoginException(FatalHosterException):
+    """Exception raised when logging in to the control panel of a hoster fails."""
+
+
+class RegistrationException(FatalHosterException):
+    """Exception raised when registering an account at a hoster fails."""
+
+
+class CheckoutException(FatalHosterException):
+    """Exception raised when a hoster rejects the user details entered during checkout."""
+
+
+class SolusvmApiException(FatalHosterException):
+    """Exception raised when the SolusVM client API of a hoster rejects a request, e.g. for a wrong key."""
+
+
+class PaymentException(RetryableHosterException):
+    """Exception raised when the wallet did not pay an invoice, e.g. for lack of funds or a failed broadcast."""
+
+
+class CircuitOpenException(RetryableHosterException):
+    """Exception raised without contacting a hoster that failed repeatedly in the recent past."""
+
+    def __init__(self, host, retry_in, hoster=None):
+        msg = "Hoster unavailable: '{}' failed repeatedly, retrying in {:.0f} seconds".format(host, retry_in)
+        super(CircuitOpenException, self).__init__(msg, hoster)
+        self.host = host
+        self.retry_in = retry_in
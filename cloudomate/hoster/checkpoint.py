@@ -0,0 +1,117 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import json
+import os
+import time
+from builtins import object
+from builtins import open
+from builtins import str
+
+from appdirs import user_data_dir
+from future import standard_library
+
+standard_library.install_aliases()
+
+CHECKPOINT_MAX_AGE = 24 * 60 * 60  # Cookies and carts of older checkpoints have most likely expired
+
+
+def get_checkpoint_dir():
+    return os.path.join(user_data_dir('cloudomate'), 'checkpoints')
+
+
+def checkpoint_path(directory, *key):
+    """
+    Get the path of the checkpoint file for a purchase
+    :param directory: the directory containing the checkpoints
+    :param key: values identifying the purchase, e.g. hoster name, user and option
+    :return: path of the checkpoint file
+    """
+    digest = hashlib.sha1('\n'.join(str(part) for part in key).encode('utf-8')).hexdigest()
+    return os.path.join(directory, digest + '.json')
+
+
+class PurchaseCheckpoint(object):
+    """
+    PurchaseCheckpoint persists the progress of a purchase after every completed step: the names of the
+    completed steps, the cookies of the browser (which hold the cart), the last url and step data such as
+    the invoice url. A retried purchase restores it and continues at the step that failed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.completed = []
+        self.cookies = []
+        self.url = None
+        self.data = {}
+        self.updated = None
+
+    @classmethod
+    def load(cls, path, max_age=CHECKPOINT_MAX_AGE):
+        """
+        Load the checkpoint at path, or return an empty checkpoint if there is none or it is too old
+        """
+        checkpoint = cls(path)
+        if not os.path.exists(path):
+            return checkpoint
+
+        with open(path, 'r', encoding='utf-8') as checkpoint_file:
+            stored = json.load(checkpoint_file)
+        if time.time() - stored['updated'] > max_age:
+            checkpoint.delete()
+            return checkpoint
+
+        checkpoint.completed = stored['completed']
+        checkpoint.cookies = stored['cookies']
+        checkpoint.url = stored['url']
+        checkpoint.data = stored['data']
+        checkpoint.updated = stored['updated']
+        return checkpoint
+
+    def is_completed(self, step):
+        return step in self.completed
+
+    def restore(self, browser):
+        """
+        Put the stored cookies back into a browser
+        """
+        for cookie in self.cookies:
+            browser.session.cookies.set(cookie['name'], cookie['value'], domain=cookie['domain'],
+                                        path=cookie['path'], secure=cookie['secure'], expires=cookie['expires'])
+
+    def complete(self, step, browser):
+        """
+        Mark a step as completed and save the state of the browser
+        """
+        self.completed.append(step)
+        self.cookies = [{
+            'name': cookie.name,
+            'value': cookie.value,
+            'domain': cookie.domain,
+            'path': cookie.path,
+            'secure': cookie.secure,
+            'expires': cookie.expires,
+        } for cookie in browser.session.cookies]
+        self.url = browser.get_url()
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.updated = time.time()
+        with open(self.path, 'w', encoding='utf-8') as checkpoint_file:
+            checkpoint_file.write(json.dumps({
+                'completed': self.completed,
+                'cookies': self.cookies,
+                'url': self.url,
+                'data': self.data,
+                'updated': self.updated,
+            }))
+
+    def delete(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
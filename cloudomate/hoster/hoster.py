@@ -4,22 +4,43 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import re
 from abc import abstractmethod, ABCMeta
+from functools import partial
 
 from fake_useragent import UserAgent
 from future import standard_library
 from future.utils import with_metaclass
-from mechanicalsoup import StatefulBrowser
 
-from cloudomate import wallet as wallet_util
+from cloudomate.exceptions.hoster_error import FatalHosterException
+from cloudomate.exceptions.hoster_error import HosterUnavailableException
+from cloudomate.exceptions.hoster_error import PaymentException
+from cloudomate.hoster import checkpoint as checkpoint_util
+from cloudomate.util import cache
+from cloudomate.util import prefetch as prefetch_util
+from cloudomate.util import ratelimit
+from cloudomate.util import recorder
+from cloudomate.util.instrumentation import InstrumentedBrowser
 
 standard_library.install_aliases()
 
+UNAVAILABLE_STATUS_CODES = (502, 503, 504)
+TRANSACTION_HASH = re.compile(r'^[0-9a-fA-F]{64}$')
+
 
 class Hoster(with_metaclass(ABCMeta)):
+    # Directory where the progress of unfinished purchases is kept, defaults to the user data directory
+    checkpoint_dir = None
+    # Whether purchases open the connections to the hoster and gateway in advance
+    prefetch = True
+    # Whether the unpaid invoices of the services can be found and paid by renew
+    supports_renewal = False
+
     def __init__(self, settings):
         self._browser = self._create_browser()
         self._settings = settings
+        self._profile = None
+        self._prefetch = None
 
     @abstractmethod
     def get_configuration(self):
@@ -90,22 +111,166 @@ class Hoster(with_metaclass(ABCMeta)):
         print("Purchasing {} instance".format(name))
         info = gateway.extract_info(url)
         print(('Paying %s BTC to %s' % (info.amount, info.address)))
-        fee = wallet_util.get_network_fee()
+        fee = wallet.get_network_fee(info.amount)
         print(('Calculated fee: %s' % fee))
         transaction_hash = wallet.pay(info.address, info.amount, fee)
         print('Done purchasing')
         return transaction_hash
 
-    @abstractmethod
-    def purchase(self, wallet, option):
+    def purchase(self, wallet, option, purchase_id=None):
         """Purchase Hoster.
 
+        The purchase is performed as the steps returned by _get_purchase_steps. The progress is saved after
+        every step, so that a purchase that failed resumes at the failed step when it is retried.
+
+        :param wallet: The Electrum wallet to use for payments
+        :param option: Hoster option to purchase
+        :param purchase_id: Identifies the purchase to resume when it is retried, for example with other random
+        user details, by default the purchase of the option by the user of the settings is resumed
+        :return: Returns the result of the last step, usually the transaction hash of the payment
+        """
+        self._start_prefetch(option)
+        checkpoint = checkpoint_util.PurchaseCheckpoint.load(self._get_checkpoint_path(option, purchase_id))
+        if checkpoint.completed:
+            print("Resuming purchase after step '{}'".format(checkpoint.completed[-1]))
+            checkpoint.restore(self._browser)
+
+        result = None
+        for name, step in self._get_purchase_steps(wallet, option):
+            if checkpoint.is_completed(name):
+                continue
+            result = step(checkpoint.data)
+            checkpoint.complete(name, self._browser)
+
+        checkpoint.delete()
+        self.clear_cache()
+        return result
+
+    def clear_cache(self):
+        """Forget the pages, status and configuration fetched before, so that they are fetched again."""
+        cache.clear_memo(self)
+
+    def renew(self, wallet, skip=None):
+        """Pay the unpaid renewal invoices of the services of the user.
+
+        Only hosters that set supports_renewal can renew. The id of every paid invoice is added to skip right
+        after its payment, so that a failure at a later invoice does not make the caller pay it again.
+
+        :param wallet: The Electrum wallet to use for payments
+        :param skip: Set of ids of invoices that must not be paid, such as invoices paid before but not yet
+        confirmed, the ids of the invoices paid now are added to it
+        :return: Returns a dictionary of the ids of the paid invoices to the transaction hashes
+        """
+        name, _ = self.get_metadata()
+        if not self.supports_renewal:
+            raise FatalHosterException('Renewing services of {} is not supported'.format(name))
+        skip = set() if skip is None else skip
+
+        paid = {}
+        try:
+            for invoice in self._get_renewal_invoices():
+                if invoice.id in skip:
+                    continue
+                transaction_hash = self.pay(wallet, self.get_gateway(), self._get_invoice_payment_url(invoice))
+                if transaction_hash is None or not TRANSACTION_HASH.match(transaction_hash):
+                    raise PaymentException('Invoice {} of {} was not paid: {}'.format(invoice.id, name,
+                                                                                      transaction_hash))
+                skip.add(invoice.id)
+                paid[invoice.id] = transaction_hash
+        finally:
+            self.clear_cache()
+        return paid
+
+    def _get_renewal_invoices(self):
+        """Get the unpaid invoices of the services of the user, for hosters that set supports_renewal.
+
+        :return: Returns a list of invoices, each with an id
+        """
+        return []
+
+    def _get_invoice_payment_url(self, invoice):
+        """Get the url of the payment gateway for an invoice returned by _get_renewal_invoices.
+
+        :return: Returns the url passed to the extract_info of the gateway
+        """
+        pass
+
+    @abstractmethod
+    def _get_purchase_steps(self, wallet, option):
+        """Get the steps needed to purchase an option.
+
+        Every step is called with a dictionary in which it can store data for later steps, such as the
+        invoice url. This dictionary is saved together with the cookies after every step.
+
         :param wallet: The Electrum wallet to use for payments
         :param option: Hoster option to purchase
+        :return: Returns a list of tuples of a unique step name and the function performing the step
         """
         pass
 
+    def _get_prefetch_urls(self, option):
+        """Get the urls of the pages visited when purchasing an option.
+
+        Connections to the hosts of these pages are opened before the purchase starts.
+
+        :param option: Hoster option to purchase
+        :return: Returns a list of urls
+        """
+        return [getattr(option, 'purchase_url', None), getattr(self, 'CART_URL', None)]
+
+    def _start_prefetch(self, option):
+        if not self.prefetch or recorder.get_active_cassette() is not None:
+            return  # Cassettes are played without a network
+        urls = self._get_prefetch_urls(option)
+        self._prefetch = prefetch_util.Prefetch(self._browser.session, urls)
+        self._prefetch.start()
+
+    def _pay_step(self, wallet):
+        """Get the step that pays the invoice stored by a previous step under 'invoice_url'.
+
+        :param wallet: The Electrum wallet to use for payments
+        :return: Returns a tuple of the step name and function
+        """
+        return 'pay', partial(self._pay_invoice, wallet)
+
+    def _pay_invoice(self, wallet, state):
+        return self.pay(wallet, self.get_gateway(), state['invoice_url'])
+
+    def _get_profile(self):
+        """Get the settings of this hoster, resolved once for the provider.
+
+        :return: Returns the immutable Profile of the settings
+        """
+        if self._profile is None:
+            name, _ = self.get_metadata()
+            self._profile = self._settings.profile(name)
+        return self._profile
+
+    def _get_checkpoint_path(self, option, purchase_id=None):
+        name, _ = self.get_metadata()
+        directory = self.checkpoint_dir or checkpoint_util.get_checkpoint_dir()
+        if purchase_id is not None:
+            return checkpoint_util.checkpoint_path(directory, name, getattr(option, 'purchase_url', None),
+                                                   option.name, 'id', purchase_id)
+        profile = self._get_profile()
+        user = None
+        for key in ('email', 'username'):
+            if profile.has_key('user', key):
+                user = profile.get('user', key)
+                break
+        return checkpoint_util.checkpoint_path(directory, name, user, getattr(option, 'purchase_url', None),
+                                               option.name)
+
     @staticmethod
     def _create_browser():
         user_agent = UserAgent(fallback="Mozilla/5.0 (X11; Linux x86_64; rv:57.0) Gecko/20100101 Firefox/57.0")
-        return StatefulBrowser(user_agent=user_agent.random)
+        browser = InstrumentedBrowser(user_agent=user_agent.random)
+        browser.session.hooks['response'].append(_raise_if_unavailable)
+        ratelimit.attach(browser.session)
+        recorder.attach(browser.session)  # Replaying replaces the rate limited adapters, cassettes are not throttled
+        return browser
+
+
+def _raise_if_unavailable(response, *args, **kwargs):
+    if response.status_code in UNAVAILABLE_STATUS_CODES:
+        raise HosterUnavailableException(response.url, response.status_code)
@@ -6,14 +6,16 @@ from __future__ import unicode_literals
 
 import datetime
 import sys
-from builtins import round
 
 import requests
-from forex_python.converter import CurrencyRates
 from future import standard_library
 
+from cloudomate.exceptions.hoster_error import LoginException, RegistrationException
 from cloudomate.gateway.bitpay import BitPay
 from cloudomate.hoster.vpn.vpn_hoster import VpnHoster, VpnOption, VpnStatus, VpnConfiguration
+from cloudomate.util import pricing
+from cloudomate.util import units
+from cloudomate.util.cache import memoize
 
 standard_library.install_aliases()
 
@@ -46,11 +48,12 @@ class AzireVpn(VpnHoster):
     Action methods of the Hoster that can be called
     '''
 
+    @memoize
     def get_configuration(self):
         response = requests.get(self.CONFIGURATION_URL)
         ovpn = response.text
-        return VpnConfiguration(self._settings.get("user", "username"),
-                                self._settings.get("user", "password"), ovpn)
+        user = self._get_profile().user
+        return VpnConfiguration(user.username, user.password, ovpn)
 
     @classmethod
     def get_options(cls):
@@ -62,13 +65,14 @@ class AzireVpn(VpnHoster):
         string = strong.get_text()
 
         # Calculate the price in USD
-        eur = float(string[string.index("€") + 2: string.index("/") - 1])
-        price = round(CurrencyRates().convert("EUR", "USD", eur), 2)
+        eur = units.parse_price(string, 'EUR').amount
+        price, = pricing.convert_prices([(eur, 'EUR')])
 
         name, _ = cls.get_metadata()
         option = VpnOption(name, "OpenVPN", price, sys.maxsize, sys.maxsize)
         return [option]
 
+    @memoize
     def get_status(self):
         self._login()
 
@@ -89,14 +93,12 @@ class AzireVpn(VpnHoster):
             online = True
         return VpnStatus(online, expiration)
 
-    def purchase(self, wallet, option):
-        # Prepare for the purchase on the AzireVPN website
-        self._register()
-        self._login()
-        page = self._order()
-
-        # Make the payment
-        self.pay(wallet, self.get_gateway(), page.url)
+    def _get_purchase_steps(self, wallet, option):
+        return [
+            ('register', lambda state: self._register()),
+            ('order', self._login_and_order),
+            self._pay_step(wallet),
+        ]
 
     '''
     Hoster-specific methods that are needed to perform the actions
@@ -105,36 +107,44 @@ class AzireVpn(VpnHoster):
     def _register(self):
         self._browser.open(self.REGISTER_URL)
         form = self._browser.select_form()
-        form["username"] = self._settings.get("user", "username")
-        form["password"] = self._settings.get("user", "password")
-        form["password_confirmation"] = self._settings.get("user", "password")
+        user = self._get_profile().user
+        form["username"] = user.username
+        form["password"] = user.password
+        form["password_confirmation"] = user.password
         page = self._browser.submit_selected()
 
         if page.url == self.REGISTER_URL:
             # An error occurred
             soup = self._browser.get_current_page()
             ul = soup.select_one("ul.alert-danger")
-            print(ul.get_text())
-            sys.exit(2)
+            raise RegistrationException(ul.get_text().strip())
 
         return page
 
     def _login(self):
         self._browser.open(self.LOGIN_URL)
         form = self._browser.select_form()
-        form["username"] = self._settings.get("user", "username")
-        form["password"] = self._settings.get("user", "password")
+        user = self._get_profile().user
+        form["username"] = user.username
+        form["password"] = user.password
         page = self._browser.submit_selected()
 
         if page.url == self.LOGIN_URL:
             # An error occurred
             soup = self._browser.get_current_page()
             ul = soup.select_one("ul.alert-danger")
-            print(ul.get_text())
-            sys.exit(2)
+            raise LoginException(ul.get_text().strip())
 
         return page
 
+    def _get_prefetch_urls(self, option):
+        return [self.REGISTER_URL, self.LOGIN_URL, self.ORDER_URL]
+
+    def _login_and_order(self, state):
+        self._login()
+        page = self._order()
+        state['invoice_url'] = page.url
+
     def _order(self):
         self._browser.open(self.ORDER_URL)
         form = self._browser.select_form("form#orderForm")
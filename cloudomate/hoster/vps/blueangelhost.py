@@ -16,6 +16,8 @@ from cloudomate.hoster.vps.solusvm_hoster import SolusvmHoster
 from cloudomate.hoster.vps.vps_hoster import VpsOption
 from cloudomate.hoster.vps.vps_hoster import VpsStatus
 from cloudomate.hoster.vps.vps_hoster import VpsStatusResource
+from cloudomate.util import units
+from cloudomate.util.cache import memoize
 
 standard_library.install_aliases()
 
@@ -65,11 +67,14 @@ class BlueAngelHost(SolusvmHoster):
         options = itertools.chain(options, cls._parse_options(browser.get_current_page(), is_kvm=True))
         return list(options)
 
+    @memoize
     def get_status(self):
         status = super().get_status()
+        if self.get_usage() is not None:
+            return status
 
         # Retrieve the vserverid
-        page = self._browser.open(status.clientarea.url)
+        page = self._create_clientarea().get_page(status.clientarea.url)
         match = re.search(r'vserverid = (\d+)', page.text)
         identifier = match.group(1)
 
@@ -77,49 +82,25 @@ class BlueAngelHost(SolusvmHoster):
         page = self._browser.open('{}?vserverid={}&_={}'.format(self.CLIENT_DATA_URL, identifier, millis))
         data = page.json()
 
-        memory = VpsStatusResource(self._convert_gigabyte(data['memoryused']),
-                                   self._convert_gigabyte(data['memorytotal']))
-        storage = VpsStatusResource(self._convert_gigabyte(data['hddused']), self._convert_gigabyte(data['hddtotal']))
-        bandwidth = VpsStatusResource(self._convert_gigabyte(data['bandwidthused']),
-                                      self._convert_gigabyte(data['bandwidthtotal']))
+        memory = VpsStatusResource(units.parse_gigabytes(data['memoryused']),
+                                   units.parse_gigabytes(data['memorytotal']))
+        storage = VpsStatusResource(units.parse_gigabytes(data['hddused']), units.parse_gigabytes(data['hddtotal']))
+        bandwidth = VpsStatusResource(units.parse_gigabytes(data['bandwidthused']),
+                                      units.parse_gigabytes(data['bandwidthtotal']))
 
         return VpsStatus(memory, storage, bandwidth, status.online, status.expiration, status.clientarea)
 
-    def purchase(self, wallet, option):
-        self._browser.open(option.purchase_url)
-        self._submit_server_form()
-        self._browser.open(self.CART_URL)
-        summary = self._browser.get_current_page().find('div', class_='summary-container')
-        self._browser.follow_link(summary.find('a', class_='btn-checkout'))
-
-        self._browser.select_form(selector='form[name=orderfrm]')
-        self._browser.get_current_form()['customfield[4]'] = 'Google'
-        self._fill_user_form(self.get_gateway().get_name())
-
-        self._browser.select_form(nr=0)
-        self._browser.submit_selected()
-        return self.pay(wallet, self.get_gateway(), self._browser.get_url())
+    def _get_purchase_steps(self, wallet, option):
+        return [
+            ('cart', lambda state: self._add_to_cart(option)),
+            ('checkout', self._checkout),
+            self._pay_step(wallet),
+        ]
 
     '''
     Hoster-specific methods that are needed to perform the actions
     '''
 
-    @staticmethod
-    def _convert_gigabyte(s):
-        n = float(s.split(' ')[0])
-        if 'KB' in s:
-            n /= 1024.0 * 1024.0
-        elif 'MB' in s:
-            n /= 1024.0
-        elif 'GB' in s:
-            pass
-        elif 'TB' in s:
-            n *= 1024.0
-        else:
-            raise ValueError('Unknown unit in string {}'.format(s))
-
-        return n
-
     @classmethod
     def _parse_options(cls, page, is_kvm=False):
         month = page.find('div', {'id': 'monthly_price'})
@@ -135,7 +116,6 @@ class BlueAngelHost(SolusvmHoster):
             split_char = ':'
 
         price = column.find('div', {'class': 'plan_price_m'}).text.strip()
-        price = price.split('$')[1].split('/')[0]
         planinfo = column.find('ul', {'class': 'plan_info_list'})
         info = planinfo.findAll('li')
         cpu = info[0].text.split(split_char)[1].strip()
@@ -146,15 +126,32 @@ class BlueAngelHost(SolusvmHoster):
 
         return VpsOption(
             name=column.find('div', {'class': 'plan_title'}).find('h4').text,
-            price=float(price),
-            cores=int(cpu.split('C')[0].strip()),
-            memory=float(ram.split('G')[0].strip()),
-            storage=float(storage.split('G')[0].strip()),
-            connection=int(connection.split('G')[0].strip()) * 1000,
-            bandwidth=float(bandwidth.split('T')[0].strip()),
+            price=units.parse_price(price).amount,
+            cores=units.parse_int(cpu),
+            memory=units.parse_gigabytes(ram, 'GB'),
+            storage=units.parse_gigabytes(storage, 'GB'),
+            connection=units.parse_gbps(connection),
+            bandwidth=units.parse_gigabytes(bandwidth, 'TB'),
             purchase_url=column.find('a')['href']
         )
 
+    def _add_to_cart(self, option):
+        self._browser.open(option.purchase_url)
+        self._submit_server_form()
+
+    def _checkout(self, state):
+        self._browser.open(self.CART_URL)
+        summary = self._browser.get_current_page().find('div', class_='summary-container')
+        self._browser.follow_link(summary.find('a', class_='btn-checkout'))
+
+        self._browser.select_form(selector='form[name=orderfrm]')
+        self._browser.get_current_form()['customfield[4]'] = 'Google'
+        self._fill_user_form(self.get_gateway().get_name())
+
+        self._browser.select_form(nr=0)
+        self._browser.submit_selected()
+        state['invoice_url'] = self._browser.get_url()
+
     def _submit_server_form(self):
         """
         Fills in the form containing server configuration
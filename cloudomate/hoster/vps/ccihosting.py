@@ -5,7 +5,6 @@ from __future__ import unicode_literals
 
 import re
 import sys
-from builtins import int
 from builtins import super
 
 from future import standard_library
@@ -15,6 +14,8 @@ from cloudomate.hoster.vps.solusvm_hoster import SolusvmHoster
 from cloudomate.hoster.vps.vps_hoster import VpsOption
 from cloudomate.hoster.vps.vps_hoster import VpsStatus
 from cloudomate.hoster.vps.vps_hoster import VpsStatusResource
+from cloudomate.util import units
+from cloudomate.util.cache import memoize
 
 standard_library.install_aliases()
 
@@ -57,19 +58,22 @@ class CCIHosting(SolusvmHoster):
         browser.open(cls.OPTIONS_URL)
         return list(cls._parse_options(browser.get_current_page()))
 
+    @memoize
     def get_status(self):
         status = super().get_status()
+        if self.get_usage() is not None:
+            return status
 
         # Usage
-        page = self._browser.open(status.clientarea.url)
-        matches = re.findall(r'([\d.]+) (KB|MB|GB|TB) of ([\d.]+) (KB|MB|GB|TB) Used', page.text)
+        page = self._create_clientarea().get_page(status.clientarea.url)
+        matches = re.findall(r'([\d.]+ [KMGT]B) of ([\d.]+ [KMGT]B) Used', page.text)
         usage = (
-            self._convert_gigabyte(matches[1][0], matches[1][1]),  # Memory used
-            self._convert_gigabyte(matches[1][2], matches[1][3]),  # Memory total
-            self._convert_gigabyte(matches[0][0], matches[0][1]),  # Storage used
-            self._convert_gigabyte(matches[0][2], matches[0][3]),  # Storage total
-            self._convert_gigabyte(matches[2][0], matches[2][1]),  # Bandwidth used
-            self._convert_gigabyte(matches[2][2], matches[2][3])  # Bandwidth total
+            units.parse_gigabytes(matches[1][0]),  # Memory used
+            units.parse_gigabytes(matches[1][1]),  # Memory total
+            units.parse_gigabytes(matches[0][0]),  # Storage used
+            units.parse_gigabytes(matches[0][1]),  # Storage total
+            units.parse_gigabytes(matches[2][0]),  # Bandwidth used
+            units.parse_gigabytes(matches[2][1])  # Bandwidth total
         )
 
         memory = VpsStatusResource(usage[0], usage[1])
@@ -79,9 +83,22 @@ class CCIHosting(SolusvmHoster):
         # return status
         return VpsStatus(memory, storage, bandwidth, status.online, status.expiration, status.clientarea)
 
-    def purchase(self, wallet, option):
+    def _get_purchase_steps(self, wallet, option):
+        return [
+            ('cart', lambda state: self._add_to_cart(option)),
+            ('checkout', self._checkout),
+            self._pay_step(wallet),
+        ]
+
+    '''
+    Hoster-specific methods that are needed to perform the actions
+    '''
+
+    def _add_to_cart(self, option):
         self._browser.open(option.purchase_url)
-        self._server_form()  # Add item to cart
+        self._server_form()
+
+    def _checkout(self, state):
         self._browser.open(self.CART_URL)
 
         summary = self._browser.get_current_page().find('div', class_='summary-container')
@@ -90,44 +107,23 @@ class CCIHosting(SolusvmHoster):
         self._browser.select_form(selector='form[name=orderfrm]')
         self._fill_user_form(self.get_gateway().get_name())
 
-        coinbase_url = self._browser.get_current_page().find('form')['action']
-        self.pay(wallet, self.get_gateway(), coinbase_url)
-
-    '''
-    Hoster-specific methods that are needed to perform the actions
-    '''
-
-    @staticmethod
-    def _convert_gigabyte(number, unit):
-        u = unit.lower()
-        n = float(number)
-        if u == 'kb':
-            n /= 1024.0 * 1024.0
-        elif u == 'mb':
-            n /= 1024.0
-        elif u == 'gb':
-            pass
-        elif u == 'tb':
-            n *= 1024.0
-        else:
-            raise ValueError('Unknown unit {}'.format(u))
-
-        return n
+        state['invoice_url'] = self._browser.get_current_page().find('form')['action']  # Coinbase url
 
     def _server_form(self):
         """
         Using a form does not work for some reason, so use post request instead
         """
+        server = self._get_profile().server
         self._browser.post('https://www.ccihosting.com/accounts/cart.php', {
             'ajax': '1',
             'a': 'confproduct',
             'configure': 'true',
             'i': '0',
             'billingcycle': 'monthly',
-            'hostname': self._settings.get('server', 'hostname'),
-            'rootpw': self._settings.get('server', 'root_password'),
-            'ns1prefix': self._settings.get('server', 'ns1'),
-            'ns2prefix': self._settings.get('server', 'ns2'),
+            'hostname': server.hostname,
+            'rootpw': server.root_password,
+            'ns1prefix': server.ns1,
+            'ns2prefix': server.ns2,
             'configoption[214]': '1193',  # Ubuntu 16.04
             'configoption[258]': '955',
         })
@@ -145,10 +141,10 @@ class CCIHosting(SolusvmHoster):
         info = column.find('ul').findAll('li')
         return VpsOption(
             name=header.find('h2').contents[0],
-            price=float(price.contents[0]),
-            cores=int(info[1].find('strong').contents[0]),
-            memory=float(info[2].find('strong').contents[0]),
-            storage=float(info[3].find('strong').contents[0]),
+            price=units.parse_price(price.text).amount,
+            cores=units.parse_int(info[1].find('strong').text),
+            memory=units.parse_gigabytes(info[2].find('strong').text, 'GB'),
+            storage=units.parse_gigabytes(info[3].find('strong').text, 'GB'),
             bandwidth=sys.maxsize,
             connection=0.01,  # See FAQ at https://www.ccihosting.com/offshore-vps.html
             purchase_url=column.find('a')['href']
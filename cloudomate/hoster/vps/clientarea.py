@@ -6,17 +6,25 @@ from __future__ import unicode_literals
 
 import datetime
 import re
-import sys
-from builtins import round
 from collections import namedtuple
 
 from bs4 import BeautifulSoup
-from forex_python.converter import CurrencyRates
 from future import standard_library
+from future.moves.urllib.parse import urljoin
+
+from cloudomate.exceptions.hoster_error import LoginException
+from cloudomate.util import pricing
+from cloudomate.util import units
 
 standard_library.install_aliases()
 
-ClientAreaService = namedtuple('ClientAreaService', ['name', 'price', 'next_due', 'status', 'url'])
+ClientAreaService = namedtuple('ClientAreaService', ['name',
+                                                     'price',  # Price in the currency of the service
+                                                     'next_due',
+                                                     'status',
+                                                     'url',
+                                                     'currency'])  # ISO 4217 code, e.g. USD
+ClientAreaInvoice = namedtuple('ClientAreaInvoice', ['id', 'due', 'total', 'status', 'url'])
 
 
 class ClientArea(object):
@@ -25,18 +33,19 @@ class ClientArea(object):
     this control panel in an automated manner.
     """
     ACTION_POSTFIX = '?action=services&language=english'
+    INVOICES_POSTFIX = '?action=invoices&language=english'
 
     def __init__(self, browser, clientarea_url, user_settings):
         self._browser = browser
         self._services = None
+        self._pages = {}
         self._url = clientarea_url
         self._login(user_settings.get('user', 'email'), user_settings.get('user', 'password'))
 
     def get_ip(self, service=None):
         if service is None:
             service = self.get_services_first()
-        self._browser.open(service.url)
-        soup = self._browser.get_current_page()
+        soup = self.get_page(service.url).soup
         rows = soup.select('div#domain > div.row')
         if len(rows) > 0:
             for row in rows:
@@ -46,28 +55,60 @@ class ClientArea(object):
         else:
             return re.search(r'\b((?:\d{1,3}\.){3}\d{1,3})\b', soup.text).group(0)
 
-    def get_services(self):
+    def get_page(self, url):
+        """Open a page of the clientarea, or get it from the pages opened before by this instance."""
+        page = self._pages.get(url)
+        if page is None:
+            page = self._pages[url] = self._browser.open(url)
+        return page
+
+    def clear_cache(self):
+        self._services = None
+        self._pages.clear()
+
+    def get_services(self, currency=None):
+        """
+        Get the services of the user, with their prices in the currencies the clientarea shows them in.
+        :param currency: convert the prices to this currency, with one exchange rate lookup for all services
+        """
         if self._services is None:
             self._browser.open(self._url + self.ACTION_POSTFIX)
             soup = self._browser.get_current_page()
             rows = soup.select('table#tableServicesList tbody tr')
             self._services = [self._parse_service_row(row) for row in rows]
 
-        return self._services
+        if currency is None:
+            return self._services
+        prices = pricing.convert_prices([(service.price, service.currency) for service in self._services], currency)
+        return [service._replace(price=price, currency=currency) for service, price in zip(self._services, prices)]
 
     def get_services_first(self):
         return self.get_services()[0]
 
+    def get_invoices(self):
+        soup = self.get_page(self._url + self.INVOICES_POSTFIX).soup
+        rows = soup.select('table#tableInvoicesList tbody tr')
+        return [self._parse_invoice_row(row) for row in rows]
+
+    def get_unpaid_invoices(self):
+        return [invoice for invoice in self.get_invoices() if invoice.status == 'unpaid']
+
+    def get_invoice_payment_url(self, invoice):
+        """
+        Open the payment form of an invoice.
+        :return: The url of the payment gateway the form leads to.
+        """
+        self._browser.open(invoice.url)
+        self._browser.select_form(nr=0)
+        self._browser.submit_selected()
+        return self._browser.get_url()
+
     def _parse_service_row(self, row):
         columns = row.findAll('td')
 
         name = columns[0].strong.text
 
-        price_string = columns[1].text
-        dot_index = price_string.index('.')
-        price = float(price_string[1:dot_index + 3])
-        if 'EUR' in price_string:
-            price = round(CurrencyRates().convert("EUR", "USD", price), 2)
+        price, currency = units.parse_price(columns[1].text)
 
         next_due = columns[2].span.text
         next_due = datetime.datetime.strptime(next_due, '%Y-%m-%d')
@@ -78,11 +119,27 @@ class ClientArea(object):
         url = url.split('.php')
         url = self._url + url[1]
 
-        return ClientAreaService(name, price, next_due, status, url)
+        return ClientAreaService(name, price, next_due, status, url, currency)
+
+    def _parse_invoice_row(self, row):
+        columns = row.findAll('td')
+
+        invoice_id = columns[0].text.strip()
+
+        due = columns[2].span.text
+        due = datetime.datetime.strptime(due, '%Y-%m-%d')
+
+        total = columns[3].text.strip()
+
+        status = columns[4].span.text.lower()
+
+        url = urljoin(self._url, row.find('a')['href'])
+
+        return ClientAreaInvoice(invoice_id, due, total, status, url)
 
     def _login(self, email, password):
         """
-        Login into the clientarea. Exits program if unsuccesful.
+        Login into the clientarea. Raises a LoginException if unsuccesful.
         :return: The clientarea homepage on succesful login.
         """
         self._browser.open(self._url)
@@ -91,8 +148,7 @@ class ClientArea(object):
         self._browser['password'] = password
         page = self._browser.submit_selected()
         if "incorrect=true" in page.url:
-            print("Login failure")
-            sys.exit(2)
+            raise LoginException("Login failure")
         self.home_page = page
 
     #
@@ -3,14 +3,13 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-from builtins import int
-
 from future import standard_library
 from mechanicalsoup import LinkNotFoundError
 
 from cloudomate.gateway.bitpay import BitPay
 from cloudomate.hoster.vps.solusvm_hoster import SolusvmHoster
 from cloudomate.hoster.vps.vps_hoster import VpsOption
+from cloudomate.util import units
 
 standard_library.install_aliases()
 
@@ -69,12 +68,12 @@ class CrownCloud(SolusvmHoster):
         page = browser.get_current_page()
         return list(cls._parse_options(page))
 
-    def purchase(self, wallet, option):
-        self._browser.open(option.purchase_url)
-        self._submit_server_form()
-        self._browser.open(self.CART_URL)
-        page = self._submit_user_form()
-        self.pay(wallet, self.get_gateway(), page.url)
+    def _get_purchase_steps(self, wallet, option):
+        return [
+            ('cart', lambda state: self._add_to_cart(option)),
+            ('checkout', self._checkout),
+            self._pay_step(wallet),
+        ]
 
     '''
     Hoster-specific methods that are needed to perform the actions
@@ -99,30 +98,33 @@ class CrownCloud(SolusvmHoster):
         price = details[6].text
         if 'yearly only' in price:
             return None  # Only yearly price possible
-        try:
-            i = price.index('/')
-        except ValueError:
+        if '/' not in price:
             return None  # Invalid price string
-        price = int(price[1:i])
+        price = units.parse_price(price).amount
 
-        cores = int(details[3].text[0])
+        cores = units.parse_int(details[3].text)
 
-        memory = float(details[1].text[0:4]) / 1000
+        memory = units.parse_gigabytes(details[1].text, 'MB')
 
-        storage = details[2].text.split(' GB')
-        storage = int(storage[0])
+        storage = units.parse_gigabytes(details[2].text, 'GB')
 
-        bandwidth = details[4].text.split(' GB')
-        bandwidth = bandwidth[0]
+        bandwidth = units.parse_gigabytes(details[4].text, 'GB')
 
-        connection = details[4].text
-        i = connection.index('Gbps')
-        connection = int(connection[i - 1])
+        connection = units.parse_gbps(details[4].text)
 
         purchase_url = details[7].find('a')['href']
 
         return VpsOption(name, cores, memory, storage, bandwidth, connection, price, purchase_url)
 
+    def _add_to_cart(self, option):
+        self._browser.open(option.purchase_url)
+        self._submit_server_form()
+
+    def _checkout(self, state):
+        self._browser.open(self.CART_URL)
+        page = self._submit_user_form()
+        state['invoice_url'] = page.url
+
     def _submit_server_form(self):
         try:
             form = self._browser.select_form('form#orderfrm')
@@ -5,17 +5,16 @@ from __future__ import unicode_literals
 
 import itertools
 import json
-from builtins import int
-from builtins import round
 from builtins import super
 
-from forex_python.converter import CurrencyRates
 from future import standard_library
 from mechanicalsoup.utils import LinkNotFoundError
 
 from cloudomate.gateway.bitpay import BitPay
 from cloudomate.hoster.vps.solusvm_hoster import SolusvmHoster
 from cloudomate.hoster.vps.vps_hoster import VpsOption
+from cloudomate.util import pricing
+from cloudomate.util import units
 
 standard_library.install_aliases()
 
@@ -65,13 +64,27 @@ class LineVast(SolusvmHoster):
         options = cls._parse_openvz_hosting(browser.get_current_page())
 
         browser.open("https://linevast.de/en/offers/windows-vps-hosting.html")
-        options = itertools.chain(options, cls._parse_kvm_hosting(browser.get_current_page()))
+        options = list(itertools.chain(options, cls._parse_kvm_hosting(browser.get_current_page())))
 
-        return list(options)
+        prices = pricing.convert_prices([(option.price, 'EUR') for option in options])
+        return [option._replace(price=price) for option, price in zip(options, prices)]
 
-    def purchase(self, wallet, option):
+    def _get_purchase_steps(self, wallet, option):
+        return [
+            ('cart', lambda state: self._add_to_cart(option)),
+            ('checkout', self._checkout),
+            self._pay_step(wallet),
+        ]
+
+    '''
+    Hoster-specific methods that are needed to perform the actions
+    '''
+
+    def _add_to_cart(self, option):
         self._browser.open(option.purchase_url)
         self._server_form()
+
+    def _checkout(self, state):
         self._browser.open(self.CART_URL)
 
         summary = self._browser.get_current_page().find('div', class_='summary-container')
@@ -84,11 +97,7 @@ class LineVast(SolusvmHoster):
 
         self._browser.select_form(nr=0)  # Go to payment form
         self._browser.submit_selected()
-        self.pay(wallet, self.get_gateway(), self._browser.get_url())
-
-    '''
-    Hoster-specific methods that are needed to perform the actions
-    '''
+        state['invoice_url'] = self._browser.get_url()
 
     def _server_form(self):
         """
@@ -118,15 +127,15 @@ class LineVast(SolusvmHoster):
     @staticmethod
     def _parse_openvz_option(plan, name):
         elements = plan.findAll("div", {'class': 'info'})
-        eur = float(plan.find('div', {'class': 'plans-price'}).span.text.replace('\u20AC', ''))
+        eur = units.parse_price(plan.find('div', {'class': 'plans-price'}).span.text, 'EUR').amount
         option = VpsOption(
             name=name,
-            storage=elements[0].text.split(' GB')[0],
-            cores=elements[1].text.split(' vCore')[0],
-            memory=elements[2].text.split(' GB')[0],
+            storage=units.parse_gigabytes(elements[0].text, 'GB'),
+            cores=units.parse_int(elements[1].text),
+            memory=units.parse_gigabytes(elements[2].text, 'GB'),
             bandwidth='unmetered',
-            connection=int(elements[4].text.split(' GB')[0]) * 1000,
-            price=round(CurrencyRates().convert("EUR", "USD", eur), 2),
+            connection=units.parse_gbps(elements[4].text),
+            price=eur,  # Converted to USD in get_options
             purchase_url=plan.a['href'],
         )
         return option
@@ -146,15 +155,15 @@ class LineVast(SolusvmHoster):
     @staticmethod
     def _parse_kvm_option(plan, name):
         elements = plan.findAll("div", {'class': 'info'})
-        eur = float(plan.find('div', {'class': 'plans-price'}).span.text.replace('\u20AC', ''))
+        eur = units.parse_price(plan.find('div', {'class': 'plans-price'}).span.text, 'EUR').amount
         option = VpsOption(
             name=name,
-            storage=elements[0].text.split(' GB')[0],
-            cores=elements[1].text.split(' vCore')[0],
-            memory=elements[3].text.split(' GB')[0],
+            storage=units.parse_gigabytes(elements[0].text, 'GB'),
+            cores=units.parse_int(elements[1].text),
+            memory=units.parse_gigabytes(elements[3].text, 'GB'),
             bandwidth='unmetered',
-            connection=int(elements[4].text.split(' GB')[0]) * 1000,
-            price=round(CurrencyRates().convert("EUR", "USD", eur), 2),
+            connection=units.parse_gbps(elements[4].text),
+            price=eur,  # Converted to USD in get_options
             purchase_url=plan.a['href'],
         )
         return option
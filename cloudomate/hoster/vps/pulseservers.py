@@ -4,13 +4,13 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import sys
-from builtins import int
 
 from future import standard_library
 
 from cloudomate.gateway.coinbase import Coinbase
 from cloudomate.hoster.vps import vps_hoster
 from cloudomate.hoster.vps.solusvm_hoster import SolusvmHoster
+from cloudomate.util import units
 
 standard_library.install_aliases()
 
@@ -57,17 +57,26 @@ class Pulseservers(SolusvmHoster):
         boxes = soup.select('div.pricing-box')
         return [cls._parse_box(box) for box in boxes]
 
-    def purchase(self, wallet, option):
-        self._browser.open(option.purchase_url)
-        self._submit_server_form()
-        self._browser.open(self.CART_URL)
-        page = self._submit_user_form()
-        self.pay(wallet, self.get_gateway(), page.url)
+    def _get_purchase_steps(self, wallet, option):
+        return [
+            ('cart', lambda state: self._add_to_cart(option)),
+            ('checkout', self._checkout),
+            self._pay_step(wallet),
+        ]
 
     '''
     Hoster-specific methods that are needed to perform the actions
     '''
 
+    def _add_to_cart(self, option):
+        self._browser.open(option.purchase_url)
+        self._submit_server_form()
+
+    def _checkout(self, state):
+        self._browser.open(self.CART_URL)
+        page = self._submit_user_form()
+        state['invoice_url'] = page.url
+
     def _submit_server_form(self):
         form = self._browser.select_form('form#orderfrm')
 
@@ -98,23 +107,15 @@ class Pulseservers(SolusvmHoster):
 
         name = details[0].h4.text
 
-        price = details[1].h1.text
-        price = float(price[1:])
+        price = units.parse_price(details[1].h1.text).amount
 
-        cores = details[2].strong.text
-        cores = int(cores.split(' ')[0])
+        cores = units.parse_int(details[2].strong.text)
 
-        memory = details[3].strong.text
-        memory = float(memory[0:-2])
+        memory = units.parse_gigabytes(details[3].strong.text, 'GB')
 
-        storage = details[4].strong.text
-        if storage == '1TB':
-            storage = 1000.0
-        else:
-            storage = float(storage[0:-2])
+        storage = units.parse_gigabytes(details[4].strong.text, 'GB')
 
-        connection = details[5].strong.text
-        connection = int(connection[0:-7])
+        connection = units.parse_gbps(details[5].strong.text)
 
         purchase_url = details[9].a['href']
 
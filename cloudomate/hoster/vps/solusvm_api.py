@@ -0,0 +1,98 @@
+"""Client of the SolusVM client API
+
+SolusVM control panels offer an API for a single VPS at <panel>/api/client/command.php. It is authenticated
+with the API key and hash generated in the panel (API Settings of the VPS), and returns the usage of the VPS
+in one small response, without the login and the pages of the client area:
+
+<status>success</status><statusmsg></statusmsg><vmstat>online</vmstat><hostname>host</hostname>
+<ipaddress>1.2.3.4</ipaddress><hdd>total,used,free,percentage</hdd><mem>...</mem><bw>...</bw>
+
+The totals and usages are in bytes.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import re
+from builtins import object
+from collections import namedtuple
+
+import requests
+from future import standard_library
+
+from cloudomate.exceptions.hoster_error import SolusvmApiException
+from cloudomate.hoster.vps.vps_hoster import VpsStatusResource
+from cloudomate.hoster.vps.vps_hoster import VpsStatusResourceNone
+from cloudomate.util import units
+
+standard_library.install_aliases()
+
+API_PATH = 'api/client/command.php'
+API_TIMEOUT = 10
+
+SolusvmInfo = namedtuple('SolusvmInfo', ['hostname', 'ip', 'memory', 'storage', 'bandwidth', 'online'])
+
+_ELEMENT = re.compile(r'<(\w+)>(.*?)</\1>', re.DOTALL)
+
+
+class SolusvmApi(object):
+    """
+    SolusvmApi requests the state of a VPS from the SolusVM client API.
+
+    :param url: the url of the control panel, e.g. https://panel.example.com:5656/
+    :param key: the API key of the VPS
+    :param api_hash: the API hash of the VPS
+    :param session: the requests session to send the requests with
+    """
+
+    def __init__(self, url, key, api_hash, session=None):
+        self.url = url if url.endswith(API_PATH) else url.rstrip('/') + '/' + API_PATH
+        self.key = key
+        self.api_hash = api_hash
+        self._session = session or requests.Session()
+
+    def command(self, action, **flags):
+        """Perform an action of the API
+
+        :param action: the action, e.g. info, status or reboot
+        :param flags: additional parameters, e.g. mem=True
+        :return: dictionary of the elements of the response
+        """
+        params = {'key': self.key, 'hash': self.api_hash, 'action': action}
+        for flag, value in flags.items():
+            params[flag] = 'true' if value is True else value
+        response = self._session.post(self.url, data=params, timeout=API_TIMEOUT)
+        response.raise_for_status()
+        result = self.parse(response.text)
+        if result.get('status') != 'success':
+            raise SolusvmApiException("SolusVM API action '{}' failed: {}".format(
+                action, result.get('statusmsg') or result.get('status') or 'empty response'))
+        return result
+
+    def get_info(self):
+        """Get the usage and the state of the VPS, in a single request if the panel reports the state in it
+
+        :return: SolusvmInfo with the resources in GB
+        """
+        result = self.command('info', mem=True, hdd=True, bw=True)
+        if 'vmstat' not in result:
+            result['vmstat'] = self.command('status').get('vmstat')
+        return SolusvmInfo(result.get('hostname'),
+                           result.get('ipaddress'),
+                           self._parse_resource(result.get('mem')),
+                           self._parse_resource(result.get('hdd')),
+                           self._parse_resource(result.get('bw')),
+                           result.get('vmstat') == 'online')
+
+    @staticmethod
+    def parse(text):
+        return dict((name, value.strip()) for name, value in _ELEMENT.findall(text))
+
+    @staticmethod
+    def _parse_resource(value):
+        """Parse total,used,free,percentage in bytes into a VpsStatusResource in GB"""
+        if not value:
+            return VpsStatusResourceNone
+        total, used = value.split(',')[:2]
+        return VpsStatusResource(units.to_gigabytes(used, 'B'), units.to_gigabytes(total, 'B'))
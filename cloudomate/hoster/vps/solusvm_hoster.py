@@ -3,18 +3,21 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import sys
 from abc import abstractmethod
 
 from bs4 import BeautifulSoup
 from future import standard_library
 from mechanicalsoup import LinkNotFoundError
 
+from cloudomate.exceptions.hoster_error import CheckoutException
 from cloudomate.hoster.vps.clientarea import ClientArea
+from cloudomate.hoster.vps.solusvm_api import SolusvmApi
 from cloudomate.hoster.vps.vps_hoster import VpsConfiguration
 from cloudomate.hoster.vps.vps_hoster import VpsHoster
 from cloudomate.hoster.vps.vps_hoster import VpsStatus
 from cloudomate.hoster.vps.vps_hoster import VpsStatusResourceNone
+from cloudomate.util.cache import TimedCache
+from cloudomate.util.cache import memoize
 
 from builtins import super
 
@@ -25,36 +28,79 @@ class SolusvmHoster(VpsHoster):
     """
     SolusvmHoster is the common superclass of all VPS hosters that make use of the Solusvm management package.
     This makes it possible to fill in the registration form in a similar manner for all Solusvm subclasses.
+
+    The usage of a VPS is read from the SolusVM client API when the API key and hash of the VPS are configured
+    as solusvm_key and solusvm_hash in the server section, and the url of the control panel is known from
+    SOLUSVM_URL or the solusvm_url setting. The service in the clientarea, which holds the due date, changes
+    rarely. When the API is used and solusvm_service_ttl is set in the server section, the service is kept over
+    clear_cache for that number of seconds, so that polling the status only calls the API.
     """
 
+    # The url of the SolusVM control panel, for subclasses whose panel offers the client API
+    SOLUSVM_URL = None
+    # The unpaid invoices are listed in the WHMCS clientarea
+    supports_renewal = True
+
     def __init__(self, settings):
         super().__init__(settings)
         self._clientarea = None
+        self._service = None  # TimedCache of the service, only with solusvm_service_ttl
 
     def _create_clientarea(self):
         if self._clientarea is None:
-            self._clientarea = ClientArea(self._browser, self.get_clientarea_url(), self._settings)
+            self._clientarea = ClientArea(self._browser, self.get_clientarea_url(), self._get_profile())
         return self._clientarea
 
     '''
     Methods that are the same for all subclasses
     '''
 
+    def clear_cache(self):
+        super().clear_cache()
+        if self._clientarea is not None:
+            self._clientarea.clear_cache()
+        if self._get_service_ttl() is None:
+            self._service = None
+
+    def purchase(self, wallet, option, purchase_id=None):
+        try:
+            return super().purchase(wallet, option, purchase_id)
+        finally:
+            self._service = None
+
+    def renew(self, wallet, skip=None):
+        try:
+            return super().renew(wallet, skip)
+        finally:
+            self._service = None  # The paid invoices extend the due date
+
+    @memoize
     def get_configuration(self):
         clientarea = self._create_clientarea()
 
         ip = clientarea.get_ip()
-        password = self._settings.get('server', 'root_password')
+        password = self._get_profile().server.root_password
 
         return VpsConfiguration(ip, password)
 
-    def get_status(self):
+    @memoize
+    def get_configurations(self):
         clientarea = self._create_clientarea()
+        password = self._get_profile().server.root_password
 
-        service = clientarea.get_services_first()
+        return [VpsConfiguration(clientarea.get_ip(service), password)
+                for service in clientarea.get_services() if service.status == 'active']
+
+    @memoize
+    def get_status(self):
+        usage = self.get_usage()
+        service = self._get_service()
         online = True if service.status == 'active' else False
         expiration = service.next_due
 
+        if usage is not None:
+            return VpsStatus(usage.memory, usage.storage, usage.bandwidth, usage.online, expiration, service)
+
         return VpsStatus(
             VpsStatusResourceNone,
             VpsStatusResourceNone,
@@ -64,6 +110,49 @@ class SolusvmHoster(VpsHoster):
             service
         )
 
+    @memoize
+    def get_usage(self):
+        """Get the usage of the VPS from the SolusVM client API, without logging in to the clientarea.
+
+        :return: Returns SolusvmInfo, or None if the API is not available for this hoster or VPS
+        """
+        api = self._get_solusvm_api()
+        return api.get_info() if api is not None else None
+
+    def _get_service(self):
+        service = self._service.get('first') if self._service is not None else None
+        if service is None:
+            service = self._create_clientarea().get_services_first()
+            ttl = self._get_service_ttl()
+            if ttl is not None:
+                self._service = self._service or TimedCache(ttl)
+                self._service.put('first', service)
+        return service
+
+    def _get_service_ttl(self):
+        """Get the number of seconds the service is kept over clear_cache.
+
+        :return: Returns the solusvm_service_ttl setting, or None if it is not set or the API is not available
+        """
+        profile = self._get_profile()
+        if not profile.has_key('server', 'solusvm_service_ttl') or self._get_solusvm_api() is None:
+            return None
+        return float(profile.get('server', 'solusvm_service_ttl'))
+
+    def _get_renewal_invoices(self):
+        return self._create_clientarea().get_unpaid_invoices()
+
+    def _get_invoice_payment_url(self, invoice):
+        return self._create_clientarea().get_invoice_payment_url(invoice)
+
+    def _get_solusvm_api(self):
+        profile = self._get_profile()
+        url = profile.get('server', 'solusvm_url') if profile.has_key('server', 'solusvm_url') else self.SOLUSVM_URL
+        if not url or not profile.has_key('server', 'solusvm_key') or not profile.has_key('server', 'solusvm_hash'):
+            return None
+        return SolusvmApi(url, profile.get('server', 'solusvm_key'), profile.get('server', 'solusvm_hash'),
+                          session=self._browser.session)
+
     '''
     Static methods that must be overwritten by subclasses
     '''
@@ -86,21 +175,22 @@ class SolusvmHoster(VpsHoster):
 
         """
         form = self._browser.get_current_form()
+        server = self._get_profile().server
 
         try:
-            form['hostname'] = self._settings.get('server', 'hostname')
+            form['hostname'] = server.hostname
         except LinkNotFoundError:
             pass
 
         try:
-            form['rootpw'] = self._settings.get('server', 'root_password')
+            form['rootpw'] = server.root_password
         except LinkNotFoundError:
             # TODO: Properly handle this warning
             print('Couldn\'t set root password')
 
         try:
-            form['ns1prefix'] = self._settings.get('server', 'ns1')
-            form['ns2prefix'] = self._settings.get('server', 'ns2')
+            form['ns1prefix'] = server.ns1
+            form['ns2prefix'] = server.ns2
         except LinkNotFoundError:
             pass
 
@@ -117,19 +207,21 @@ class SolusvmHoster(VpsHoster):
         :return: the page received after submitted the form
         """
         form = self._browser.get_current_form()
-
-        form['firstname'] = self._settings.get('user', "firstname")
-        form['lastname'] = self._settings.get('user', "lastname")
-        form['email'] = self._settings.get('user', "email")
-        form['phonenumber'] = self._settings.get('user', "phonenumber")
-        form['companyname'] = self._settings.get('user', "companyname")
-        form['address1'] = self._settings.get('address', "address")
-        form['city'] = self._settings.get('address', "city")
-        form['state'] = self._settings.get('address', "state")
-        form['postcode'] = self._settings.get('address', "zipcode")
-        form['country'] = self._settings.get('address', 'countrycode')
-        form['password'] = self._settings.get('user', "password")
-        form['password2'] = self._settings.get('user', "password")
+        user = self._get_profile().user
+        address = self._get_profile().address
+
+        form['firstname'] = user.firstname
+        form['lastname'] = user.lastname
+        form['email'] = user.email
+        form['phonenumber'] = user.phonenumber
+        form['companyname'] = user.companyname
+        form['address1'] = address.address
+        form['city'] = address.city
+        form['state'] = address.state
+        form['postcode'] = address.zipcode
+        form['country'] = address.countrycode
+        form['password'] = user.password
+        form['password2'] = user.password
         form['paymentmethod'] = payment_method.lower()
 
         try:
@@ -143,7 +235,6 @@ class SolusvmHoster(VpsHoster):
         if 'checkout' in page.url:
             soup = BeautifulSoup(page.text, 'lxml')
             errors = soup.find('div', {'class': errorbox_class}).text
-            print((errors.strip()))
-            sys.exit(2)
+            raise CheckoutException(errors.strip())
 
         return page
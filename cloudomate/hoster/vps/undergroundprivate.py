@@ -4,13 +4,13 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import sys
-from builtins import int
 
 from future import standard_library
 
 from cloudomate.gateway.undergroundprivate import UndergroundPrivate as UndergroundPrivateGateway
 from cloudomate.hoster.vps import vps_hoster
 from cloudomate.hoster.vps.solusvm_hoster import SolusvmHoster
+from cloudomate.util import units
 
 standard_library.install_aliases()
 
@@ -68,22 +68,29 @@ class UndergroundPrivate(SolusvmHoster):
                 filtered_options.append(option)
         return filtered_options
 
-    def purchase(self, wallet, option):
+    def _get_purchase_steps(self, wallet, option):
+        return [
+            ('cart', lambda state: self._add_to_cart(option)),
+            ('checkout', self._checkout),
+            self._pay_step(wallet),
+        ]
+
+    '''
+    Hoster-specific methods that are needed to perform the actions
+    '''
+
+    def _add_to_cart(self, option):
         self._browser.open(option.purchase_url)
         self._submit_server_form()
+
+    def _checkout(self, state):
         self._browser.open(self.CART_URL)
         self._submit_user_form()
 
         # Retrieve the payment URL from an iFrame
         soup = self._browser.get_current_page()
         iframe = soup.select_one('iframe')
-        url = iframe['src']
-
-        self.pay(wallet, self.get_gateway(), url)
-
-    '''
-    Hoster-specific methods that are needed to perform the actions
-    '''
+        state['invoice_url'] = iframe['src']
 
     @staticmethod
     def _parse_box(box):
@@ -91,22 +98,15 @@ class UndergroundPrivate(SolusvmHoster):
 
         name = details[0].text.rstrip()
 
-        price = details[1].span.text
-        price = float(price[1:])
+        price = units.parse_price(details[1].span.text).amount
 
-        cores = details[2].text
-        cores = cores.split('\n')
-        cores = int(cores[1][0])
+        cores = units.parse_int(details[2].text)
 
-        memory = details[4].text
-        memory = float(memory[0])
+        memory = units.parse_gigabytes(details[4].text, 'GB')
 
-        storage = details[3].text
-        gb_index = storage.index('GB')
-        storage = storage[0:gb_index]
+        storage = units.parse_gigabytes(details[3].text, 'GB')
 
-        connection = details[6].text
-        connection = int(connection[0])
+        connection = units.parse_gbps(details[6].text)
 
         purchase_url = details[-1].p.span.a['href']
 
@@ -46,6 +46,13 @@ class VpsHoster(Hoster):
         """
         pass
 
+    def get_configurations(self):
+        """Get the configurations of all active services of the user.
+
+        :return: Returns a list of VpsConfiguration
+        """
+        return [self.get_configuration()]
+
     @classmethod
     @abstractmethod
     def get_options(cls):
@@ -0,0 +1,258 @@
+"""Continuous monitoring of the usage and expiration of services
+
+The monitor polls the status of a number of services on a schedule and appends the samples to a local
+time series file, one JSON object per line. Only the first sample of a service is stored in full, later
+samples store the seconds since the previous sample and the values that changed:
+
+{"k": "vps/linevast", "t": 1514764800.0, "f": {"memory.used": 0.5, "memory.total": 1.0, ...}}
+{"k": "vps/linevast", "dt": 300.0, "d": {"memory.used": 0.6}}
+{"k": "vps/linevast", "dt": 300.0}
+
+A service is only polled when its last stored sample is older than the interval, so a restarted monitor
+continues where it stopped, and the history can be read without polling the hosters again. A service whose
+status could not be read is not polled again until the interval has passed either. A key samples the
+status the hoster reports for its account, which is the first service of the client area. Threshold
+events are fired when the bandwidth of a service passes a fraction of its cap, or when its expiration
+comes within a number of days.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import calendar
+import datetime
+import json
+import os
+import sys
+import threading
+import time
+from builtins import object
+from builtins import open
+from collections import OrderedDict
+from collections import namedtuple
+
+from appdirs import user_data_dir
+from future import standard_library
+
+standard_library.install_aliases()
+
+MONITOR_INTERVAL = 5 * 60
+BANDWIDTH_THRESHOLD = 0.9
+EXPIRY_DAYS = 7
+
+BANDWIDTH = 'bandwidth'
+EXPIRATION = 'expiration'
+
+UsageSample = namedtuple('UsageSample', ['key',
+                                         'timestamp',
+                                         'values'])  # Dictionary of e.g. memory.used to its value
+ThresholdEvent = namedtuple('ThresholdEvent', ['key', 'kind', 'message', 'timestamp'])
+
+
+def get_usage_path():
+    return os.path.join(user_data_dir('cloudomate'), 'usage.ndjson')
+
+
+def status_values(status):
+    """
+    Flatten a VpsStatus or VpnStatus into a dictionary of values, with the expiration in seconds since the epoch
+    """
+    values = OrderedDict()
+    for name, value in status._asdict().items():
+        if name == 'clientarea':
+            continue
+        if isinstance(value, datetime.datetime):
+            values[name] = to_timestamp(value)
+        elif hasattr(value, '_asdict'):
+            for field, item in value._asdict().items():
+                values[name + '.' + field] = item
+        else:
+            values[name] = value
+    return values
+
+
+def to_timestamp(value):
+    if value.tzinfo is not None:
+        return calendar.timegm(value.utctimetuple())
+    return time.mktime(value.timetuple())
+
+
+class UsageStore(object):
+    """
+    UsageStore appends samples to a time series file and reads them back.
+
+    :param path: the file, defaults to usage.ndjson in the user data directory
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_usage_path()
+        self._latest = None
+        self._lock = threading.Lock()
+
+    def append(self, key, values, timestamp):
+        """
+        Store a sample as the difference with the previous sample of the same key
+        :return: the stored UsageSample
+        """
+        with self._lock:
+            latest = self._get_latest()
+            previous = latest.get(key)
+            if previous is None:
+                record = OrderedDict([('k', key), ('t', round(timestamp, 3)), ('f', values)])
+                sample = UsageSample(key, record['t'], dict(values))
+            else:
+                record = OrderedDict([('k', key), ('dt', round(timestamp - previous.timestamp, 3))])
+                changed = OrderedDict((name, value) for name, value in values.items()
+                                      if name not in previous.values or previous.values[name] != value)
+                removed = [name for name in previous.values if name not in values]
+                if changed:
+                    record['d'] = changed
+                if removed:
+                    record['r'] = removed
+                sample = UsageSample(key, previous.timestamp + record['dt'], dict(values))
+
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, separators=(',', ':')) + '\n')
+            latest[key] = sample
+            return sample
+
+    def latest(self):
+        """
+        :return: dictionary of key to the last UsageSample of that key
+        """
+        with self._lock:
+            return dict(self._get_latest())
+
+    def history(self, key=None, since=None):
+        """
+        :param key: only return the samples of this key
+        :param since: only return the samples taken at or after this time
+        :return: list of UsageSamples in the order they were taken
+        """
+        return [sample for sample in self._replay()
+                if (key is None or sample.key == key) and (since is None or sample.timestamp >= since)]
+
+    def _get_latest(self):
+        if self._latest is None:
+            self._latest = {}
+            for sample in self._replay():
+                self._latest[sample.key] = sample
+        return self._latest
+
+    def _replay(self):
+        if not os.path.exists(self.path):
+            return
+        state = {}
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A line that was cut off when the process died
+                key = record['k']
+                previous = state.get(key)
+                if 'f' in record or previous is None:
+                    sample = UsageSample(key, record.get('t', 0), dict(record.get('f', {})))
+                else:
+                    values = dict(previous.values)
+                    values.update(record.get('d', {}))
+                    for name in record.get('r', []):
+                        values.pop(name, None)
+                    sample = UsageSample(key, previous.timestamp + record['dt'], values)
+                state[key] = sample
+                yield sample
+
+
+class UsageMonitor(object):
+    """
+    UsageMonitor polls the status of services and fires threshold events.
+
+    :param targets: dictionary of the key of a service to the hoster instance of its account
+    :param store: the UsageStore to keep the samples in
+    :param interval: the number of seconds between two polls of a service
+    :param bandwidth_threshold: the fraction of the bandwidth cap at which an event is fired
+    :param expiry_days: the number of days before the expiration at which an event is fired
+    :param on_event: function called with every ThresholdEvent
+    """
+
+    def __init__(self, targets, store, interval=MONITOR_INTERVAL, bandwidth_threshold=BANDWIDTH_THRESHOLD,
+                 expiry_days=EXPIRY_DAYS, on_event=None, clock=time.time, sleep=time.sleep):
+        self.targets = targets
+        self.store = store
+        self.interval = interval
+        self.bandwidth_threshold = bandwidth_threshold
+        self.expiry_days = expiry_days
+        self._on_event = on_event or (lambda event: None)
+        self._clock = clock
+        self._sleep = sleep
+        self._stopped = threading.Event()
+        self._attempts = {}  # Key to the time of the last poll, also of polls that failed
+
+    def poll(self):
+        """
+        Poll the services whose last sample is older than the interval
+        :return: the fired ThresholdEvents
+        """
+        latest = self.store.latest()
+        events = []
+        for key in sorted(self.targets):
+            previous = latest.get(key)
+            now = self._clock()
+            if now < self._due(key, latest):
+                continue
+            self._attempts[key] = now
+            hoster = self.targets[key]
+            try:
+                hoster.clear_cache()
+                values = status_values(hoster.get_status())
+            except Exception as e:  # Scrapers fail with anything from a RequestException to an IndexError
+                print("Failed to poll {}: {}".format(key, e or e.__class__.__name__), file=sys.stderr)
+                continue
+            sample = self.store.append(key, values, now)
+            for event in self._check(previous, sample):
+                events.append(event)
+                self._on_event(event)
+        return events
+
+    def run(self, once=False):
+        while not self._stopped.is_set():
+            self.poll()
+            if once:
+                return
+            self._sleep(max(1.0, self._next_poll() - self._clock()))
+
+    def stop(self):
+        self._stopped.set()
+
+    def _next_poll(self):
+        latest = self.store.latest()
+        due = [self._due(key, latest) for key in self.targets]
+        return min(due) if due else self._clock() + self.interval
+
+    def _due(self, key, latest):
+        polled = [latest[key].timestamp] if key in latest else []
+        if key in self._attempts:
+            polled.append(self._attempts[key])
+        return max(polled) + self.interval if polled else self._clock()
+
+    def _check(self, previous, sample):
+        if self._bandwidth_exceeded(sample) and not (previous and self._bandwidth_exceeded(previous)):
+            used, total = sample.values['bandwidth.used'], sample.values['bandwidth.total']
+            yield ThresholdEvent(sample.key, BANDWIDTH, 'Bandwidth at {:.0%} of {:.0f} GB'.format(used / total, total),
+                                 sample.timestamp)
+        if self._expiring(sample) and not (previous and self._expiring(previous)):
+            days = (sample.values[EXPIRATION] - sample.timestamp) / (24 * 60 * 60)
+            yield ThresholdEvent(sample.key, EXPIRATION, 'Expires in {:.1f} days'.format(days), sample.timestamp)
+
+    def _bandwidth_exceeded(self, sample):
+        total = sample.values.get('bandwidth.total')
+        used = sample.values.get('bandwidth.used')
+        return total is not None and used is not None and total > 0 and used >= self.bandwidth_threshold * total
+
+    def _expiring(self, sample):
+        expiration = sample.values.get(EXPIRATION)
+        return expiration is not None and expiration - sample.timestamp <= self.expiry_days * 24 * 60 * 60
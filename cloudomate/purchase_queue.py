@@ -0,0 +1,382 @@
+"""Persistent queue of purchases drained by a pool of workers
+
+Purchases are stored in a SQLite database together with a snapshot of the settings they are made with, so
+that they can be submitted in bulk and performed later at a rate the hosters accept:
+
+queue = PurchaseQueue()
+queue.submit('vps', 'linevast', 0, settings, idempotency_key='node-17')
+PurchaseWorkerPool(queue, providers, purchase, workers=4, per_hoster=1).run()
+
+Submitting a purchase twice with the same idempotency key returns the existing job instead of queueing a
+second purchase. Every queue instance owns the jobs it claims and refreshes their heartbeat while they
+run, so several processes can share a database. Jobs whose heartbeat expired because the process running
+them died are marked interrupted instead of being retried automatically, as the payment may already have
+been made; they can be retried explicitly.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from builtins import object
+from builtins import range
+from builtins import str
+from collections import namedtuple
+
+from appdirs import user_data_dir
+from future import standard_library
+
+from cloudomate.exceptions.hoster_error import PaymentException
+from cloudomate.hoster.hoster import TRANSACTION_HASH
+from cloudomate.util.settings import Settings
+
+standard_library.install_aliases()
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+INTERRUPTED = 'interrupted'
+
+HEARTBEAT_INTERVAL = 10
+HEARTBEAT_TIMEOUT = 60
+
+PurchaseJob = namedtuple('PurchaseJob', ['id',
+                                         'idempotency_key',
+                                         'provider_type',
+                                         'provider',
+                                         'option',  # Index of the option in the options of the provider
+                                         'option_name',  # Name of the option when it was submitted
+                                         'settings',  # Dictionary of section to a dictionary of settings
+                                         'state',
+                                         'result',
+                                         'error',
+                                         'attempts',
+                                         'created',
+                                         'updated'])
+
+_COLUMNS = ', '.join(PurchaseJob._fields)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    idempotency_key TEXT UNIQUE,
+    provider_type TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    option INTEGER NOT NULL,
+    option_name TEXT,
+    settings TEXT NOT NULL,
+    state TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    owner TEXT,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created);
+'''
+
+# Columns added to the jobs table after its first release
+_MIGRATIONS = [('owner', 'TEXT'), ('heartbeat', 'REAL')]
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def get_queue_path():
+    return os.path.join(user_data_dir('cloudomate'), 'purchases.db')
+
+
+def settings_to_dict(settings):
+    """
+    Take a snapshot of a Settings object that can be stored as JSON, with its selected profile resolved
+    """
+    return settings.to_dict()
+
+
+def settings_from_dict(values):
+    settings = Settings()
+    for section, items in values.items():
+        for key, value in items.items():
+            settings.put(section, key, value)
+    return settings
+
+
+class PurchaseQueue(object):
+    """
+    PurchaseQueue stores purchase jobs in a SQLite database.
+
+    :param path: the database file, defaults to purchases.db in the user data directory
+    :param max_size: the maximum number of queued jobs, unbounded if None
+    :param owner: the identifier of the jobs claimed through this queue, unique per instance if None
+    """
+
+    def __init__(self, path=None, max_size=None, owner=None):
+        self.path = path or get_queue_path()
+        self.max_size = max_size
+        self.owner = owner or uuid.uuid4().hex
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        columns = [row[1] for row in self._connection.execute('PRAGMA table_info(jobs)')]
+        for name, column_type in _MIGRATIONS:
+            if name not in columns:
+                self._connection.execute('ALTER TABLE jobs ADD COLUMN {} {}'.format(name, column_type))
+        self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    @staticmethod
+    def _to_job(row):
+        job = PurchaseJob(*row)
+        return job._replace(settings=json.loads(job.settings))
+
+    def submit(self, provider_type, provider, option, settings, option_name=None, idempotency_key=None):
+        """
+        Queue a purchase
+        :param provider_type: vps or vpn, case insensitive
+        :param provider: the name of the provider as in the provider registry, e.g. linevast, case insensitive
+        :param option: index of the option in the options of the provider
+        :param settings: the Settings to purchase with, stored as a snapshot
+        :param idempotency_key: key identifying the purchase, submitting the same key again returns the existing job
+        :return: the PurchaseJob
+        """
+        # The per hoster limit of the workers compares the names, so they are stored as the registry keys
+        provider_type = provider_type.lower()
+        provider = provider.lower()
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if idempotency_key is not None:
+                existing = self._get_by_key(idempotency_key)
+                if existing is not None:
+                    return existing
+            if self.max_size is not None:
+                queued, = self._connection.execute('SELECT COUNT(*) FROM jobs WHERE state = ?', (QUEUED,)).fetchone()
+                if queued >= self.max_size:
+                    raise QueueFullError('The queue already holds {} purchases'.format(queued))
+            try:
+                self._connection.execute(
+                    'INSERT INTO jobs ({}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'.format(_COLUMNS),
+                    (job_id, idempotency_key, provider_type, provider, option, option_name,
+                     json.dumps(settings_to_dict(settings)), QUEUED, None, None, 0, now, now))
+            except sqlite3.IntegrityError:
+                # Another process submitted the same key since the lookup above
+                self._connection.rollback()
+                existing = self._get_by_key(idempotency_key) if idempotency_key is not None else None
+                if existing is None:
+                    raise
+                return existing
+            self._connection.commit()
+        return self.get(job_id)
+
+    def _get_by_key(self, idempotency_key):
+        row = self._connection.execute('SELECT {} FROM jobs WHERE idempotency_key = ?'.format(_COLUMNS),
+                                       (idempotency_key,)).fetchone()
+        return self._to_job(row) if row is not None else None
+
+    def get(self, job_id):
+        rows = self._query('SELECT {} FROM jobs WHERE id = ?'.format(_COLUMNS), (job_id,))
+        return self._to_job(rows[0]) if rows else None
+
+    def get_by_key(self, idempotency_key):
+        rows = self._query('SELECT {} FROM jobs WHERE idempotency_key = ?'.format(_COLUMNS), (idempotency_key,))
+        return self._to_job(rows[0]) if rows else None
+
+    def list(self, state=None):
+        if state is None:
+            rows = self._query('SELECT {} FROM jobs ORDER BY created'.format(_COLUMNS))
+        else:
+            rows = self._query('SELECT {} FROM jobs WHERE state = ? ORDER BY created'.format(_COLUMNS), (state,))
+        return [self._to_job(row) for row in rows]
+
+    def count(self, state):
+        (count,), = self._query('SELECT COUNT(*) FROM jobs WHERE state = ?', (state,))
+        return count
+
+    def claim(self, exclude=()):
+        """
+        Mark the oldest queued job as running
+        :param exclude: (provider type, provider) tuples whose jobs should be skipped
+        :return: the claimed PurchaseJob, or None if there is no job to run
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT id, provider_type, provider FROM jobs WHERE state = ? ORDER BY created', (QUEUED,)).fetchall()
+            for job_id, provider_type, provider in rows:
+                if (provider_type, provider) in exclude:
+                    continue
+                now = time.time()
+                self._connection.execute(
+                    'UPDATE jobs SET state = ?, attempts = attempts + 1, updated = ?, owner = ?, heartbeat = ? '
+                    'WHERE id = ?', (RUNNING, now, self.owner, now, job_id))
+                self._connection.commit()
+                break
+            else:
+                return None
+        return self.get(job_id)
+
+    def finish(self, job_id, result=None, error=None):
+        state = FAILED if error is not None else DONE
+        self._update(job_id, state, result=result, error=error)
+
+    def retry(self, job_id):
+        """
+        Queue a failed or interrupted job again
+        """
+        job = self.get(job_id)
+        if job is None or job.state not in (FAILED, INTERRUPTED):
+            raise ValueError('Only failed or interrupted jobs can be retried')
+        self._update(job_id, QUEUED)
+
+    def heartbeat(self):
+        """
+        Mark the running jobs claimed through this queue as alive
+        """
+        with self._lock:
+            self._connection.execute('UPDATE jobs SET heartbeat = ? WHERE state = ? AND owner = ?',
+                                     (time.time(), RUNNING, self.owner))
+            self._connection.commit()
+
+    def recover(self, timeout=HEARTBEAT_TIMEOUT):
+        """
+        Mark the jobs left running by a process that died as interrupted
+        :param timeout: the number of seconds after its last heartbeat at which a running job is considered dead
+        :return: the number of interrupted jobs
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._connection.execute(
+                'UPDATE jobs SET state = ?, updated = ? WHERE state = ? AND (owner IS NULL OR owner != ?) '
+                'AND (heartbeat IS NULL OR heartbeat < ?)', (INTERRUPTED, now, RUNNING, self.owner, now - timeout))
+            self._connection.commit()
+            return cursor.rowcount
+
+    def _update(self, job_id, state, result=None, error=None):
+        with self._lock:
+            self._connection.execute('UPDATE jobs SET state = ?, result = ?, error = ?, updated = ? WHERE id = ?',
+                                     (state, result, error, time.time(), job_id))
+            self._connection.commit()
+
+
+class PurchaseWorkerPool(object):
+    """
+    PurchaseWorkerPool performs the queued purchases with a number of worker threads.
+
+    :param providers: dictionary of provider type to a dictionary of provider name to hoster class
+    :param purchase: function called with the hoster class, option and Settings to perform a purchase, returning
+    the transaction hash of the payment
+    :param workers: the number of concurrent purchases
+    :param per_hoster: the maximum number of concurrent purchases at a single hoster
+    :param heartbeat_interval: the number of seconds between two heartbeats of the running jobs
+    """
+
+    def __init__(self, queue, providers, purchase, workers=4, per_hoster=1, poll_interval=1.0,
+                 heartbeat_interval=HEARTBEAT_INTERVAL):
+        self.queue = queue
+        self.providers = providers
+        self.purchase = purchase
+        self.workers = workers
+        self.per_hoster = per_hoster
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._last_heartbeat = time.time()
+
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def run(self, drain=True):
+        """
+        Perform queued purchases until stopped
+        :param drain: return as soon as there are no more queued jobs
+        """
+        self.queue.recover()
+        threads = [threading.Thread(target=self._work, args=(drain,)) for _ in range(self.workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(self.poll_interval)
+                    self._beat()
+        except KeyboardInterrupt:
+            self.stop()
+            raise
+
+    def stop(self):
+        self._stop.set()
+
+    def _beat(self):
+        """
+        Keep the running jobs of this pool alive and interrupt the jobs of processes that died meanwhile
+        """
+        if time.time() - self._last_heartbeat < self.heartbeat_interval:
+            return
+        self._last_heartbeat = time.time()
+        self.queue.heartbeat()
+        self.queue.recover()
+
+    def _claim(self):
+        with self._lock:
+            full = [key for key, running in self._running.items() if running >= self.per_hoster]
+            job = self.queue.claim(exclude=full)
+            if job is not None:
+                key = (job.provider_type, job.provider)
+                self._running[key] = self._running.get(key, 0) + 1
+            return job
+
+    def _release(self, job):
+        with self._lock:
+            self._running[(job.provider_type, job.provider)] -= 1
+
+    def _work(self, drain):
+        while not self._stop.is_set():
+            job = self._claim()
+            if job is None:
+                if drain and self.queue.count(QUEUED) == 0:
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                self._perform(job)
+            finally:
+                self._release(job)
+
+    def _perform(self, job):
+        try:
+            hoster = self.providers[job.provider_type][job.provider]
+            options = hoster.get_options()
+            if not 0 <= job.option < len(options):
+                raise ValueError('Option {} is no longer available'.format(job.option))
+            option = options[job.option]
+            if job.option_name is not None and option.name != job.option_name:
+                raise ValueError("Option {} is now '{}' instead of '{}'".format(job.option, option.name,
+                                                                                job.option_name))
+            result = self.purchase(hoster, option, settings_from_dict(job.settings))
+            if result is None or not TRANSACTION_HASH.match(str(result)):
+                raise PaymentException('The purchase was not paid: {}'.format(result))
+        except Exception as e:
+            self.queue.finish(job.id, error=str(e) or e.__class__.__name__)
+        else:
+            self.queue.finish(job.id, result=str(result))
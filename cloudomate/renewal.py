@@ -0,0 +1,243 @@
+"""Automatic renewal of services before they expire
+
+The scheduler keeps the services in a priority queue ordered by the time their renewal window opens, which is
+a number of days before their expiration. It sleeps until the first window opens, so a fleet of services
+costs nothing between renewals: the status of a service is only read when it is scheduled, and again after
+its renewal to find the next expiration.
+
+When the window of a service opens, its unpaid invoices are paid with Hoster.renew, through the extract_info
+of the gateway of the hoster and Wallet.pay. As long as the service is not extended, for example because
+the hoster has not created the invoice yet or the payment is not confirmed, it is retried after an interval.
+The ids of the paid invoices are stored in the purchase queue database as soon as they are paid, so that an
+invoice whose payment is not confirmed yet is not paid a second time, not even after a restart.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import heapq
+import itertools
+import os
+import sqlite3
+import sys
+import threading
+import time
+from builtins import object
+from builtins import str
+from collections import namedtuple
+
+from future import standard_library
+
+from cloudomate.monitor import to_timestamp
+from cloudomate.purchase_queue import get_queue_path
+
+standard_library.install_aliases()
+
+RENEWAL_DAYS = 3
+RETRY_INTERVAL = 60 * 60
+
+RenewalEvent = namedtuple('RenewalEvent', ['key',
+                                           'invoices',  # Dictionary of invoice id to transaction hash
+                                           'expiration',  # The expiration in seconds since the epoch
+                                           'next_due',  # When the service is renewed next, None if never
+                                           'timestamp'])
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS paid_invoices (
+    key TEXT NOT NULL,
+    invoice TEXT NOT NULL,
+    paid REAL NOT NULL,
+    PRIMARY KEY (key, invoice)
+);
+'''
+
+
+class PaidInvoices(object):
+    """
+    PaidInvoices stores the ids of the invoices paid for services in a SQLite database.
+
+    :param path: the database file, defaults to the purchase queue database in the user data directory
+    """
+
+    def __init__(self, path=None):
+        self.path = path or get_queue_path()
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        self._connection.executescript(_SCHEMA)
+        self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def of(self, key):
+        """
+        :return: the set of the ids of the invoices paid for a service, adding an id to it stores it
+        """
+        return _PaidInvoiceSet(self, key)
+
+    def contains(self, key, invoice):
+        with self._lock:
+            row = self._connection.execute('SELECT 1 FROM paid_invoices WHERE key = ? AND invoice = ?',
+                                           (key, str(invoice))).fetchone()
+        return row is not None
+
+    def add(self, key, invoice):
+        with self._lock:
+            self._connection.execute('INSERT OR IGNORE INTO paid_invoices (key, invoice, paid) VALUES (?, ?, ?)',
+                                     (key, str(invoice), time.time()))
+            self._connection.commit()
+
+
+class _PaidInvoiceSet(object):
+    def __init__(self, invoices, key):
+        self._invoices = invoices
+        self._key = key
+
+    def __contains__(self, invoice):
+        return self._invoices.contains(self._key, invoice)
+
+    def add(self, invoice):
+        self._invoices.add(self._key, invoice)
+
+
+class RenewalScheduler(object):
+    """
+    RenewalScheduler renews services when their renewal window opens.
+
+    :param targets: dictionary of the key of a service to the hoster instance of its account
+    :param wallet: the Wallet to pay the invoices with
+    :param renewal_days: the number of days before the expiration at which a service is renewed
+    :param retry_interval: the number of seconds after which a renewal that did not extend the service is retried
+    :param on_renewal: function called with a RenewalEvent after every renewal attempt that paid invoices
+    :param paid: the PaidInvoices to keep the paid invoices in, the default database if None
+    """
+
+    def __init__(self, targets, wallet, renewal_days=RENEWAL_DAYS, retry_interval=RETRY_INTERVAL, on_renewal=None,
+                 paid=None, clock=time.time, wait=None):
+        unsupported = sorted(key for key, hoster in targets.items() if not hoster.supports_renewal)
+        if unsupported:
+            raise ValueError('Renewing is not supported for {}'.format(', '.join(unsupported)))
+        self.targets = targets
+        self.wallet = wallet
+        self.renewal_days = renewal_days
+        self.retry_interval = retry_interval
+        self._on_renewal = on_renewal or (lambda event: None)
+        self._clock = clock
+        self._stopped = threading.Event()
+        self._wait = wait or self._stopped.wait
+
+        self._queue = []  # Heap of (next due, sequence number, key) entries
+        self._entries = {}  # Key to its current entry in the queue, older entries of the key are skipped
+        self._paid = paid or PaidInvoices()
+        self._unread = set()  # Keys whose status could not be read, read again instead of renewed when due
+        self._sequence = itertools.count()
+
+    def schedule(self, key, expiration=None):
+        """
+        Schedule the renewal of a service
+        :param expiration: the expiration in seconds since the epoch, read from the status of the service if None
+        :return: the time at which the service is renewed, None if its expiration is unknown
+        """
+        if expiration is None:
+            expiration = self._get_expiration(key)
+            if expiration is None:
+                return None
+        return self._push(key, expiration - self.renewal_days * 24 * 60 * 60)
+
+    def next_due(self, key=None):
+        """
+        :param key: the service, or None for the first service to be renewed
+        :return: the time at which the service is renewed, None if it is not scheduled
+        """
+        if key is not None:
+            return self._entries[key][0] if key in self._entries else None
+        self._discard_outdated()
+        return self._queue[0][0] if self._queue else None
+
+    def run_pending(self):
+        """
+        Renew the services whose renewal window has opened
+        :return: the RenewalEvents of the renewals that paid invoices
+        """
+        events = []
+        while True:
+            self._discard_outdated()
+            if not self._queue or self._queue[0][0] > self._clock():
+                return events
+            _, _, key = heapq.heappop(self._queue)
+            del self._entries[key]
+            if key in self._unread:
+                self._unread.discard(key)
+                self.schedule(key)
+                continue
+            event = self._renew(key)
+            if event is not None:
+                events.append(event)
+                self._on_renewal(event)
+
+    def run(self, once=False):
+        """
+        Schedule all targets and renew them until stopped
+        :param once: return after renewing the services whose window is already open
+        """
+        for key in sorted(self.targets):
+            if key not in self._entries:
+                self.schedule(key)
+        while not self._stopped.is_set():
+            self.run_pending()
+            next_due = self.next_due()
+            if once or next_due is None:
+                return
+            self._wait(max(1.0, next_due - self._clock()))
+
+    def stop(self):
+        self._stopped.set()
+
+    def _push(self, key, next_due):
+        entry = self._entries[key] = (next_due, next(self._sequence), key)
+        heapq.heappush(self._queue, entry)
+        return next_due
+
+    def _discard_outdated(self):
+        while self._queue and self._entries.get(self._queue[0][2]) is not self._queue[0]:
+            heapq.heappop(self._queue)
+
+    def _retry_later(self, key):
+        self._unread.add(key)
+        self._push(key, self._clock() + self.retry_interval)
+
+    def _get_expiration(self, key):
+        hoster = self.targets[key]
+        try:
+            hoster.clear_cache()
+            expiration = hoster.get_status().expiration
+        except Exception as e:  # Scrapers fail with anything from a RequestException to an IndexError
+            print("Failed to read the expiration of {}: {}".format(key, e or e.__class__.__name__), file=sys.stderr)
+            self._retry_later(key)
+            return None
+        return to_timestamp(expiration) if expiration is not None else None
+
+    def _renew(self, key):
+        hoster = self.targets[key]
+        try:
+            invoices = hoster.renew(self.wallet, skip=self._paid.of(key))
+        except Exception as e:
+            print("Failed to renew {}: {}".format(key, e or e.__class__.__name__), file=sys.stderr)
+            self._retry_later(key)  # The failure may have come after a payment that extended the service
+            return None
+
+        expiration = self._get_expiration(key)
+        if expiration is None:
+            return None
+        next_due = self.schedule(key, expiration)
+        if next_due <= self._clock():
+            next_due = self._push(key, self._clock() + self.retry_interval)  # Not extended yet
+        if not invoices:
+            return None
+        return RenewalEvent(key, invoices, expiration, next_due, self._clock())
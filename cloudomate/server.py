@@ -0,0 +1,360 @@
+"""Long-running HTTP/JSON service exposing the cloudomate commands
+
+Unlike the command line, the service keeps the hoster instances (and with them their browser sessions and
+connections), the option and status caches, the exchange rate and fee caches and the wallet in memory
+between requests. Purchases are stored in the purchase queue and performed by a pool of workers, so queued
+purchases survive a restart and are shared with `cloudomate queue`.
+
+Endpoints:
+GET  /providers                        the available providers per type
+GET  /<type>/<provider>/options        the options of a provider, with estimated prices
+GET  /<type>/<provider>/status         the status of the service of the configured user
+GET  /<type>/<provider>/info           the configuration (e.g. ip address) of the service
+POST /<type>/<provider>/purchase       queue a purchase, body: {"option": 0, "settings": {"user": {...}}, "key": "..."}
+GET  /jobs/<id>                        the state of a queued purchase
+
+Start it with:
+cloudomate serve --port 8000 --warm
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import threading
+import traceback
+from builtins import object
+from builtins import str
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from future import standard_library
+from future.moves.urllib.parse import urlparse
+
+from cloudomate.exceptions.hoster_error import HosterException
+from cloudomate.purchase_queue import PurchaseQueue, PurchaseWorkerPool
+from cloudomate.util import pricing
+from cloudomate.util.cache import TimedCache
+from cloudomate.util.output import to_json
+from cloudomate.util.settings import Settings
+from cloudomate.wallet import Wallet
+
+standard_library.install_aliases()
+
+OPTIONS_CACHE_TTL = 10 * 60
+STATUS_CACHE_TTL = 60
+PURCHASE_WORKERS = 2
+
+
+class UnknownProviderError(KeyError):
+    pass
+
+
+def _job_to_dict(job):
+    """
+    Convert a PurchaseJob to its JSON representation, leaving out the settings as they hold the user's password
+    """
+    result = job._asdict()
+    del result['settings']
+    return result
+
+
+class CloudomateService(object):
+    """
+    CloudomateService performs the commands and holds the state that is kept warm between requests.
+
+    :param providers: dictionary of provider type to a dictionary of provider name to hoster class
+    :param config: the settings file to use, defaults to the default settings file
+    :param queue: the PurchaseQueue holding the purchases, defaults to the default purchase queue
+    """
+
+    def __init__(self, providers, config=None, option_ttl=OPTIONS_CACHE_TTL, status_ttl=STATUS_CACHE_TTL,
+                 workers=PURCHASE_WORKERS, wallet_factory=None, queue=None):
+        self.providers = providers
+        self.config = config
+        self.settings = self._read_settings()
+        self.queue = queue or PurchaseQueue()
+
+        self._options = TimedCache(option_ttl)
+        self._status = TimedCache(status_ttl)
+        self._info = TimedCache(status_ttl)
+        self._hosters = {}
+        self._hoster_locks = {}
+        self._wallet = None
+        self._wallet_factory = wallet_factory or self._create_wallet
+        self._lock = threading.Lock()
+        self._pool = PurchaseWorkerPool(self.queue, providers, self._purchase, workers=workers)
+        self._pool_thread = None
+
+    def _read_settings(self, overrides=None):
+        settings = Settings()
+        settings.read_settings(filename=self.config)
+        for section, values in (overrides or {}).items():
+            for key, value in values.items():
+                settings.put(section, key, value)
+        return settings
+
+    def _create_wallet(self):
+        if self.settings.has_key('client', 'walletpath'):
+            return Wallet(wallet_path=self.settings.get('client', 'walletpath'))
+        return Wallet()
+
+    def get_wallet(self):
+        with self._lock:
+            if self._wallet is None:
+                self._wallet = self._wallet_factory()
+            return self._wallet
+
+    def get_provider(self, provider_type, provider):
+        try:
+            return self.providers[provider_type][provider]
+        except KeyError:
+            raise UnknownProviderError('{}/{}'.format(provider_type, provider))
+
+    def _get_hoster(self, provider_type, provider):
+        """
+        Get the warm hoster instance for the configured user, together with the lock serializing its use
+        """
+        key = (provider_type, provider)
+        with self._lock:
+            if key not in self._hosters:
+                self._hosters[key] = self.get_provider(provider_type, provider)(self.settings)
+                self._hoster_locks[key] = threading.Lock()
+            return self._hosters[key], self._hoster_locks[key]
+
+    def list_providers(self):
+        result = {}
+        for provider_type, providers in self.providers.items():
+            result[provider_type] = []
+            for name, provider in providers.items():
+                display_name, website = provider.get_metadata()
+                result[provider_type].append({'provider': name, 'name': display_name, 'website': website})
+        return result
+
+    def get_options(self, provider_type, provider):
+        key = (provider_type, provider)
+        options = self._options.get(key)
+        if options is None:
+            hoster = self.get_provider(provider_type, provider)
+            options = hoster.get_options()
+            self._options.put(key, options)
+        return options
+
+    def get_priced_options(self, provider_type, provider):
+        options = self.get_options(provider_type, provider)
+        estimates = pricing.estimate_option_prices(options, self.get_provider(provider_type, provider).get_gateway())
+        result = []
+        for option, estimate in zip(options, estimates):
+            priced = to_json(option)
+            priced['estimated_mbtc'] = estimate.mbtc
+            result.append(priced)
+        return result
+
+    def get_status(self, provider_type, provider):
+        key = (provider_type, provider)
+        status = self._status.get(key)
+        if status is None:
+            hoster, lock = self._get_hoster(provider_type, provider)
+            with lock:
+                # The hoster keeps the pages it fetched, only this cache decides when they are outdated
+                hoster.clear_cache()
+                status = hoster.get_status()
+            self._status.put(key, status)
+        return status
+
+    def get_info(self, provider_type, provider):
+        key = (provider_type, provider)
+        info = self._info.get(key)
+        if info is None:
+            hoster, lock = self._get_hoster(provider_type, provider)
+            with lock:
+                hoster.clear_cache()
+                info = hoster.get_configuration()
+            self._info.put(key, info)
+        return info
+
+    def submit_purchase(self, provider_type, provider, option, overrides=None, idempotency_key=None):
+        """
+        Queue the purchase of an option
+        :param option: index of the option in the options of the provider
+        :param overrides: dictionary of section to a dictionary of settings replacing the configured ones
+        :param idempotency_key: key identifying the purchase, submitting the same key again returns the existing job
+        :return: the queued PurchaseJob
+        """
+        hoster = self.get_provider(provider_type, provider)
+        options = self.get_options(provider_type, provider)
+        if not 0 <= option < len(options):
+            raise ValueError('Option {} is not in range 0-{}'.format(option, len(options) - 1))
+        settings = self._read_settings(overrides)
+        if not settings.verify_options(hoster.get_required_settings()):
+            raise ValueError('Missing settings for {}'.format(provider))
+        return self.queue.submit(provider_type, provider, option, settings, option_name=options[option].name,
+                                 idempotency_key=idempotency_key)
+
+    def _purchase(self, hoster, option, settings):
+        try:
+            return hoster(settings).purchase(self.get_wallet(), option)
+        finally:
+            self._status.clear()
+            self._info.clear()
+            self._clear_hosters()
+
+    def _clear_hosters(self):
+        with self._lock:
+            hosters = [(self._hosters[key], self._hoster_locks[key]) for key in self._hosters]
+        for hoster, lock in hosters:
+            with lock:
+                hoster.clear_cache()
+
+    def get_job(self, job_id):
+        return self.queue.get(job_id)
+
+    def start(self):
+        """
+        Start performing the queued purchases in the background
+        """
+        if self._pool_thread is None:
+            self._pool_thread = threading.Thread(target=self._pool.run, kwargs={'drain': False})
+            self._pool_thread.daemon = True
+            self._pool_thread.start()
+
+    def warm(self):
+        """
+        Fill the option caches, the exchange rate cache and the hoster sessions in the background
+        :return: the started thread
+        """
+        thread = threading.Thread(target=self._warm)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _warm(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for provider_type, providers in self.providers.items():
+                for provider in providers:
+                    executor.submit(self._warm_provider, provider_type, provider)
+
+    def _warm_provider(self, provider_type, provider):
+        try:
+            self.get_priced_options(provider_type, provider)
+        except Exception as e:
+            print("Failed to warm {}/{}: {}".format(provider_type, provider, e))
+
+    def shutdown(self):
+        self._pool.stop()
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _ServiceRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def _handle(self, method):
+        service = self.server.service
+        parts = [part for part in urlparse(self.path).path.split('/') if part]
+        try:
+            body = self._read_body() if method == 'POST' else {}
+            if method == 'GET' and parts == ['providers']:
+                return self._send(200, service.list_providers())
+            if method == 'GET' and len(parts) == 2 and parts[0] == 'jobs':
+                job = service.get_job(parts[1])
+                if job is None:
+                    return self._send(404, {'error': 'Unknown job'})
+                return self._send(200, _job_to_dict(job))
+            if len(parts) == 3:
+                return self._handle_provider(method, parts[0], parts[1], parts[2], body)
+            self._send(404, {'error': 'Not found'})
+        except UnknownProviderError as e:
+            self._send(404, {'error': 'Unknown provider: {}'.format(e.args[0])})
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+        except HosterException as e:
+            self._send(503 if e.retryable else 502, {'error': str(e), 'retryable': e.retryable})
+        except Exception as e:
+            self.log_error('Failed to handle %s %s\n%s', method, self.path, traceback.format_exc())
+            self._send(500, {'error': str(e) or e.__class__.__name__})
+
+    def _handle_provider(self, method, provider_type, provider, action, body):
+        service = self.server.service
+        if method == 'GET' and action == 'options':
+            return self._send(200, service.get_priced_options(provider_type, provider))
+        if method == 'GET' and action == 'status':
+            return self._send(200, to_json(service.get_status(provider_type, provider)))
+        if method == 'GET' and action == 'info':
+            return self._send(200, to_json(service.get_info(provider_type, provider)))
+        if method == 'POST' and action == 'purchase':
+            if not isinstance(body.get('option', 0), int):
+                raise ValueError('Option must be a number')
+            job = service.submit_purchase(provider_type, provider, body.get('option', 0), body.get('settings'),
+                                          idempotency_key=body.get('key'))
+            return self._send(202, _job_to_dict(job))
+        self._send(404, {'error': 'Not found'})
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length).decode('utf-8'))
+        except ValueError:
+            raise ValueError('Invalid JSON body')
+
+    def _send(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class CloudomateServer(object):
+    """
+    CloudomateServer serves a CloudomateService over HTTP in a background thread.
+    """
+
+    def __init__(self, service, host='127.0.0.1', port=8000, verbose=False):
+        self.service = service
+        self._server = _ThreadingHTTPServer((host, port), _ServiceRequestHandler)
+        self._server.service = service
+        self._server.verbose = verbose
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    def start(self):
+        self.service.start()
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self.service.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,112 @@
+"""Offline benchmarks of the hoster scrapers
+
+Replays the recorded conversations in resources/cassettes and reports, for every hoster and scenario,
+the number of requests, the latency of the recorded conversation and the time spent processing the
+replayed responses (parsing and form handling, as no time is spent on the network).
+
+No cassettes are shipped, as they contain the pages of live accounts. Record them from the live hosters
+first (the purchase scenario places an order, but never pays it):
+python -m cloudomate.test.benchmark_hosters --record --scenario options linevast
+
+Replay all recorded cassettes:
+python -m cloudomate.test.benchmark_hosters
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from future import standard_library
+from mock import MagicMock, patch
+
+from cloudomate.cmdline import providers
+from cloudomate.util import recorder
+from cloudomate.util.settings import Settings
+
+standard_library.install_aliases()
+
+CASSETTE_DIR = os.path.join(os.path.dirname(__file__), 'resources', 'cassettes')
+SETTINGS_FILE = os.path.join(os.path.dirname(__file__), 'resources', 'test_settings.cfg')
+SCENARIOS = ['options', 'status', 'purchase']
+
+
+def cassette_path(hoster, scenario):
+    name, _ = hoster.get_metadata()
+    return os.path.join(CASSETTE_DIR, '{}_{}.json'.format(name.lower(), scenario))
+
+
+def run_scenario(hoster, scenario, settings):
+    if scenario == 'options':
+        hoster.get_options()
+    elif scenario == 'status':
+        hoster(settings).get_status()
+    elif scenario == 'purchase':
+        option = hoster.get_options()[0]
+        checkpoint_dir = tempfile.mkdtemp()  # Never resume a purchase left behind by an earlier run
+        try:
+            with patch.object(hoster, 'pay'), patch.object(hoster, 'checkpoint_dir', checkpoint_dir):
+                hoster(settings).purchase(MagicMock(), option)
+        finally:
+            shutil.rmtree(checkpoint_dir)
+
+
+def benchmark(hoster, scenario, settings, mode=recorder.REPLAY):
+    """
+    Run a scenario of a hoster against its cassette
+    :return: tuple of request count, recorded latency and processing time in seconds
+    """
+    path = cassette_path(hoster, scenario)
+    with recorder.use_cassette(path, mode) as cassette:
+        start = time.time()
+        run_scenario(hoster, scenario, settings)
+        wall_time = time.time() - start
+
+    latency = sum(interaction['elapsed'] for interaction in cassette.interactions)
+    if mode == recorder.RECORD:
+        return len(cassette.interactions), latency, wall_time - cassette.transport_time
+    return cassette.play_count, latency, wall_time
+
+
+def main(argv=sys.argv[1:]):
+    parser = ArgumentParser(description="Benchmark hoster scrapers against recorded conversations")
+    parser.add_argument("hosters", nargs="*", help="Hosters to benchmark, defaults to all")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenarios to run")
+    parser.add_argument("--record", action="store_true", help="Record new cassettes from the live hosters")
+    parser.add_argument("-c", "--config", help="Settings file used for status and purchase",
+                        default=SETTINGS_FILE)
+    args = parser.parse_args(argv)
+
+    settings = Settings()
+    settings.read_settings(args.config)
+    mode = recorder.RECORD if args.record else recorder.REPLAY
+    available = list(providers['vps'].values()) + list(providers['vpn'].values())
+    if args.hosters:
+        names = [name.lower() for name in args.hosters]
+        hosters = [hoster for hoster in available if hoster.get_metadata()[0].lower() in names]
+    else:
+        hosters = available
+
+    row = "{:20}{:10}{:>10}{:>14}{:>16}"
+    print(row.format("Hoster", "Scenario", "Requests", "Latency (s)", "Processing (s)"))
+    for hoster in hosters:
+        for scenario in args.scenario or SCENARIOS:
+            if mode == recorder.REPLAY and not os.path.exists(cassette_path(hoster, scenario)):
+                continue
+            name, _ = hoster.get_metadata()
+            try:
+                requests, latency, processing = benchmark(hoster, scenario, settings, mode)
+            except Exception as e:
+                print(row.format(name, scenario, "failed", "", "") + "  " + str(e))
+                continue
+            print(row.format(name, scenario, requests, '{:.3f}'.format(latency), '{:.3f}'.format(processing)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+from future import standard_library
+
+from cloudomate.util.bitcoinaddress import decode_base58, encode_base58, validate, validate_bech32, validate_many
+
+standard_library.install_aliases()
+
+
+class TestBitcoinAddress(unittest.TestCase):
+    def test_validate(self):
+        self.assertTrue(validate('1AGNa15ZQXAZUgFiqJ2i7Z2DPU2J6hW62i'))
+
+    def test_validate_bad_checksum(self):
+        self.assertFalse(validate('1AGNa15ZQXAZUgFiqJ2i7Z2DPU2J6hW62j'))
+
+    def test_validate_invalid_character(self):
+        self.assertFalse(validate('1AGNa15ZQXAZUgFiqJ2i7Z2DPU2J6hW60i'))
+
+    def test_validate_magic_byte(self):
+        self.assertFalse(validate('3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy'))
+        self.assertTrue(validate('3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy', (0, 5)))
+
+    def test_validate_overflow(self):
+        self.assertFalse(validate('z' * 35))
+
+    def test_encode_roundtrip(self):
+        address = '12cWmVndhmD56dzYcRuYka3Vpgjb3qdRoL'
+        self.assertEqual(encode_base58(decode_base58(address, 25)), address)
+
+    def test_validate_bech32(self):
+        self.assertTrue(validate_bech32('bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4'))
+        self.assertTrue(validate_bech32('BC1QW508D6QEJXTDG4Y5R3ZARVARY0C5XW7KV8F3T4'))
+
+    def test_validate_bech32m(self):
+        self.assertTrue(validate_bech32('bc1p5d7rjq7g6rdk2yhzks9smlaqtedr4dekq08ge8ztwac72sfr9rusxg3297'))
+
+    def test_validate_bech32_invalid(self):
+        self.assertFalse(validate_bech32('bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t5'))
+        self.assertFalse(validate_bech32('bc1QW508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4'))
+        self.assertFalse(validate_bech32('tb1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4'))
+
+    def test_validate_many(self):
+        addresses = [
+            '1AGNa15ZQXAZUgFiqJ2i7Z2DPU2J6hW62i',
+            '3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy',
+            'bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4',
+            '14oLvT2',
+        ]
+        self.assertEqual(validate_many(addresses), [True, True, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from future import standard_library
+from mechanicalsoup import StatefulBrowser
+
+from cloudomate.hoster.checkpoint import PurchaseCheckpoint, checkpoint_path
+
+standard_library.install_aliases()
+
+
+class TestPurchaseCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = checkpoint_path(self.directory, 'LineVast', 'bot@pleb.net', 'VPS 1')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_path_depends_on_key(self):
+        self.assertNotEqual(self.path, checkpoint_path(self.directory, 'LineVast', 'bot@pleb.net', 'VPS 2'))
+        self.assertEqual(self.path, checkpoint_path(self.directory, 'LineVast', 'bot@pleb.net', 'VPS 1'))
+
+    def test_load_missing(self):
+        checkpoint = PurchaseCheckpoint.load(self.path)
+        self.assertEqual(checkpoint.completed, [])
+        self.assertFalse(checkpoint.is_completed('cart'))
+
+    def test_complete_and_restore(self):
+        browser = StatefulBrowser()
+        browser.session.cookies.set('WHMCSsession', 'abc', domain='hoster.test', path='/')
+        checkpoint = PurchaseCheckpoint.load(self.path)
+        checkpoint.data['invoice_url'] = 'https://hoster.test/invoice'
+        checkpoint.complete('cart', browser)
+
+        loaded = PurchaseCheckpoint.load(self.path)
+        self.assertTrue(loaded.is_completed('cart'))
+        self.assertEqual(loaded.data, {'invoice_url': 'https://hoster.test/invoice'})
+
+        other = StatefulBrowser()
+        loaded.restore(other)
+        self.assertEqual(other.session.cookies.get('WHMCSsession', domain='hoster.test'), 'abc')
+
+    def test_expired(self):
+        checkpoint = PurchaseCheckpoint.load(self.path)
+        checkpoint.complete('cart', StatefulBrowser())
+        self.assertEqual(PurchaseCheckpoint.load(self.path, max_age=-1).completed, [])
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,17 +3,25 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import io
+import json
 import os
+import shutil
+import tempfile
 import unittest
 from argparse import Namespace
 
 from future import standard_library
-from mock.mock import MagicMock
+from mock.mock import MagicMock, patch
 
 import cloudomate.cmdline as cmdline
+from cloudomate.exceptions.hoster_error import LoginException
 from cloudomate.hoster.vpn.azirevpn import AzireVpn
 from cloudomate.hoster.vps.linevast import LineVast
-from cloudomate.hoster.vps.vps_hoster import VpsOption
+from cloudomate.hoster.vps.vps_hoster import VpsConfiguration, VpsOption
+from cloudomate.monitor import UsageStore
+from cloudomate.util.fleet import SshFleet, SshResult
+from cloudomate.util.settings import Settings
 
 standard_library.install_aliases()
 
@@ -46,6 +54,27 @@ class TestCmdLine(unittest.TestCase):
         mock_method.assert_called_once()
         self._restore_vpn_options()
 
+    def test_execute_vps_options_ndjson(self):
+        self._mock_vps_options([self._create_option()])
+        command = ["vps", "options", "linevast", "--format", "ndjson"]
+        with patch('cloudomate.util.pricing.wallet_util.get_rate', return_value=0.0001), \
+                patch('cloudomate.util.pricing.wallet_util.get_network_fee', return_value=0.0001), \
+                patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            cmdline.execute(command)
+        self._restore_vps_options()
+
+        row = json.loads(stdout.getvalue())
+        self.assertEqual(row['number'], 0)
+        self.assertEqual(row['name'], "Option name")
+        self.assertAlmostEqual(row['estimated_mbtc'], 1000 * (12 * 0.0001 * 1.01 + 0.0001), places=5)
+
+    def test_execute_vps_list_csv(self):
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            cmdline.execute(["vps", "list", "--format", "csv"])
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(lines[0], "provider,name,website")
+        self.assertEqual(len(lines), len(cmdline.providers["vps"]) + 1)
+
     def test_execute_vps_purchase(self):
         self._mock_vps_options([self._create_option()])
         purchase = LineVast.purchase
@@ -69,6 +98,28 @@ class TestCmdLine(unittest.TestCase):
             purchase_url="Option url"
         )
 
+    def test_execute_vps_purchase_with_id(self):
+        self._mock_vps_options([self._create_option()])
+        with patch.object(LineVast, 'purchase') as purchase:
+            command = ["vps", "purchase", "linevast", "-f", "-c", self.settings_file, "-rp", "asdf", "0",
+                       "--purchase-id", "node-17"]
+            cmdline.execute(command)
+        self.assertEqual(purchase.call_args[1]['purchase_id'], 'node-17')
+        self._restore_vps_options()
+
+    def test_execute_vps_purchase_hoster_error(self):
+        self._mock_vps_options([self._create_option()])
+        purchase = LineVast.purchase
+        LineVast.purchase = MagicMock(side_effect=LoginException("Login failure"))
+        command = ["vps", "purchase", "linevast", "-f", "-c", self.settings_file, "-rp", "asdf", "0"]
+        with self.assertRaises(SystemExit) as context, \
+                patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            cmdline.execute(command)
+        self.assertEqual(context.exception.code, 2)
+        self.assertIn("Login failure", stderr.getvalue())
+        LineVast.purchase = purchase
+        self._restore_vps_options()
+
     def test_execute_vps_purchase_verify_options_failure(self):
         self._mock_vps_options()
         command = ["vps", "purchase", "linevast", "-f", "-c", self.settings_file, "1"]
@@ -128,6 +179,107 @@ class TestCmdLine(unittest.TestCase):
         mock.assert_called_once()
         self._restore_vps_options()
 
+    def test_get_user_settings_merges_setting_arguments(self):
+        args = Namespace(config=self.settings_file, func=cmdline.purchase, type='vps', rootpw='asdf', option=0,
+                         email=None)
+        settings = cmdline._get_user_settings(args, 'LineVast')
+        self.assertEqual(settings.profile('LineVast').server.root_password, 'asdf')
+        self.assertFalse(settings.has_key('LineVast', 'func'))
+        self.assertFalse(settings.has_key('LineVast', 'type'))
+
+    def test_get_user_settings_identity(self):
+        args = Namespace(config=self.settings_file, identity='alice')
+        settings = cmdline._get_user_settings(args, 'LineVast')
+        self.assertEqual(settings.profile('LineVast').user.email, 'alice@pleb.net')
+        args.identity = 'bob'
+        self.assertRaises(SystemExit, cmdline._get_user_settings, args, 'LineVast')
+
+    def test_execute_vps_setrootpw_all(self):
+        configurations = [VpsConfiguration('10.0.0.1', 'old'), VpsConfiguration('10.0.0.2', 'old')]
+        results = [SshResult('10.0.0.1', 0, ''), SshResult('10.0.0.2', 1, 'chpasswd: failed')]
+        with patch.object(LineVast, 'get_configurations', return_value=configurations), \
+                patch.object(SshFleet, 'run', return_value=results) as run, \
+                patch.object(Settings, 'save_settings') as save_settings, \
+                patch('sys.stdout', new_callable=io.StringIO) as stdout, \
+                patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            command = ["vps", "setrootpw", "linevast", "new", "--all", "--format", "ndjson"]
+            self._check_exit_code(2, cmdline.execute, command)
+        targets, chpasswd = run.call_args[0]
+        self.assertEqual([target.ip for target in targets], ['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(chpasswd, 'echo "root:new" | chpasswd')
+        save_settings.assert_not_called()
+        self.assertIn('10.0.0.2', stderr.getvalue())
+        self.assertNotIn('10.0.0.1', stderr.getvalue())
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([row['exit_code'] for row in rows], [0, 1])
+
+    def test_execute_vps_setrootpw_reads_settings_once(self):
+        configuration = VpsConfiguration('10.0.0.1', 'old')
+        with patch.object(LineVast, 'get_configuration', return_value=configuration) as get_configuration, \
+                patch.object(SshFleet, 'run', return_value=[SshResult('10.0.0.1', 0, '')]), \
+                patch.object(Settings, 'read_settings') as read_settings, \
+                patch.object(Settings, 'save_settings'), \
+                patch('sys.stdout', new_callable=io.StringIO):
+            cmdline.execute(["vps", "setrootpw", "linevast", "new"])
+        read_settings.assert_called_once()
+        get_configuration.assert_called_once()
+
+    def test_execute_vps_setrootpw_all_succeeded(self):
+        configurations = [VpsConfiguration('10.0.0.1', 'old'), VpsConfiguration('10.0.0.2', 'old')]
+        results = [SshResult('10.0.0.1', 0, ''), SshResult('10.0.0.2', 0, '')]
+        with patch.object(LineVast, 'get_configurations', return_value=configurations), \
+                patch.object(SshFleet, 'run', return_value=results), \
+                patch.object(Settings, 'put') as put, \
+                patch.object(Settings, 'save_settings') as save_settings, \
+                patch('sys.stdout', new_callable=io.StringIO):
+            cmdline.execute(["vps", "setrootpw", "linevast", "new", "--all"])
+        put.assert_called_once_with("server", "root_password", "new")
+        save_settings.assert_called_once()
+
+    def test_command_context_is_shared(self):
+        args = Namespace(type='vps', provider='linevast', config=self.settings_file)
+        context = cmdline.CommandContext.of(args)
+        self.assertIs(cmdline.CommandContext.of(args), context)
+        self.assertIs(context.provider, LineVast)
+        self.assertIs(context.hoster.__class__, LineVast)
+        self.assertIs(context.hoster, context.hoster)
+
+    def test_execute_monitor_history(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'usage.ndjson')
+        store = UsageStore(path)
+        store.append('vps/linevast', {'memory.used': 0.5}, 1514764800.0)
+        store.append('vps/linevast', {'memory.used': 0.7}, 1514765100.0)
+        with patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            cmdline.execute(["monitor", "--db", path, "history", "vps/LineVast", "--format", "ndjson"])
+        shutil.rmtree(directory)
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([row['memory.used'] for row in rows], [0.5, 0.7])
+
+    def test_execute_renew(self):
+        with patch('cloudomate.cmdline.renewal.RenewalScheduler') as scheduler, \
+                patch('cloudomate.cmdline._get_wallet'):
+            cmdline.execute(["renew", "vps/LineVast", "-c", self.settings_file, "--days", "5", "--once"])
+        targets, = scheduler.call_args[0][:1]
+        self.assertEqual(list(targets), ['vps/linevast'])
+        self.assertEqual(scheduler.call_args[1]['renewal_days'], 5)
+        scheduler.return_value.run.assert_called_once_with(once=True)
+
+    def test_execute_renew_unsupported(self):
+        with patch('cloudomate.cmdline.renewal.RenewalScheduler') as scheduler, \
+                patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            self.assertRaises(SystemExit, cmdline.execute, ["renew", "vpn/azirevpn", "-c", self.settings_file])
+        scheduler.assert_not_called()
+        self.assertIn('not supported', stderr.getvalue())
+
+    def test_execute_vpn_info_ovpn_structured(self):
+        with patch.object(cmdline.CommandContext, 'of') as context, \
+                patch('sys.stderr', new_callable=io.StringIO) as stderr:
+            command = ["vpn", "info", "azirevpn", "--ovpn", "a.ovpn", "--format", "json"]
+            self._check_exit_code(2, cmdline.execute, command)
+        context.assert_not_called()
+        self.assertIn('--ovpn', stderr.getvalue())
+
     def _mock_vps_options(self, items=None):
         if items is None:
             items = []
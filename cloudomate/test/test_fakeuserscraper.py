@@ -0,0 +1,54 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+from future import standard_library
+from mock import patch
+
+from cloudomate.hoster.vps.linevast import LineVast
+from cloudomate.util.fakeuserscraper import UserGenerator, UserScraper
+from cloudomate.util.settings import Settings
+
+standard_library.install_aliases()
+
+
+class TestUserGenerator(unittest.TestCase):
+    def test_countries(self):
+        for country in UserScraper.pages:
+            user = UserGenerator(country).get_user()
+            self.assertEqual(user['address']['countrycode'], country)
+
+    def test_user_has_required_settings(self):
+        settings = Settings()
+        user = UserGenerator().get_user()
+        for section in user:
+            for key in user[section]:
+                settings.put(section, key, user[section][key])
+        self.assertTrue(settings.verify_options(LineVast.get_required_settings()))
+
+    def test_get_users(self):
+        users = UserGenerator('US', seed=1).get_users(100)
+        self.assertEqual(len(users), 100)
+        self.assertEqual(len(set(user['user']['email'] for user in users)), 100)
+
+    def test_get_users_limited_usernames(self):
+        generator = UserGenerator('US', seed=1)
+        attrs = generator._get_attributes()
+        with patch.object(generator, '_get_attributes', side_effect=lambda: dict(attrs)):
+            self.assertRaises(ValueError, generator.get_users, 2)
+
+    def test_seed(self):
+        first = UserGenerator('UK', seed=1).get_user()
+        second = UserGenerator('UK', seed=1).get_user()
+        self.assertEqual(first['address'], second['address'])
+        self.assertNotEqual(first['user']['password'], second['user']['password'])
+
+    def test_unknown_country(self):
+        self.assertRaises(ValueError, UserGenerator, 'XX')
+
+
+if __name__ == '__main__':
+    unittest.main()
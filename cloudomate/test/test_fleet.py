@@ -0,0 +1,106 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import threading
+import time
+import unittest
+
+from future import standard_library
+from mock.mock import MagicMock
+
+from cloudomate.util.fleet import SshFleet, SshTarget
+
+standard_library.install_aliases()
+
+
+class FakeProcess(object):
+    def __init__(self, commandline, delay):
+        self.commandline = commandline
+        self.delay = delay
+        self.returncode = None
+
+    def communicate(self):
+        time.sleep(self.delay)
+        self.returncode = 1 if self.commandline[-1] == 'false' else 0
+        return ('output of ' + self.commandline[-2]).encode('utf-8'), None
+
+
+class FakePopen(object):
+    def __init__(self):
+        self.commandlines = []
+
+    def __call__(self, commandline, **kwargs):
+        self.commandlines.append(commandline)
+        return self
+
+    def communicate(self):
+        return b'', None
+
+
+class TestSshFleet(unittest.TestCase):
+    def setUp(self):
+        self.targets = [SshTarget('10.0.0.{}'.format(i), 'hunter2', 'root') for i in range(20)]
+
+    def test_commandline_reuses_connections(self):
+        with SshFleet() as fleet:
+            commandline = fleet.commandline(self.targets[0], 'uptime')
+        self.assertEqual(commandline[:3], ['sshpass', '-p', 'hunter2'])
+        self.assertEqual(commandline[-2:], ['root@10.0.0.0', 'uptime'])
+        self.assertIn('ControlMaster=auto', commandline)
+
+    def test_run_is_concurrent_and_bounded(self):
+        running = [0, 0]
+        lock = threading.Lock()
+
+        def popen(commandline, **kwargs):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            process = FakeProcess(commandline, 0.05)
+            communicate = process.communicate
+
+            def finish():
+                result = communicate()
+                with lock:
+                    running[0] -= 1
+                return result
+
+            process.communicate = finish
+            return process
+
+        fleet = SshFleet(workers=5, popen=popen)
+        start = time.time()
+        results = fleet.run(self.targets, 'uptime')
+        self.assertLess(time.time() - start, 0.05 * len(self.targets))
+        self.assertEqual(running[1], 5)
+        self.assertEqual([result.ip for result in results], [target.ip for target in self.targets])
+        self.assertTrue(all(result.exit_code == 0 for result in results))
+        self.assertEqual(results[0].output, 'output of root@10.0.0.0')
+
+    def test_run_collects_exit_codes(self):
+        fleet = SshFleet(popen=lambda commandline, **kwargs: FakeProcess(commandline, 0))
+        results = fleet.run(self.targets[:2], lambda target: 'false' if target.ip.endswith('.1') else 'true')
+        self.assertEqual([result.exit_code for result in results], [0, 1])
+
+    def test_run_without_sshpass(self):
+        fleet = SshFleet(popen=MagicMock(side_effect=OSError('No such file or directory')))
+        result, = fleet.run(self.targets[:1], 'uptime')
+        self.assertIsNone(result.exit_code)
+
+    def test_close_ends_masters(self):
+        popen = FakePopen()
+        fleet = SshFleet(popen=lambda commandline, **kwargs: FakeProcess(commandline, 0))
+        fleet.run(self.targets[:3], 'uptime')
+        control_dir = fleet._control_dir
+        fleet._popen = popen
+        fleet.close()
+        self.assertEqual(len(popen.commandlines), 3)
+        self.assertTrue(all(commandline[-3:-1] == ['-O', 'exit'] for commandline in popen.commandlines))
+        self.assertFalse(os.path.exists(control_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
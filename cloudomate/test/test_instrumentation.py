@@ -0,0 +1,94 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from builtins import open
+
+from future import standard_library
+from mock import MagicMock
+
+from cloudomate.util import recorder
+from cloudomate.util.instrumentation import InstrumentedBrowser, Profiler
+
+standard_library.install_aliases()
+
+PAGE = '<html><body><p>page</p></body></html>'
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        cassette = recorder.Cassette(os.path.join(self.directory, 'cassette.json'), mode=recorder.RECORD)
+        cassette.interactions = [
+            self._interaction('https://hoster.test/start', 302, '', {'Location': 'https://other.test/page'}),
+            self._interaction('https://other.test/page', 200, PAGE),
+        ]
+        cassette.mode = recorder.REPLAY
+
+        self.profiler = Profiler()
+        self.browser = InstrumentedBrowser(profiler=self.profiler)
+        recorder.attach(self.browser.session, cassette)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def _interaction(url, status, body, headers=None):
+        response_headers = {'Content-Type': 'text/html'}
+        response_headers.update(headers or {})
+        return {
+            'request': {'method': 'GET', 'url': url},
+            'response': {'status': status, 'reason': 'OK', 'headers': response_headers, 'body': body,
+                         'encoding': 'utf-8'},
+            'elapsed': 0.0,
+        }
+
+    def test_disabled_by_default(self):
+        self.browser.open('https://hoster.test/start')
+        self.assertEqual(self.profiler.events, [])
+
+    def test_records_every_hop(self):
+        self.profiler.enable()
+        self.browser.open('https://hoster.test/start')
+
+        redirect, page = self.profiler.events
+        self.assertEqual((redirect.action, redirect.method, redirect.status), ('get', 'GET', 302))
+        self.assertEqual(page.url, 'https://other.test/page')
+        self.assertEqual(page.bytes, len(PAGE))
+        self.assertEqual(redirect.parse, 0.0)
+        self.assertGreaterEqual(page.parse, 0.0)
+
+    def test_listener(self):
+        listener = MagicMock()
+        self.profiler.add_listener(listener)
+        self.profiler.enable()
+        self.browser.open('https://hoster.test/start')
+        self.assertEqual(listener.call_count, 2)
+
+    def test_summary(self):
+        self.profiler.enable()
+        self.browser.open('https://hoster.test/start')
+        summary = self.profiler.summary()
+        self.assertEqual(list(summary.keys()), ['hoster.test', 'other.test'])
+        self.assertEqual(summary['other.test']['requests'], 1)
+        self.assertEqual(summary['other.test']['bytes'], len(PAGE))
+
+    def test_export_trace(self):
+        self.profiler.enable()
+        self.browser.open('https://hoster.test/start')
+        filename = os.path.join(self.directory, 'trace.json')
+        self.profiler.export_trace(filename)
+        with open(filename, 'r', encoding='utf-8') as trace_file:
+            trace = json.load(trace_file)
+        self.assertEqual(len(trace['traceEvents']), 2)
+        self.assertEqual(trace['traceEvents'][1]['args']['status'], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from builtins import open
+
+from future import standard_library
+from mock import MagicMock
+
+from cloudomate import monitor
+from cloudomate.exceptions.hoster_error import LoginException
+from cloudomate.hoster.vps.vps_hoster import VpsStatus, VpsStatusResource
+from cloudomate.monitor import UsageMonitor, UsageStore
+
+standard_library.install_aliases()
+
+DAY = 24 * 60 * 60
+START = 1514764800.0  # 2018-01-01
+
+
+def _status(bandwidth_used, expiration=datetime.datetime(2018, 3, 1)):
+    return VpsStatus(VpsStatusResource(0.5, 1.0), VpsStatusResource(5.0, 20.0),
+                     VpsStatusResource(bandwidth_used, 1000.0), True, expiration, None)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = START
+
+    def __call__(self):
+        return self.now
+
+
+class TestUsageStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'usage.ndjson')
+        self.store = UsageStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_stores_deltas(self):
+        self.store.append('vps/a', {'memory.used': 0.5, 'online': True}, START)
+        self.store.append('vps/a', {'memory.used': 0.5, 'online': True}, START + 300)
+        self.store.append('vps/a', {'memory.used': 0.7, 'online': True}, START + 600)
+        with open(self.path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[1], '{"k":"vps/a","dt":300.0}')
+        self.assertEqual(lines[2], '{"k":"vps/a","dt":300.0,"d":{"memory.used":0.7}}')
+
+    def test_history(self):
+        self.store.append('vps/a', {'memory.used': 0.5}, START)
+        self.store.append('vps/b', {'memory.used': 1.5}, START + 10)
+        self.store.append('vps/a', {'memory.used': 0.7}, START + 300)
+
+        history = UsageStore(self.path).history('vps/a')
+        self.assertEqual([(sample.timestamp, sample.values['memory.used']) for sample in history],
+                         [(START, 0.5), (START + 300, 0.7)])
+        self.assertEqual(len(UsageStore(self.path).history(since=START + 10)), 2)
+        self.assertEqual(UsageStore(self.path).latest()['vps/a'].values, {'memory.used': 0.7})
+
+    def test_ignores_truncated_line(self):
+        self.store.append('vps/a', {'memory.used': 0.5}, START)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('{"k":"vps/a","dt":3')
+        self.assertEqual(len(UsageStore(self.path).history()), 1)
+
+
+class TestUsageMonitor(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = UsageStore(os.path.join(self.directory, 'usage.ndjson'))
+        self.clock = Clock()
+        self.hoster = MagicMock()
+        self.events = []
+        self.monitor = UsageMonitor({'vps/linevast': self.hoster}, self.store, interval=300, expiry_days=7,
+                                    on_event=self.events.append, clock=self.clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_polls_incrementally(self):
+        self.hoster.get_status = MagicMock(return_value=_status(10.0))
+        self.monitor.poll()
+        self.clock.now += 100
+        self.monitor.poll()
+        self.assertEqual(self.hoster.get_status.call_count, 1)
+
+        self.clock.now += 200
+        self.monitor.poll()
+        self.assertEqual(self.hoster.get_status.call_count, 2)
+        self.hoster.clear_cache.assert_called()
+
+    def test_bandwidth_event_fires_once(self):
+        for used in [800.0, 950.0, 960.0]:
+            self.hoster.get_status = MagicMock(return_value=_status(used))
+            self.monitor.poll()
+            self.clock.now += 300
+        self.assertEqual([event.kind for event in self.events], [monitor.BANDWIDTH])
+        self.assertEqual(self.events[0].message, 'Bandwidth at 95% of 1000 GB')
+
+    def test_expiration_event(self):
+        expiration = datetime.datetime.fromtimestamp(START + 8 * DAY)
+        self.hoster.get_status = MagicMock(return_value=_status(10.0, expiration))
+        self.monitor.poll()
+        self.assertEqual(self.events, [])
+
+        self.clock.now += 2 * DAY
+        self.monitor.poll()
+        self.assertEqual([event.kind for event in self.events], [monitor.EXPIRATION])
+        self.assertEqual(self.events[0].message, 'Expires in 6.0 days')
+
+    def test_poll_failure(self):
+        self.hoster.get_status = MagicMock(side_effect=LoginException('Login failure'))
+        self.assertEqual(self.monitor.poll(), [])
+        self.assertEqual(self.store.latest(), {})
+
+    def test_poll_failure_backs_off(self):
+        self.hoster.get_status = MagicMock(side_effect=[IndexError('list index out of range'), _status(10.0)])
+        self.monitor.poll()
+        self.clock.now += 1
+        self.monitor.poll()
+        self.assertEqual(self.hoster.get_status.call_count, 1)
+        self.assertEqual(self.monitor._next_poll(), START + 300)
+
+        self.clock.now = START + 300
+        self.monitor.poll()
+        self.assertEqual(self.hoster.get_status.call_count, 2)
+        self.assertIn('vps/linevast', self.store.latest())
+
+
+if __name__ == '__main__':
+    unittest.main()
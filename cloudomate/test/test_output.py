@@ -0,0 +1,74 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import io
+import json
+import unittest
+from collections import OrderedDict
+
+from future import standard_library
+
+from cloudomate.hoster.vps.vps_hoster import VpsStatus, VpsStatusResource
+from cloudomate.util import output
+
+standard_library.install_aliases()
+
+STATUS = VpsStatus(VpsStatusResource(0.5, 1.0), VpsStatusResource(5.0, 20.0), VpsStatusResource(1.0, 1000.0),
+                   True, datetime.datetime(2018, 1, 1), None)
+
+
+class TestOutput(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+
+    def test_to_json(self):
+        status = output.to_json(STATUS)
+        self.assertEqual(status['memory'], {'used': 0.5, 'total': 1.0})
+        self.assertEqual(status['expiration'], '2018-01-01T00:00:00')
+
+    def test_json(self):
+        writer = output.get_writer(output.JSON, self.stream)
+        writer.write({'name': 'a'})
+        self.assertEqual(self.stream.getvalue(), '')  # Written as a single document on close
+        writer.write({'name': 'b'})
+        writer.close()
+        self.assertEqual(json.loads(self.stream.getvalue()), [{'name': 'a'}, {'name': 'b'}])
+
+    def test_json_single(self):
+        writer = output.get_writer(output.JSON, self.stream, single=True)
+        writer.write(STATUS)
+        writer.close()
+        self.assertTrue(json.loads(self.stream.getvalue())['online'])
+
+    def test_ndjson_streams(self):
+        writer = output.get_writer(output.NDJSON, self.stream)
+        writer.write({'name': 'a'})
+        self.assertEqual(self.stream.getvalue(), '{"name": "a"}\n')
+        writer.write({'name': 'b'})
+        writer.close()
+        self.assertEqual(len(self.stream.getvalue().splitlines()), 2)
+
+    def test_csv_flattens(self):
+        writer = output.get_writer(output.CSV, self.stream)
+        writer.write(STATUS)
+        writer.close()
+        header, row = self.stream.getvalue().splitlines()
+        self.assertTrue(header.startswith('memory.used,memory.total,storage.used'))
+        self.assertTrue(row.startswith('0.5,1.0,5.0'))
+
+    def test_csv_different_keys(self):
+        writer = output.get_writer(output.CSV, self.stream)
+        writer.write(OrderedDict([('key', 'vps/a'), ('memory', 0.5)]))
+        writer.write(OrderedDict([('key', 'vps/b'), ('bandwidth', 2.0)]))
+        writer.close()
+        self.assertEqual(self.stream.getvalue().splitlines(), ['key,memory,bandwidth', 'vps/a,0.5,', 'vps/b,,2.0'])
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, output.get_writer, 'xml', self.stream)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+import requests
+from future import standard_library
+
+from cloudomate.test.whmcs_server import WhmcsServer
+from cloudomate.util.prefetch import Prefetch, warm_connection
+
+standard_library.install_aliases()
+
+
+class TestPrefetch(unittest.TestCase):
+    def setUp(self):
+        self.server = WhmcsServer().start()
+        self.session = requests.Session()
+
+    def tearDown(self):
+        self.session.close()
+        self.server.stop()
+
+    def _pools(self):
+        pools = self.session.get_adapter(self.server.base_url).poolmanager.pools
+        return [pools[key] for key in pools.keys()]
+
+    def test_warm_connection_is_reused(self):
+        warm_connection(self.session, self.server.purchase_url())
+        pool, = self._pools()
+        self.assertEqual((pool.num_connections, pool.num_requests), (1, 1))
+
+        self.session.get(self.server.purchase_url())
+        self.assertEqual(self._pools(), [pool])
+        self.assertEqual((pool.num_connections, pool.num_requests), (1, 2))  # The warm connection was used
+
+    def test_warm_connection_keeps_cookies_out(self):
+        warm_connection(self.session, self.server.clientarea_url)
+        self.assertEqual(len(self.session.cookies), 0)
+
+    def test_prefetch_warms_hosts_without_visiting_pages(self):
+        urls = [self.server.purchase_url(), self.server.base_url + 'cart.php?a=view', None]
+        prefetch = Prefetch(self.session, urls).start()
+        prefetch.wait()
+        self.assertEqual(prefetch.errors, [])
+        self.assertEqual(prefetch.urls, [self.server.base_url])
+        self.assertEqual(self.server.request_count, 1)
+        self.assertEqual(self.server.order_count, 0)
+
+    def test_prefetch_ignores_failures(self):
+        prefetch = Prefetch(self.session, ['http://127.0.0.1:1/', 'http://host.invalid/']).start()
+        prefetch.wait()
+        self.assertEqual(len(prefetch.errors), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+import unittest
+
+from future import standard_library
+from mock import patch
+
+from cloudomate.gateway.bitpay import BitPay
+from cloudomate.hoster.vpn.vpn_hoster import VpnOption
+from cloudomate.hoster.vps.vps_hoster import VpsOption
+from cloudomate.util import pricing
+
+standard_library.install_aliases()
+
+
+class TestPricing(unittest.TestCase):
+    def test_estimate_prices_matches_gateway(self):
+        rate = 0.0001
+        fee = 0.00002
+        estimates = pricing.estimate_prices([10.0, 25.0], BitPay, rate, fee)
+        for price, estimate in zip([10.0, 25.0], estimates):
+            self.assertAlmostEqual(estimate, BitPay.estimate_price(price * rate) + fee)
+
+    def test_estimate_option_prices_unit_costs(self):
+        option = VpsOption('name', 2, '4', 50.0, sys.maxsize, 1000, 10.0, 'url')
+        estimate, = pricing.estimate_option_prices([option], BitPay, rate=0.0001, network_fee=0.0)
+        self.assertAlmostEqual(estimate.mbtc, 1.01)
+        self.assertAlmostEqual(estimate.per_core, 1.01 / 2)
+        self.assertAlmostEqual(estimate.per_memory, 1.01 / 4)
+        self.assertAlmostEqual(estimate.per_storage, 1.01 / 50)
+
+    def test_estimate_option_prices_vpn(self):
+        option = VpnOption('name', 'OpenVPN', 5.0, sys.maxsize, sys.maxsize)
+        estimate, = pricing.estimate_option_prices([option], BitPay, rate=0.0001, network_fee=0.0)
+        self.assertIsNone(estimate.per_core)
+        self.assertIsNone(estimate.per_storage)
+
+    def test_estimate_option_prices_empty(self):
+        self.assertEqual(pricing.estimate_option_prices([], BitPay), [])
+
+    def test_convert_prices_single_lookup(self):
+        rates = {'USD': 0.0001, 'EUR': 0.00012, 'GBP': 0.00013}
+        with patch('cloudomate.util.pricing.wallet_util.get_rates', return_value=rates) as get_rates:
+            prices = pricing.convert_prices([(4.99, 'USD'), (10.0, 'EUR'), (5.0, 'EUR'), (1.0, 'GBP')])
+        get_rates.assert_called_once_with({'USD', 'EUR', 'GBP'})
+        self.assertEqual(prices, [4.99, 12.0, 6.0, 1.3])
+
+    def test_convert_prices_same_currency(self):
+        with patch('cloudomate.util.pricing.wallet_util.get_rates') as get_rates:
+            self.assertEqual(pricing.convert_prices([(4.99, 'USD')], 'USD'), [4.99])
+        get_rates.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+
+from future import standard_library
+from mock import MagicMock, patch
+
+from cloudomate import purchase_queue
+from cloudomate.hoster.vps.vps_hoster import VpsOption
+from cloudomate.purchase_queue import PurchaseQueue, PurchaseWorkerPool, QueueFullError
+from cloudomate.util.settings import Settings
+
+standard_library.install_aliases()
+
+
+def _hoster(name):
+    hoster = MagicMock()
+    hoster.get_options = MagicMock(return_value=[VpsOption(name + ' 1', 1, 1.0, 20.0, 1000.0, 1000, 4.99, 'url')])
+    return hoster
+
+
+class TestPurchaseQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.queue = PurchaseQueue(os.path.join(self.directory, 'purchases.db'))
+        self.settings = Settings()
+        self.settings.put('user', 'email', 'bot@pleb.net')
+
+    def tearDown(self):
+        self.queue.close()
+        shutil.rmtree(self.directory)
+
+    def test_submit(self):
+        job = self.queue.submit('vps', 'linevast', 0, self.settings, option_name='Basis OVZ')
+        self.assertEqual(job.state, purchase_queue.QUEUED)
+        self.assertEqual(job.settings, {'user': {'email': 'bot@pleb.net'}})
+        self.assertEqual(self.queue.get(job.id), job)
+
+    def test_idempotency_key(self):
+        job = self.queue.submit('vps', 'linevast', 0, self.settings, idempotency_key='node-1')
+        self.queue.claim()
+        again = self.queue.submit('vps', 'linevast', 0, self.settings, idempotency_key='node-1')
+        self.assertEqual(again.id, job.id)
+        self.assertEqual(again.state, purchase_queue.RUNNING)
+        self.assertEqual(len(self.queue.list()), 1)
+        self.assertEqual(self.queue.get_by_key('node-1').id, job.id)
+
+    def test_provider_names_are_normalised(self):
+        self.queue.submit('VPS', 'LineVast', 0, self.settings)
+        self.queue.submit('vps', 'linevast', 0, self.settings)
+        self.queue.claim()
+        self.assertIsNone(self.queue.claim(exclude=[('vps', 'linevast')]))
+
+    def test_concurrent_idempotency_key(self):
+        other = PurchaseQueue(self.queue.path)
+        job = other.submit('vps', 'linevast', 0, self.settings, idempotency_key='node-1')
+        other.close()
+        lookup = self.queue._get_by_key
+        with patch.object(self.queue, '_get_by_key', side_effect=[None, lookup('node-1')]):
+            again = self.queue.submit('vps', 'linevast', 0, self.settings, idempotency_key='node-1')
+        self.assertEqual(again.id, job.id)
+        self.assertEqual(len(self.queue.list()), 1)
+
+    def test_max_size(self):
+        self.queue.max_size = 1
+        self.queue.submit('vps', 'linevast', 0, self.settings)
+        self.assertRaises(QueueFullError, self.queue.submit, 'vps', 'linevast', 0, self.settings)
+
+    def test_claim_in_order_with_exclusions(self):
+        first = self.queue.submit('vps', 'linevast', 0, self.settings)
+        second = self.queue.submit('vps', 'crowncloud', 0, self.settings)
+        self.assertEqual(self.queue.claim(exclude=[('vps', 'linevast')]).id, second.id)
+        self.assertEqual(self.queue.claim().id, first.id)
+        self.assertIsNone(self.queue.claim())
+
+    def test_recover_and_retry(self):
+        job = self.queue.submit('vps', 'linevast', 0, self.settings)
+        other = PurchaseQueue(self.queue.path, owner='other process')
+        other.claim()
+        other.close()
+        self.assertEqual(self.queue.recover(), 0)  # The other process may still be running it
+
+        with patch.object(purchase_queue.time, 'time', return_value=time.time() + purchase_queue.HEARTBEAT_TIMEOUT + 1):
+            self.assertEqual(self.queue.recover(), 1)
+        self.assertEqual(self.queue.get(job.id).state, purchase_queue.INTERRUPTED)
+
+        self.queue.retry(job.id)
+        self.assertEqual(self.queue.claim().attempts, 2)
+        self.assertRaises(ValueError, self.queue.retry, job.id)
+
+    def test_recover_skips_own_and_live_jobs(self):
+        self.queue.submit('vps', 'linevast', 0, self.settings)
+        self.queue.submit('vps', 'crowncloud', 0, self.settings)
+        self.queue.claim()
+        other = PurchaseQueue(self.queue.path, owner='other process')
+        other.claim()
+
+        later = time.time() + purchase_queue.HEARTBEAT_TIMEOUT + 1
+        with patch.object(purchase_queue.time, 'time', return_value=later):
+            other.heartbeat()
+        with patch.object(purchase_queue.time, 'time', return_value=later + 1):
+            self.assertEqual(self.queue.recover(), 0)
+            self.assertEqual(other.recover(), 1)
+        other.close()
+
+    def test_migrates_old_database(self):
+        path = os.path.join(self.directory, 'old.db')
+        connection = sqlite3.connect(path)
+        connection.executescript(purchase_queue._SCHEMA.replace(',\n    owner TEXT,\n    heartbeat REAL', ''))
+        connection.close()
+        queue = PurchaseQueue(path)
+        queue.submit('vps', 'linevast', 0, self.settings)
+        self.assertIsNotNone(queue.claim())
+        queue.close()
+
+    def test_worker_pool(self):
+        providers = {'vps': {'a': _hoster('a'), 'b': _hoster('b')}}
+        for i in range(6):
+            self.queue.submit('vps', 'a' if i % 2 else 'b', 0, self.settings)
+        self.queue.submit('vps', 'a', 1, self.settings)  # Not an option of a
+
+        lock = threading.Lock()
+        running = {}
+        peak = {}
+
+        def purchase(hoster, option, settings):
+            with lock:
+                running[option.name] = running.get(option.name, 0) + 1
+                peak[option.name] = max(peak.get(option.name, 0), running[option.name])
+            time.sleep(0.02)
+            with lock:
+                running[option.name] -= 1
+            return 'ab' * 32
+
+        PurchaseWorkerPool(self.queue, providers, purchase, workers=4, per_hoster=1, poll_interval=0.01).run()
+
+        self.assertEqual(peak, {'a 1': 1, 'b 1': 1})
+        self.assertEqual(self.queue.count(purchase_queue.DONE), 6)
+        failed, = self.queue.list(purchase_queue.FAILED)
+        self.assertIn('no longer available', failed.error)
+        self.assertEqual(self.queue.list(purchase_queue.DONE)[0].result, 'ab' * 32)
+
+    def test_worker_pool_unpaid_purchase_fails(self):
+        job = self.queue.submit('vps', 'a', 0, self.settings)
+        purchase = MagicMock(return_value=None)  # Wallet.pay returns None without enough funds
+        PurchaseWorkerPool(self.queue, {'vps': {'a': _hoster('a')}}, purchase, poll_interval=0.01).run()
+        job = self.queue.get(job.id)
+        self.assertEqual(job.state, purchase_queue.FAILED)
+        self.assertIn('not paid', job.error)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+import requests
+from future import standard_library
+from mock import MagicMock
+
+from cloudomate.exceptions.hoster_error import CircuitOpenException
+from cloudomate.util import ratelimit
+from cloudomate.util.ratelimit import CircuitBreaker, LimitedAdapter, RateLimiter, TokenBucket
+
+standard_library.install_aliases()
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def _response(status, headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    return response
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(rate=2.0, burst=2, clock=self.clock)
+
+    def test_burst_then_rate(self):
+        self.assertEqual(self.bucket.reserve(), 0.0)
+        self.assertEqual(self.bucket.reserve(), 0.0)
+        self.assertAlmostEqual(self.bucket.reserve(), 0.5)
+        self.clock.now += 1.5
+        self.assertEqual(self.bucket.reserve(), 0.0)
+
+    def test_throttle_and_recover(self):
+        self.bucket.throttle()
+        self.assertEqual(self.bucket.rate, 1.0)
+        self.assertAlmostEqual(self.bucket.reserve(), 1.0)
+        for _ in range(20):
+            self.bucket.recover()
+        self.assertEqual(self.bucket.rate, 2.0)
+
+    def test_min_rate(self):
+        for _ in range(10):
+            self.bucket.throttle()
+        self.assertEqual(self.bucket.rate, 2.0 / 16)
+
+    def test_retry_after(self):
+        self.bucket.throttle(retry_after=10)
+        self.assertAlmostEqual(self.bucket.reserve(), 10.0)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=self.clock)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_in(), 30)
+
+    def test_half_open_trial(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())  # Only a single trial request
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, ratelimit.OPEN)
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, ratelimit.CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_released_trial(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 30
+        self.assertTrue(self.breaker.allow())
+        self.breaker.release()
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, ratelimit.HALF_OPEN)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(rate=1.0, burst=1, failure_threshold=2, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_hosts_are_limited_separately(self):
+        self.limiter.before_request('https://linevast.de/a')
+        self.limiter.before_request('https://crowncloud.net/a')
+        self.assertEqual(self.clock.now, 1000.0)
+        self.limiter.before_request('https://linevast.de/b')
+        self.assertEqual(self.clock.now, 1001.0)
+
+    def test_throttled_response(self):
+        self.limiter.after_response('https://linevast.de/a', _response(429, {'Retry-After': '5'}))
+        bucket, breaker = self.limiter.get_host('linevast.de')
+        self.assertEqual(bucket.rate, 0.5)
+        self.assertEqual(breaker.failures, 0)  # Throttling is not a failure of the hoster
+
+    def test_open_circuit(self):
+        adapter = MagicMock()
+        adapter.send = MagicMock(side_effect=requests.exceptions.ConnectionError())
+        limited = LimitedAdapter(self.limiter, adapter)
+        request = requests.Request('GET', 'https://linevast.de/a').prepare()
+
+        for _ in range(2):
+            self.assertRaises(requests.exceptions.ConnectionError, limited.send, request)
+        self.assertRaises(CircuitOpenException, limited.send, request)
+        self.assertEqual(adapter.send.call_count, 2)
+
+    def test_trial_released_after_unexpected_error(self):
+        adapter = MagicMock()
+        adapter.send = MagicMock(side_effect=requests.exceptions.ConnectionError())
+        limited = LimitedAdapter(self.limiter, adapter)
+        request = requests.Request('GET', 'https://linevast.de/a').prepare()
+        for _ in range(2):
+            self.assertRaises(requests.exceptions.ConnectionError, limited.send, request)
+
+        self.clock.now += ratelimit.RESET_TIMEOUT
+        adapter.send.side_effect = requests.exceptions.InvalidHeader()
+        self.assertRaises(requests.exceptions.InvalidHeader, limited.send, request)
+        adapter.send.side_effect = None
+        adapter.send.return_value = _response(200)
+        self.assertEqual(limited.send(request).status_code, 200)
+
+    def test_unlimited(self):
+        limiter = RateLimiter(rate=None, clock=self.clock, sleep=self.clock.sleep)
+        for _ in range(100):
+            limiter.before_request('https://linevast.de/a')
+        self.assertEqual(self.clock.now, 1000.0)
+
+    def test_attach(self):
+        session = requests.Session()
+        adapter = session.adapters['https://']
+        ratelimit.attach(session, self.limiter)
+        self.assertIs(session.get_adapter('https://linevast.de').adapter, adapter)
+
+
+if __name__ == '__main__':
+    unittest.main()
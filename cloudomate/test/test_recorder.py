@@ -0,0 +1,106 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from builtins import open
+
+from future import standard_library
+from mock import MagicMock
+
+from cloudomate.hoster.hoster import Hoster
+from cloudomate.util import ratelimit, recorder
+
+standard_library.install_aliases()
+
+
+class TestRecorder(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cassette.json')
+        interactions = [
+            self._interaction('GET', 'https://hoster.test/start', 302, '', {'Location': 'https://hoster.test/page'}),
+            self._interaction('GET', 'https://hoster.test/page', 200, '<html><body><p>first</p></body></html>'),
+            self._interaction('GET', 'https://hoster.test/page', 200, '<html><body><p>second</p></body></html>'),
+        ]
+        with open(self.path, 'w', encoding='utf-8') as cassette_file:
+            cassette_file.write(json.dumps({'interactions': interactions}))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def _interaction(method, url, status, body, headers=None):
+        response_headers = {'Content-Type': 'text/html'}
+        response_headers.update(headers or {})
+        return {
+            'request': {'method': method, 'url': url},
+            'response': {'status': status, 'reason': 'OK', 'headers': response_headers, 'body': body,
+                         'encoding': 'utf-8'},
+            'elapsed': 0.5,
+        }
+
+    def test_replay_follows_redirects(self):
+        with recorder.use_cassette(self.path) as cassette:
+            browser = Hoster._create_browser()
+            browser.open('https://hoster.test/start')
+            self.assertEqual(browser.get_url(), 'https://hoster.test/page')
+            self.assertEqual(browser.get_current_page().p.text, 'first')
+        self.assertEqual(cassette.play_count, 2)
+
+    def test_replay_repeated_requests_in_order(self):
+        with recorder.use_cassette(self.path):
+            browser = Hoster._create_browser()
+            browser.open('https://hoster.test/page')
+            browser.open('https://hoster.test/page')
+            self.assertEqual(browser.get_current_page().p.text, 'second')
+
+    def test_replay_after_record(self):
+        cassette = recorder.Cassette(self.path)
+        cassette.mode = recorder.RECORD
+        response = MagicMock(status_code=200, reason='OK', headers={}, content=b'third')
+        cassette.record(MagicMock(method='GET', url='https://hoster.test/other'), response, 0.5)
+        played = cassette.play(MagicMock(method='GET', url='https://hoster.test/other'))
+        self.assertEqual(played['response']['body'], 'third')
+
+    def test_replay_miss(self):
+        with recorder.use_cassette(self.path):
+            browser = Hoster._create_browser()
+            self.assertRaises(recorder.CassetteMissError, browser.open, 'https://hoster.test/other')
+
+    def test_no_cassette_outside_block(self):
+        with recorder.use_cassette(self.path):
+            pass
+        self.assertIsNone(recorder.get_active_cassette())
+
+    def test_record(self):
+        source = recorder.Cassette(self.path)
+        path = os.path.join(self.directory, 'recorded.json')
+        with recorder.use_cassette(path, mode=recorder.RECORD) as cassette:
+            browser = Hoster._create_browser()
+            adapter = recorder.RecordingAdapter(cassette, recorder.ReplayAdapter(source))
+            browser.session.mount('https://', adapter)
+            browser.open('https://hoster.test/start')
+
+        recorded = recorder.Cassette(path)
+        self.assertEqual([i['request']['url'] for i in recorded.interactions],
+                         ['https://hoster.test/start', 'https://hoster.test/page'])
+        self.assertEqual(recorded.interactions[1]['response']['body'], '<html><body><p>first</p></body></html>')
+
+    def test_record_wraps_rate_limited_adapter(self):
+        path = os.path.join(self.directory, 'recorded.json')
+        with recorder.use_cassette(path, mode=recorder.RECORD):
+            browser = Hoster._create_browser()
+        for prefix in ('http://', 'https://'):
+            adapter = browser.session.adapters[prefix]
+            self.assertIsInstance(adapter, recorder.RecordingAdapter)
+            self.assertIsInstance(adapter.adapter, ratelimit.LimitedAdapter)
+
+
+if __name__ == '__main__':
+    unittest.main()
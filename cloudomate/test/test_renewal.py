@@ -0,0 +1,216 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from builtins import object
+
+import requests
+from future import standard_library
+from mock import ANY, MagicMock, patch
+
+from cloudomate.exceptions.hoster_error import LoginException, PaymentException
+from cloudomate.hoster.vps.vps_hoster import VpsStatus, VpsStatusResourceNone
+from cloudomate.monitor import to_timestamp
+from cloudomate.renewal import PaidInvoices, RenewalScheduler
+
+standard_library.install_aliases()
+
+DAY = 24 * 60 * 60
+START = 1514764800.0  # 2018-01-01
+
+
+def _status(expiration):
+    return VpsStatus(VpsStatusResourceNone, VpsStatusResourceNone, VpsStatusResourceNone, True,
+                     datetime.datetime.fromtimestamp(expiration), None)
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = START
+
+    def __call__(self):
+        return self.now
+
+
+class FakeHoster(object):
+    """
+    Hoster whose service is extended by 30 days when an invoice is paid.
+    """
+    supports_renewal = True
+
+    def __init__(self, expiration):
+        self.expiration = expiration
+        self.invoices = []
+        self.status_calls = 0
+        self.renew_calls = 0
+
+    def clear_cache(self):
+        pass
+
+    def get_status(self):
+        self.status_calls += 1
+        return _status(self.expiration)
+
+    def renew(self, wallet, skip):
+        self.renew_calls += 1
+        paid = dict((invoice, 'hash' + invoice) for invoice in self.invoices if invoice not in skip)
+        for invoice in paid:
+            skip.add(invoice)
+        if paid:
+            self.expiration += 30 * DAY
+        return paid
+
+
+class TestRenewalScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.events = []
+        self.waits = []
+        self.directory = tempfile.mkdtemp()
+        self.paid = PaidInvoices(os.path.join(self.directory, 'purchases.db'))
+
+    def tearDown(self):
+        self.paid.close()
+        shutil.rmtree(self.directory)
+
+    def _scheduler(self, targets, paid=None):
+        return RenewalScheduler(targets, MagicMock(), renewal_days=3, retry_interval=3600,
+                                on_renewal=self.events.append, paid=paid or self.paid, clock=self.clock,
+                                wait=self.waits.append)
+
+    def test_orders_by_next_due(self):
+        hosters = dict(('vps/{}'.format(days), FakeHoster(START + days * DAY)) for days in [20, 5, 10])
+        scheduler = self._scheduler(hosters)
+        for key in hosters:
+            scheduler.schedule(key)
+        self.assertEqual(scheduler.next_due(), START + 2 * DAY)
+        self.assertEqual(scheduler.next_due('vps/20'), START + 17 * DAY)
+
+    def test_sleeps_until_window_opens(self):
+        hosters = dict(('vps/{}'.format(number), FakeHoster(START + 10 * DAY)) for number in range(100))
+        scheduler = self._scheduler(hosters)
+        for key in hosters:
+            scheduler.schedule(key)
+        self.assertEqual(scheduler.run_pending(), [])
+        self.assertEqual(sum(hoster.renew_calls for hoster in hosters.values()), 0)
+        self.assertEqual(sum(hoster.status_calls for hoster in hosters.values()), 100)
+
+    def test_renews_and_reschedules(self):
+        hoster = FakeHoster(START + 2 * DAY)
+        hoster.invoices = ['17']
+        scheduler = self._scheduler({'vps/linevast': hoster})
+        scheduler.run(once=True)
+
+        event, = self.events
+        self.assertEqual(event.invoices, {'17': 'hash17'})
+        self.assertEqual(event.next_due, START + 29 * DAY)
+        self.assertEqual(scheduler.next_due('vps/linevast'), START + 29 * DAY)
+
+    def test_retries_until_extended(self):
+        hoster = FakeHoster(START + 2 * DAY)
+        scheduler = self._scheduler({'vps/linevast': hoster})
+        scheduler.run(once=True)
+        self.assertEqual(self.events, [])
+        self.assertEqual(scheduler.next_due('vps/linevast'), START + 3600)
+
+        hoster.invoices = ['17']
+        self.clock.now += 3600
+        scheduler.run_pending()
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(hoster.renew_calls, 2)
+
+    def test_does_not_pay_twice(self):
+        hoster = FakeHoster(START + 2 * DAY)
+        hoster.invoices = ['17']
+        hoster.renew = MagicMock(side_effect=lambda wallet, skip: FakeHoster.renew(hoster, wallet, skip) and {})
+        scheduler = self._scheduler({'vps/linevast': hoster})
+        scheduler.run(once=True)  # Paid, but the service is not extended until the payment is confirmed
+        hoster.expiration = START + 2 * DAY
+
+        self.clock.now += 3600
+        scheduler.run_pending()
+        self.assertIn('17', hoster.renew.call_args[1]['skip'])
+
+    def test_paid_invoices_survive_restart(self):
+        hoster = FakeHoster(START + 2 * DAY)
+        hoster.invoices = ['17']
+        self._scheduler({'vps/linevast': hoster}).run(once=True)
+
+        paid = PaidInvoices(self.paid.path)
+        self.assertIn('17', paid.of('vps/linevast'))
+        self.assertNotIn('17', paid.of('vps/other'))
+        paid.close()
+
+    def test_keeps_invoices_paid_before_failure(self):
+        hoster = FakeHoster(START + 2 * DAY)
+
+        def renew(wallet, skip):
+            skip.add('17')
+            raise PaymentException('Invoice 18 of FakeHoster was not paid: None')
+
+        hoster.renew = MagicMock(side_effect=renew)
+        scheduler = self._scheduler({'vps/linevast': hoster})
+        scheduler.run(once=True)
+        self.assertIn('17', self.paid.of('vps/linevast'))
+        self.assertEqual(scheduler.next_due('vps/linevast'), START + 3600)
+
+    def test_scraper_errors_do_not_stop_other_targets(self):
+        unreachable = FakeHoster(START + 2 * DAY)
+        unreachable.get_status = MagicMock(side_effect=requests.ConnectionError('Connection refused'))
+        failing = FakeHoster(START + 2 * DAY)
+        failing.renew = MagicMock(side_effect=requests.ConnectionError('Connection reset'))
+        healthy = FakeHoster(START + 2 * DAY)
+        healthy.invoices = ['17']
+        scheduler = self._scheduler({'vps/a': unreachable, 'vps/b': failing, 'vps/c': healthy})
+
+        with patch('sys.stderr'):
+            scheduler.run(once=True)
+        self.assertEqual([event.key for event in self.events], ['vps/c'])
+        self.assertEqual(scheduler.next_due('vps/a'), START + 3600)
+        self.assertEqual(scheduler.next_due('vps/b'), START + 3600)
+
+        failing.renew.side_effect = None
+        failing.renew.return_value = {}
+        self.clock.now += 3600
+        with patch('sys.stderr'):
+            scheduler.run_pending()  # The status is read again before renewing
+        failing.renew.assert_called_with(scheduler.wallet, skip=ANY)
+        self.assertEqual(failing.renew.call_count, 2)
+
+    def test_status_failure_is_read_again(self):
+        hoster = FakeHoster(START + 20 * DAY)
+        hoster.get_status = MagicMock(side_effect=[LoginException('Login failure'), _status(START + 20 * DAY)])
+        hoster.renew = MagicMock()
+        scheduler = self._scheduler({'vps/linevast': hoster})
+        self.assertIsNone(scheduler.schedule('vps/linevast'))
+
+        self.clock.now += 3600
+        scheduler.run_pending()
+        hoster.renew.assert_not_called()
+        self.assertEqual(scheduler.next_due('vps/linevast'), to_timestamp(_status(START + 20 * DAY).expiration)
+                         - 3 * DAY)
+
+    def test_rejects_unsupported_hoster(self):
+        hoster = FakeHoster(START)
+        hoster.supports_renewal = False
+        self.assertRaises(ValueError, self._scheduler, {'vpn/azirevpn': hoster})
+
+    def test_run_waits_for_next_due(self):
+        def wait(seconds):
+            self.waits.append(seconds)
+            scheduler.stop()
+
+        scheduler = RenewalScheduler({'vps/linevast': FakeHoster(START + 10 * DAY)}, MagicMock(), renewal_days=3,
+                                     paid=self.paid, clock=self.clock, wait=wait)
+        scheduler.run()
+        self.assertEqual(self.waits, [7 * DAY])
+
+
+if __name__ == '__main__':
+    unittest.main()
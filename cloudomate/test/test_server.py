@@ -0,0 +1,143 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import requests
+from future import standard_library
+from mock import MagicMock, patch
+
+from cloudomate.purchase_queue import DONE, FAILED, PurchaseQueue
+from cloudomate.server import CloudomateServer, CloudomateService
+from cloudomate.test.test_whmcs_server import MockGateway, MockHoster
+from cloudomate.test.whmcs_server import WhmcsServer
+
+standard_library.install_aliases()
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.whmcs = WhmcsServer().start()
+        self.whmcs.add_account('bot@pleb.net', 'hunter2')
+        MockHoster.server = self.whmcs
+        MockHoster.checkpoint_dir = tempfile.mkdtemp()
+        MockGateway.base_url = self.whmcs.base_url
+
+        self.wallet = MagicMock()
+        self.wallet.get_network_fee = MagicMock(return_value=0.0001)
+        self.wallet.pay = MagicMock(return_value='f4184fc596403b9d638783cf57adfe4c75c605f6356fbc91338530e9831e9e16')
+        config = os.path.join(os.path.dirname(__file__), 'resources/test_settings.cfg')
+        self.queue = PurchaseQueue(os.path.join(MockHoster.checkpoint_dir, 'purchases.db'))
+        self.service = CloudomateService({'vps': {'mock': MockHoster}}, config=config,
+                                         wallet_factory=lambda: self.wallet, queue=self.queue)
+        self.server = CloudomateServer(self.service, port=0).start()
+
+        self.patcher = patch.multiple('cloudomate.util.pricing.wallet_util', get_rate=MagicMock(return_value=0.0001),
+                                      get_network_fee=MagicMock(return_value=0.0001))
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.server.stop()
+        self.queue.close()
+        self.whmcs.stop()
+        shutil.rmtree(MockHoster.checkpoint_dir)
+
+    def _get(self, path):
+        return requests.get(self.server.base_url + path)
+
+    def _wait_for(self, job_id, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self._get('jobs/' + job_id).json()
+            if job['state'] in (DONE, FAILED):
+                return job
+            time.sleep(0.05)
+        self.fail('Job did not finish')
+
+    def test_providers(self):
+        providers = self._get('providers').json()
+        self.assertEqual(providers['vps'][0]['name'], 'MockHoster')
+
+    def test_options_are_cached(self):
+        options = self._get('vps/mock/options').json()
+        self.assertEqual(options[0]['name'], 'VPS 1')
+        self.assertAlmostEqual(options[0]['estimated_mbtc'], 1000 * (4.99 * 0.0001 * 1.01 + 0.0001))
+
+        with patch.object(MockHoster, 'get_options') as get_options:
+            self._get('vps/mock/options')
+            get_options.assert_not_called()
+
+    def test_status_and_info(self):
+        status = self._get('vps/mock/status').json()
+        self.assertEqual(status['clientarea']['name'], 'VPS 1')
+        info = self._get('vps/mock/info').json()
+        self.assertEqual(info['ip'], self.whmcs.accounts['bot@pleb.net']['services'][0]['ip'])
+
+    def test_info_expires(self):
+        config = os.path.join(os.path.dirname(__file__), 'resources/test_settings.cfg')
+        service = CloudomateService({'vps': {'mock': MockHoster}}, config=config, status_ttl=0, queue=self.queue)
+        self.assertEqual(service.get_info('vps', 'mock').ip, self.whmcs.accounts['bot@pleb.net']['services'][0]['ip'])
+        self.whmcs.accounts['bot@pleb.net']['services'][0]['ip'] = '10.0.0.99'
+        self.assertEqual(service.get_info('vps', 'mock').ip, '10.0.0.99')
+        service.shutdown()
+
+    def test_unknown_provider(self):
+        response = self._get('vps/nonode/options')
+        self.assertEqual(response.status_code, 404)
+
+    def test_login_failure(self):
+        self.whmcs.accounts['bot@pleb.net']['password'] = 'other password'
+        response = self._get('vps/mock/status')
+        self.assertEqual(response.status_code, 502)
+        self.assertFalse(response.json()['retryable'])
+
+    def test_unexpected_error(self):
+        with patch.object(MockHoster, 'get_status', side_effect=IndexError('list index out of range')), \
+                patch('sys.stderr'):
+            response = self._get('vps/mock/status')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()['error'], 'list index out of range')
+
+    def test_purchase(self):
+        response = requests.post(self.server.base_url + 'vps/mock/purchase',
+                                 json={'option': 0, 'settings': {'user': {'email': 'new@pleb.net'}}})
+        self.assertEqual(response.status_code, 202)
+        job = self._wait_for(response.json()['id'])
+        self.assertEqual(job['state'], DONE, job['error'])
+        self.assertEqual(job['result'], 'f4184fc596403b9d638783cf57adfe4c75c605f6356fbc91338530e9831e9e16')
+        self.assertNotIn('settings', job)
+        self.wallet.pay.assert_called_once_with('12cWmVndhmD56dzYcRuYka3Vpgjb3qdRoL', 0.0005, 0.0001)
+        self.assertEqual(self.whmcs.order_count, 1)
+        self.assertEqual(self.queue.get(job['id']).settings['user']['email'], 'new@pleb.net')
+
+    def test_purchase_idempotency_key(self):
+        body = {'option': 0, 'key': 'order-1'}
+        first = requests.post(self.server.base_url + 'vps/mock/purchase', json=body).json()
+        second = requests.post(self.server.base_url + 'vps/mock/purchase', json=body).json()
+        self.assertEqual(first['id'], second['id'])
+        self._wait_for(first['id'])
+        self.assertEqual(self.whmcs.order_count, 1)
+
+    def test_unpaid_purchase_fails(self):
+        self.wallet.pay.return_value = None
+        response = requests.post(self.server.base_url + 'vps/mock/purchase', json={'option': 0})
+        job = self._wait_for(response.json()['id'])
+        self.assertEqual(job['state'], FAILED)
+
+    def test_unknown_job(self):
+        self.assertEqual(self._get('jobs/nojob').status_code, 404)
+
+    def test_purchase_bad_option(self):
+        response = requests.post(self.server.base_url + 'vps/mock/purchase', json={'option': 5})
+        self.assertEqual(response.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,8 @@ from __future__ import unicode_literals
 import unittest
 
 import os
+from configparser import NoOptionError
+
 from future import standard_library
 
 from cloudomate.util.settings import Settings
@@ -70,6 +72,39 @@ class TestSettings(unittest.TestCase):
     def test_custom_provider(self):
         self.assertEqual(self.settings.get("testhoster", "email"), "test@test.net")
 
+    def test_profile(self):
+        profile = self.settings.profile()
+        self.assertEqual(profile.user.email, 'bot@pleb.net')
+        self.assertEqual(profile.get('server', 'ns1'), 'ns1')
+        self.assertRaises(NoOptionError, profile.get, 'user', 'randomattribute')
+        self.assertRaises(AttributeError, setattr, profile.user, 'email', 'other@pleb.net')
+
+    def test_profile_provider_overrides(self):
+        profile = self.settings.profile('TestHoster')
+        self.assertEqual(profile.user.email, 'test@test.net')
+        self.assertEqual(profile.user.firstname, 'Pleb')
+
+    def test_profile_is_cached_until_put(self):
+        profile = self.settings.profile()
+        self.assertIs(self.settings.profile(), profile)
+        self.settings.put('user', 'firstname', 'Other')
+        self.assertEqual(self.settings.profile().user.firstname, 'Other')
+
+    def test_named_profile(self):
+        self.assertEqual(self.settings.get_profile_names(), ['alice'])
+        alice = self.settings.for_profile('alice')
+        self.assertEqual(alice.get('user', 'email'), 'alice@pleb.net')
+        self.assertEqual(alice.get('user', 'lastname'), 'Net')
+        self.assertEqual(alice.profile().user.firstname, 'Alice')
+        self.assertEqual(self.settings.get('user', 'email'), 'bot@pleb.net')
+
+    def test_named_profile_put(self):
+        alice = self.settings.for_profile('alice')
+        alice.put('user', 'lastname', 'Liddell')
+        self.assertEqual(alice.get('user', 'lastname'), 'Liddell')
+        self.assertEqual(self.settings.get('user', 'lastname'), 'Net')
+        self.assertEqual(alice.to_dict()['user']['lastname'], 'Liddell')
+
 
 if __name__ == '__main__':
     unittest.main()
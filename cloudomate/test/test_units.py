@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+from bs4 import BeautifulSoup
+from future import standard_library
+
+from cloudomate.hoster.vps.crowncloud import CrownCloud
+from cloudomate.util import units
+from cloudomate.util.units import Price
+
+standard_library.install_aliases()
+
+
+class TestUnits(unittest.TestCase):
+    def test_parse_gigabytes(self):
+        self.assertEqual(units.parse_gigabytes('512 MB'), 0.5)
+        self.assertEqual(units.parse_gigabytes('1TB'), 1024.0)
+        self.assertEqual(units.parse_gigabytes('Bandwidth: 2.5 GB'), 2.5)
+        self.assertEqual(units.parse_gigabytes('1048576 KB'), 1.0)
+        self.assertEqual(units.parse_gigabytes('1000 GB @ 1Gbps'), 1000.0)
+
+    def test_parse_gigabytes_default_unit(self):
+        self.assertEqual(units.parse_gigabytes('2', 'GB'), 2.0)
+        self.assertEqual(units.parse_gigabytes('1024', 'MB'), 1.0)
+        self.assertRaises(ValueError, units.parse_gigabytes, '2 vCores')
+
+    def test_to_gigabytes(self):
+        self.assertEqual(units.to_gigabytes(1024 ** 3, 'B'), 1.0)
+        self.assertEqual(units.to_gigabytes('2', 'tb'), 2048.0)
+        self.assertRaises(ValueError, units.to_gigabytes, 1, 'XB')
+
+    def test_parse_gbps(self):
+        self.assertEqual(units.parse_gbps('1Gbps Port'), 1.0)
+        self.assertEqual(units.parse_gbps('100 Mbit/s'), 0.1)
+        self.assertEqual(units.parse_gbps('1000 GB @ 10Gbps'), 10.0)
+        self.assertEqual(units.parse_gbps('1'), 1.0)
+
+    def test_parse_price(self):
+        self.assertEqual(units.parse_price('$4.99 USD\nMonthly'), Price(4.99, 'USD'))
+        self.assertEqual(units.parse_price('€4,99 EUR'), Price(4.99, 'EUR'))
+        self.assertEqual(units.parse_price('€ 5 / month'), Price(5.0, 'EUR'))
+        self.assertEqual(units.parse_price('$1,024.50/mo'), Price(1024.5, 'USD'))
+        self.assertEqual(units.parse_price('7.95', 'EUR'), Price(7.95, 'EUR'))
+        self.assertRaises(ValueError, units.parse_price, 'Free')
+
+    def test_parse_number(self):
+        self.assertEqual(units.parse_int('\n2 vCPU\n'), 2)
+        self.assertRaises(ValueError, units.parse_number, 'none')
+
+    def test_memoised(self):
+        units.parse_gigabytes('3 GB')
+        self.assertIn(('3 GB',), units.parse_gigabytes.memo)
+
+    def test_crowncloud_row(self):
+        row = BeautifulSoup('<tr><td>OpenVZ 1</td><td>1024 MB</td><td>20 GB SSD</td><td>2 vCPU</td>'
+                            '<td>1000 GB @ 1Gbps</td><td>1 IPv4</td><td>$4/mo</td>'
+                            '<td><a href="https://crowncloud.net/order">Order</a></td></tr>', 'lxml').tr
+        option = CrownCloud._parse_row(row)
+        self.assertEqual((option.cores, option.memory, option.storage, option.bandwidth, option.connection,
+                          option.price), (2, 1.0, 20.0, 1000.0, 1.0, 4.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -17,7 +17,7 @@ from cloudomate.hoster.vps.crowncloud import CrownCloud
 from cloudomate.hoster.vps.linevast import LineVast
 from cloudomate.hoster.vps.pulseservers import Pulseservers
 from cloudomate.hoster.vps.undergroundprivate import UndergroundPrivate
-from cloudomate.util.fakeuserscraper import UserScraper
+from cloudomate.util.fakeuserscraper import UserGenerator
 from cloudomate.util.settings import Settings
 
 standard_library.install_aliases()
@@ -57,7 +57,7 @@ class TestHosters(unittest.TestCase):
 
     @staticmethod
     def _merge_random_user_data(user_settings):
-        usergenerator = UserScraper()
+        usergenerator = UserGenerator()
         randomuser = usergenerator.get_user()
         for section in randomuser.keys():
             for key in randomuser[section].keys():
@@ -0,0 +1,192 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import unittest
+
+import requests
+from future import standard_library
+from mock import MagicMock, patch
+
+from cloudomate import wallet as wallet_util
+
+standard_library.install_aliases()
+
+
+class TestFeeEstimation(unittest.TestCase):
+    def test_estimate_tx_size_average(self):
+        self.assertEqual(wallet_util.estimate_tx_size(), wallet_util.AVG_TX_SIZE)
+        self.assertEqual(wallet_util.estimate_tx_size(), 226)
+
+    def test_estimate_tx_size_more_inputs(self):
+        self.assertEqual(wallet_util.estimate_tx_size(3, 2) - wallet_util.estimate_tx_size(1, 2),
+                         2 * wallet_util.TX_INPUT_SIZE)
+
+    def test_get_network_fee(self):
+        estimator = wallet_util.StaticFeeEstimator(10)
+        fee = wallet_util.get_network_fee(inputs=1, outputs=2, estimator=estimator)
+        self.assertAlmostEqual(fee, 10 * 226 * wallet_util.SATOSHI_TO_BTC)
+
+    def test_cached_estimator_caches_per_speed(self):
+        backend = MagicMock()
+        backend.get_fee_rate = MagicMock(return_value=20.0)
+        estimator = wallet_util.CachedFeeEstimator([backend])
+        estimator.get_fee_rate('halfHourFee')
+        estimator.get_fee_rate('halfHourFee')
+        self.assertEqual(backend.get_fee_rate.call_count, 1)
+        estimator.get_fee_rate('fastestFee')
+        self.assertEqual(backend.get_fee_rate.call_count, 2)
+
+    def test_cached_estimator_falls_back(self):
+        failing = MagicMock()
+        failing.get_fee_rate = MagicMock(side_effect=ValueError('unavailable'))
+        estimator = wallet_util.CachedFeeEstimator([failing, wallet_util.StaticFeeEstimator(5)])
+        self.assertEqual(estimator.get_fee_rate('hourFee'), 5)
+
+    def test_cached_estimator_all_failing(self):
+        failing = MagicMock()
+        failing.get_fee_rate = MagicMock(side_effect=KeyError('hourFee'))
+        estimator = wallet_util.CachedFeeEstimator([failing])
+        self.assertRaises(ValueError, estimator.get_fee_rate, 'hourFee')
+
+    def test_electrum_estimator(self):
+        handler = MagicMock()
+        handler.get_fee_rate = MagicMock(return_value=12.5)
+        self.assertEqual(wallet_util.ElectrumFeeEstimator(handler).get_fee_rate('halfHourFee'), 12.5)
+
+    @patch.object(wallet_util, 'ElectrumWalletHandler')
+    def test_wallet_network_fee_by_inputs(self, handler):
+        handler.return_value.get_unspent = MagicMock(return_value=[{'value': '0.1'}, {'value': '0.2'}])
+        wallet = wallet_util.Wallet()
+        wallet.fee_estimator = wallet_util.StaticFeeEstimator(10)
+        self.assertAlmostEqual(wallet.get_network_fee(0.25),
+                               10 * wallet_util.estimate_tx_size(2, 2) * wallet_util.SATOSHI_TO_BTC)
+
+    @patch('sys.stdout')
+    @patch.object(wallet_util, 'ElectrumWalletHandler')
+    def test_wallet_network_fee_without_unspent(self, handler, _):
+        handler.return_value.get_unspent = MagicMock(side_effect=ValueError('No JSON object could be decoded'))
+        wallet = wallet_util.Wallet()
+        wallet.fee_estimator = wallet_util.StaticFeeEstimator(10)
+        self.assertAlmostEqual(wallet.get_network_fee(0.25), 10 * 226 * wallet_util.SATOSHI_TO_BTC)
+
+    @patch.object(wallet_util, 'ElectrumWalletHandler')
+    def test_wallet_address_index_cached(self, handler):
+        handler.return_value.get_addresses = MagicMock(return_value=['addr1'])
+        wallet = wallet_util.Wallet()
+        index = wallet.get_address_index()
+        self.assertTrue(index.is_mine('addr1'))
+        handler.return_value.get_addresses.return_value = ['addr1', 'addr2']
+        self.assertIs(wallet.get_address_index(), index)
+        self.assertFalse(index.is_mine('addr2'))
+        self.assertTrue(wallet.get_address_index(refresh=True).is_mine('addr2'))
+
+
+class TestRates(unittest.TestCase):
+    def setUp(self):
+        wallet_util._rate_cache.clear()
+
+    def tearDown(self):
+        wallet_util._rate_cache.clear()
+
+    @patch.object(wallet_util, '_fetch_rate')
+    @patch.object(wallet_util, '_fetch_ticker_rates', return_value={'USD': 0.0001, 'EUR': 0.0002})
+    def test_get_rates_single_request(self, ticker, single):
+        rates = wallet_util.get_rates(['USD', 'EUR'])
+        self.assertEqual(rates, {'USD': 0.0001, 'EUR': 0.0002})
+        ticker.assert_called_once()
+        single.assert_not_called()
+
+    @patch.object(wallet_util, '_fetch_rate', return_value=0.5)
+    @patch.object(wallet_util, '_fetch_ticker_rates', return_value={'USD': 0.0001})
+    def test_get_rates_falls_back_per_currency(self, ticker, single):
+        rates = wallet_util.get_rates(['USD', 'XYZ'])
+        self.assertEqual(rates, {'USD': 0.0001, 'XYZ': 0.5})
+        single.assert_called_once_with('XYZ')
+
+    @patch.object(wallet_util, '_fetch_ticker_rates', return_value={'USD': 0.0001})
+    def test_get_rate_cached(self, ticker):
+        self.assertEqual(wallet_util.get_rate('USD'), 0.0001)
+        self.assertEqual(wallet_util.get_rate('USD'), 0.0001)
+        ticker.assert_called_once()
+
+    def test_get_rate_none(self):
+        self.assertIsNone(wallet_util.get_rate(None))
+
+    @patch.object(wallet_util, 'fallback_get_rate', return_value=0.25)
+    @patch.object(wallet_util, '_session')
+    def test_fetch_rate(self, session, fallback):
+        session.get.return_value = MagicMock(status_code=200)
+        session.get.return_value.json.return_value = {'bpi': {'XYZ': {'rate_float': 2.0}}}
+        self.assertEqual(wallet_util._fetch_rate('XYZ'), 0.5)
+        fallback.assert_not_called()
+
+    @patch.object(wallet_util, 'fallback_get_rate', return_value=0.25)
+    @patch.object(wallet_util, '_session')
+    def test_fetch_rate_falls_back(self, session, fallback):
+        session.get.return_value = MagicMock(status_code=200)
+        session.get.return_value.json.return_value = {'error': 'unknown currency'}
+        self.assertEqual(wallet_util._fetch_rate('XYZ'), 0.25)
+
+        session.get.return_value.json.side_effect = ValueError('No JSON object could be decoded')
+        self.assertEqual(wallet_util._fetch_rate('XYZ'), 0.25)
+
+        session.get.side_effect = requests.ConnectionError()
+        self.assertEqual(wallet_util._fetch_rate('XYZ'), 0.25)
+        self.assertEqual(fallback.call_count, 3)
+
+
+class TestAddressIndex(unittest.TestCase):
+    def setUp(self):
+        self.handler = MagicMock()
+        self.addresses = ['addr1', 'addr2', 'addr3']
+        self.unused = ['addr2', 'addr3']
+        self.handler.get_addresses = MagicMock(
+            side_effect=lambda unused=False: list(self.unused if unused else self.addresses))
+        self.index = wallet_util.AddressIndex(self.handler)
+        self.index.refresh()
+
+    def test_membership(self):
+        self.assertTrue(self.index.is_mine('addr1'))
+        self.assertTrue('addr3' in self.index)
+        self.assertFalse(self.index.is_mine('other'))
+        self.assertEqual(len(self.index), 3)
+
+    def test_usage(self):
+        self.assertTrue(self.index.is_used('addr1'))
+        self.assertFalse(self.index.is_used('addr2'))
+        self.assertIsNone(self.index.is_used('other'))
+        self.assertEqual(self.index.next_unused(), 'addr2')
+
+    def test_refresh_incremental(self):
+        self.addresses.append('addr4')
+        self.unused = ['addr3', 'addr4']
+        self.assertEqual(self.index.refresh(), ['addr4'])
+        self.assertTrue(self.index.is_used('addr2'))
+        self.assertEqual(self.index.next_unused(), 'addr3')
+
+    def test_refresh_all_used(self):
+        self.unused = []
+        self.index.refresh()
+        self.assertIsNone(self.index.next_unused())
+        self.handler.get_addresses.reset_mock()
+        self.index.refresh()
+        self.handler.get_addresses.assert_called_once_with()
+
+    def test_balance_cached(self):
+        self.handler.get_address_balance = MagicMock(return_value={'confirmed': '0.5', 'unconfirmed': '0.25'})
+        self.assertEqual(self.index.get_balance('addr1'), 0.75)
+        self.assertEqual(self.index.get_balance('addr1'), 0.75)
+        self.handler.get_address_balance.assert_called_once_with('addr1')
+
+    def test_balance_refreshed(self):
+        self.handler.get_address_balance = MagicMock(return_value={'confirmed': '0.5'})
+        self.assertEqual(self.index.get_balance('addr1'), 0.5)
+        self.handler.get_address_balance.return_value = {'confirmed': '0.5', 'unconfirmed': '0.1'}
+        self.index.refresh()
+        self.assertEqual(self.index.get_balance('addr1'), 0.6)
+
+
+if __name__ == '__main__':
+    unittest.main()
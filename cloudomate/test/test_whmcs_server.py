@@ -0,0 +1,342 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from future import standard_library
+from mock import MagicMock, patch
+
+from cloudomate.exceptions.hoster_error import CircuitOpenException, HosterUnavailableException, LoginException
+from cloudomate.exceptions.hoster_error import PaymentException, SolusvmApiException
+from cloudomate.gateway.gateway import Gateway, PaymentInfo
+from cloudomate.hoster.vps.solusvm_hoster import SolusvmHoster
+from cloudomate.hoster.vps.vps_hoster import VpsOption, VpsStatusResource
+from cloudomate.test.whmcs_server import WhmcsServer
+from cloudomate.util import ratelimit
+from cloudomate.util.settings import Settings
+
+standard_library.install_aliases()
+
+
+class MockGateway(Gateway):
+    base_url = None
+
+    @staticmethod
+    def get_name():
+        return "BitPay"
+
+    @classmethod
+    def extract_info(cls, url):
+        invoice_id = url.split("=")[1]
+        data = requests.get(cls.base_url + 'invoices/' + invoice_id).json()['data']
+        return PaymentInfo(float(data['btcDue']), data['bitcoinAddress'])
+
+    @staticmethod
+    def get_gateway_fee():
+        return 0.01
+
+
+class MockHoster(SolusvmHoster):
+    """
+    SolusvmHoster running the shared WHMCS purchase flow against the local mock panel.
+    """
+    server = None
+
+    @classmethod
+    def get_clientarea_url(cls):
+        return cls.server.clientarea_url
+
+    @staticmethod
+    def get_gateway():
+        return MockGateway
+
+    @staticmethod
+    def get_metadata():
+        return 'MockHoster', 'http://127.0.0.1/'
+
+    @staticmethod
+    def get_required_settings():
+        return {'user': ['email', 'password']}
+
+    @classmethod
+    def get_options(cls):
+        return [VpsOption('VPS 1', 1, 1.0, 20.0, 1000.0, 1000, cls.server.price, cls.server.purchase_url(1))]
+
+    def _get_purchase_steps(self, wallet, option):
+        return [
+            ('cart', lambda state: self._add_to_cart(option)),
+            ('checkout', self._checkout),
+            self._pay_step(wallet),
+        ]
+
+    def _get_prefetch_urls(self, option):
+        return [option.purchase_url, self.server.base_url + 'cart.php?a=view']
+
+    def _add_to_cart(self, option):
+        self._browser.open(option.purchase_url)
+        self._browser.select_form('form#frmConfigureProduct')
+        self._fill_server_form()
+        self._browser.submit_selected()
+
+    def _checkout(self, state):
+        self._browser.open(self.server.base_url + 'cart.php?a=view')
+        summary = self._browser.get_current_page().find('div', class_='summary-container')
+        self._browser.follow_link(summary.find('a', class_='btn-checkout'))
+
+        self._browser.select_form('form#frmCheckout')
+        self._fill_user_form(self.get_gateway().get_name())
+
+        self._browser.select_form(nr=0)
+        self._browser.submit_selected()
+        state['invoice_url'] = self._browser.get_url()
+
+
+class TestWhmcsServer(unittest.TestCase):
+    def setUp(self):
+        self.server = WhmcsServer().start()
+        MockHoster.server = self.server
+        MockGateway.base_url = self.server.base_url
+        self.settings = self._settings('bot@pleb.net')
+        MockHoster.checkpoint_dir = tempfile.mkdtemp()
+        self.limiter = ratelimit.get_limiter()
+        ratelimit.set_limiter(ratelimit.RateLimiter(rate=None))  # Load tests run as fast as the panel allows
+
+    def tearDown(self):
+        ratelimit.set_limiter(self.limiter)
+        self.server.stop()
+        shutil.rmtree(MockHoster.checkpoint_dir)
+
+    @staticmethod
+    def _settings(email):
+        settings = Settings()
+        settings.read_settings(os.path.join(os.path.dirname(__file__), 'resources/test_settings.cfg'))
+        settings.put('user', 'email', email)
+        return settings
+
+    @staticmethod
+    def _wallet():
+        wallet = MagicMock()
+        wallet.get_network_fee = MagicMock(return_value=0.0001)
+        return wallet
+
+    def test_purchase(self):
+        wallet = self._wallet()
+        hoster = MockHoster(self.settings)
+        hoster.purchase(wallet, MockHoster.get_options()[0])
+        wallet.pay.assert_called_once_with('12cWmVndhmD56dzYcRuYka3Vpgjb3qdRoL', 0.0005, 0.0001)
+        self.assertEqual(self.server.order_count, 1)
+
+        hoster._prefetch.wait()
+        self.assertEqual(hoster._prefetch.errors, [])
+
+    def test_purchase_then_status(self):
+        MockHoster(self.settings).purchase(self._wallet(), MockHoster.get_options()[0])
+        status = MockHoster(self.settings).get_status()
+        self.assertFalse(status.online)  # New services are pending
+        self.assertEqual((status.clientarea.price, status.clientarea.currency), (4.99, 'USD'))
+
+    def test_services_in_other_currency(self):
+        self.server.currency = 'EUR'
+        self.server.add_account('bot@pleb.net', 'hunter2', services=3)
+        clientarea = MockHoster(self.settings)._create_clientarea()
+        with patch('cloudomate.util.pricing.wallet_util.get_rates',
+                   return_value={'USD': 0.0001, 'EUR': 0.00012}) as get_rates:
+            services = clientarea.get_services()
+            get_rates.assert_not_called()
+            self.assertEqual([(service.price, service.currency) for service in services], [(4.99, 'EUR')] * 3)
+
+            services = clientarea.get_services('USD')
+        get_rates.assert_called_once_with({'EUR', 'USD'})
+        self.assertEqual([(service.price, service.currency) for service in services], [(5.99, 'USD')] * 3)
+
+    def test_configuration(self):
+        service, = self.server.add_account('bot@pleb.net', 'hunter2')
+        configuration = MockHoster(self.settings).get_configuration()
+        self.assertEqual(configuration.ip, service['ip'])
+
+    def test_renew(self):
+        self.server.add_account('bot@pleb.net', 'hunter2', services=2)
+        invoice = self.server.add_invoice('bot@pleb.net')
+        self.server.add_invoice('bot@pleb.net', status='Paid')
+        wallet = self._wallet()
+        wallet.pay = MagicMock(return_value='ab' * 32)
+        hoster = MockHoster(self.settings)
+        expiration = hoster.get_status().expiration
+
+        self.assertEqual(hoster.renew(wallet), {str(invoice['id']): 'ab' * 32})
+        wallet.pay.assert_called_once_with('12cWmVndhmD56dzYcRuYka3Vpgjb3qdRoL', 0.001, 0.0001)
+        self.assertEqual(hoster.renew(wallet, skip={str(invoice['id'])}), {})
+
+        service = self.server.accounts['bot@pleb.net']['services'][0]
+        service['next_due'] = (expiration + datetime.timedelta(days=30)).date().isoformat()
+        self.assertEqual(hoster.get_status().expiration, expiration + datetime.timedelta(days=30))
+
+    def test_renew_records_paid_before_failure(self):
+        self.server.add_account('bot@pleb.net', 'hunter2')
+        first = self.server.add_invoice('bot@pleb.net')
+        second = self.server.add_invoice('bot@pleb.net')
+        wallet = self._wallet()
+        wallet.pay = MagicMock(side_effect=['a' * 64, None])  # The second payment fails for lack of funds
+        skip = set()
+
+        self.assertRaises(PaymentException, MockHoster(self.settings).renew, wallet, skip)
+        self.assertEqual(skip, {str(first['id'])})
+        self.assertNotIn(str(second['id']), skip)
+
+    def test_renew_rejects_failed_broadcast(self):
+        self.server.add_account('bot@pleb.net', 'hunter2')
+        self.server.add_invoice('bot@pleb.net')
+        wallet = self._wallet()
+        wallet.pay = MagicMock(return_value='the transaction was rejected')
+        skip = set()
+        self.assertRaises(PaymentException, MockHoster(self.settings).renew, wallet, skip)
+        self.assertEqual(skip, set())
+
+    def test_status_and_configuration_share_pages(self):
+        self.server.add_account('bot@pleb.net', 'hunter2')
+        hoster = MockHoster(self.settings)
+        status = hoster.get_status()
+        requests = self.server.request_count
+        hoster.get_configuration()
+        self.assertEqual(self.server.request_count, requests + 1)  # Only the service page
+
+        requests = self.server.request_count
+        self.assertIs(hoster.get_status(), status)
+        hoster.get_configuration()
+        self.assertEqual(self.server.request_count, requests)
+
+        hoster.clear_cache()
+        hoster.get_configuration()
+        self.assertEqual(self.server.request_count, requests + 2)  # The services list and the service page
+
+    def test_solusvm_api_status(self):
+        service, = self.server.add_account('bot@pleb.net', 'hunter2')
+        self.settings.put('server', 'solusvm_url', self.server.base_url)
+        self.settings.put('server', 'solusvm_key', service['api_key'])
+        self.settings.put('server', 'solusvm_hash', service['api_hash'])
+        hoster = MockHoster(self.settings)
+
+        requests = self.server.request_count
+        usage = hoster.get_usage()
+        self.assertEqual(self.server.request_count, requests + 1)
+        self.assertTrue(usage.online)
+        self.assertEqual(usage.ip, service['ip'])
+        self.assertEqual(usage.memory, VpsStatusResource(0.5, 2.0))
+
+        status = hoster.get_status()
+        self.assertEqual(status.storage, VpsStatusResource(5.0, 50.0))
+        self.assertEqual(status.clientarea.name, service['name'])
+
+        self.server.accounts['bot@pleb.net']['services'][0]['next_due'] = '2030-01-01'
+        hoster.clear_cache()
+        self.assertNotEqual(hoster.get_status().expiration, status.expiration)
+
+    def test_solusvm_service_ttl(self):
+        service, = self.server.add_account('bot@pleb.net', 'hunter2')
+        self.settings.put('server', 'solusvm_url', self.server.base_url)
+        self.settings.put('server', 'solusvm_key', service['api_key'])
+        self.settings.put('server', 'solusvm_hash', service['api_hash'])
+        self.settings.put('server', 'solusvm_service_ttl', '3600')
+        hoster = MockHoster(self.settings)
+        status = hoster.get_status()
+
+        requests = self.server.request_count
+        hoster.clear_cache()
+        self.assertEqual(hoster.get_status().clientarea, status.clientarea)
+        self.assertEqual(self.server.request_count, requests + 1)  # Only the API, not the clientarea
+
+    def test_solusvm_api_bad_key(self):
+        self.settings.put('server', 'solusvm_url', self.server.base_url)
+        self.settings.put('server', 'solusvm_key', 'wrong')
+        self.settings.put('server', 'solusvm_hash', 'wrong')
+        self.assertRaises(SolusvmApiException, MockHoster(self.settings).get_usage)
+
+    def test_solusvm_api_not_configured(self):
+        self.assertIsNone(MockHoster(self.settings).get_usage())
+
+    def test_login_failure(self):
+        self.server.add_account('bot@pleb.net', 'other password')
+        self.assertRaises(LoginException, MockHoster(self.settings).get_status)
+
+    def test_failure_injection(self):
+        self.server.fail_paths.add('/cart.php')
+        with self.assertRaises(HosterUnavailableException) as context:
+            MockHoster(self.settings).purchase(self._wallet(), MockHoster.get_options()[0])
+        self.assertTrue(context.exception.retryable)
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(self.server.order_count, 0)
+
+    def test_circuit_breaker(self):
+        ratelimit.set_limiter(ratelimit.RateLimiter(rate=None, failure_threshold=2))
+        self.server.fail_paths.add('/clientarea.php')
+        for _ in range(2):
+            self.assertRaises(HosterUnavailableException, MockHoster(self.settings).get_status)
+
+        request_count = self.server.request_count
+        self.assertRaises(CircuitOpenException, MockHoster(self.settings).get_status)
+        self.assertEqual(self.server.request_count, request_count)
+
+    def test_resume_after_failed_payment(self):
+        wallet = self._wallet()
+        wallet.pay = MagicMock(side_effect=[IOError('Electrum is offline'), None])
+        option = MockHoster.get_options()[0]
+        self.assertRaises(IOError, MockHoster(self.settings).purchase, wallet, option)
+        self.assertEqual(os.listdir(MockHoster.checkpoint_dir), [os.path.basename(
+            MockHoster(self.settings)._get_checkpoint_path(option))])
+
+        self.server.fail_paths.add('/cart.php')  # The cart and checkout steps must not be repeated
+        MockHoster(self.settings).purchase(wallet, option)
+        self.assertEqual(wallet.pay.call_count, 2)
+        self.assertEqual(self.server.order_count, 1)
+        self.assertEqual(os.listdir(MockHoster.checkpoint_dir), [])
+
+    def test_resume_after_failed_checkout(self):
+        option = MockHoster.get_options()[0]
+        with patch.object(MockHoster, '_checkout', side_effect=IOError('Connection reset')):
+            self.assertRaises(IOError, MockHoster(self.settings).purchase, self._wallet(), option)
+
+        # The restored session cookie still holds the cart filled by the first attempt
+        with patch.object(MockHoster, '_add_to_cart') as add_to_cart:
+            MockHoster(self.settings).purchase(self._wallet(), option)
+            add_to_cart.assert_not_called()
+        self.assertEqual(self.server.order_count, 1)
+
+    def test_resume_with_purchase_id(self):
+        option = MockHoster.get_options()[0]
+        with patch.object(MockHoster, '_checkout', side_effect=IOError('Connection reset')):
+            self.assertRaises(IOError, MockHoster(self.settings).purchase, self._wallet(), option, 'node-17')
+
+        self.settings.put('user', 'email', 'random@pleb.net')  # Other random user details on the second run
+        with patch.object(MockHoster, '_add_to_cart') as add_to_cart:
+            MockHoster(self.settings).purchase(self._wallet(), option, 'node-17')
+            add_to_cart.assert_not_called()
+        self.assertEqual(self.server.order_count, 1)
+
+    def test_concurrent_purchases_and_status_sweeps(self):
+        purchases = 20
+        option = MockHoster.get_options()[0]
+
+        def purchase(i):
+            MockHoster(self._settings('user{}@pleb.net'.format(i))).purchase(self._wallet(), option)
+
+        def status(i):
+            return MockHoster(self._settings('user{}@pleb.net'.format(i))).get_status()
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            list(executor.map(purchase, range(purchases)))
+            statuses = list(executor.map(status, range(purchases)))
+
+        self.assertEqual(self.server.order_count, purchases)
+        self.assertEqual(len(statuses), purchases)
+
+
+if __name__ == '__main__':
+    unittest.main()
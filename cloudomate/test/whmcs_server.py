@@ -0,0 +1,471 @@
+"""Local stand-in for the WHMCS billing panel and SolusVM clientarea used by the SolusvmHoster subclasses
+
+It serves the pages of the shared purchase flow (product configuration, cart, checkout, invoice and a
+BitPay style invoice API), of the clientarea (login, services and invoices tables and service details) and of
+the SolusVM client API, with configurable latency and failure injection, so that SolusvmHoster code can be load
+tested offline.
+
+Run it standalone:
+python -m cloudomate.test.whmcs_server --port 8080 --latency 0.1 --failure-rate 0.01
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import datetime
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from argparse import ArgumentParser
+from builtins import object
+from builtins import str
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from future import standard_library
+from future.moves.urllib.parse import parse_qs, urlparse
+
+standard_library.install_aliases()
+
+SESSION_COOKIE = 'WHMCSsession'
+
+PAGE = '<!DOCTYPE html><html><head><title>WHMCS</title></head><body>{}</body></html>'
+
+CONFIGURE_PAGE = '''
+<form id="frmConfigureProduct" action="cart.php" method="post">
+  <input type="hidden" name="pid" value="{pid}">
+  <input type="text" name="hostname" value="">
+  <input type="password" name="rootpw" value="">
+  <input type="text" name="ns1prefix" value="">
+  <input type="text" name="ns2prefix" value="">
+  <select name="billingcycle"><option value="monthly">Monthly</option></select>
+  <button type="submit">Continue</button>
+</form>'''
+
+CART_PAGE = '''
+<div class="summary-container">
+  <span class="total">{total}</span>
+  <a href="cart.php?a=checkout" class="btn btn-checkout">Checkout</a>
+</div>'''
+
+CHECKOUT_PAGE = '''
+{errors}
+<form id="frmCheckout" name="orderfrm" action="cart.php?a=checkout" method="post">
+  <input type="text" name="firstname"><input type="text" name="lastname">
+  <input type="text" name="email"><input type="text" name="phonenumber">
+  <input type="text" name="companyname"><input type="text" name="address1">
+  <input type="text" name="city"><input type="text" name="state">
+  <input type="text" name="postcode"><input type="text" name="country">
+  <input type="password" name="password"><input type="password" name="password2">
+  <input type="radio" name="paymentmethod" value="bitpay">
+  <input type="checkbox" name="accepttos" value="on">
+  <button type="submit" id="btnCompleteOrder">Complete Order</button>
+</form>'''
+
+ERROR_BOX = '<div class="checkout-error-feedback errorbox">{}</div>'
+
+INVOICE_PAGE = '''
+<h1>Invoice #{invoice}</h1>
+<form action="invoice" method="get">
+  <input type="hidden" name="id" value="{token}">
+  <input type="submit" value="Pay Now">
+</form>'''
+
+GATEWAY_PAGE = '<div class="invoice">Pay {amount} BTC to {address}</div>'
+
+LOGIN_PAGE = '''
+<div class="logincontainer">
+  <form method="post" action="dologin.php">
+    <input type="email" name="username"><input type="password" name="password">
+    <input type="submit" value="Login">
+  </form>
+</div>'''
+
+SERVICES_PAGE = '''
+<table id="tableServicesList"><thead><tr><th>Product</th></tr></thead><tbody>{rows}</tbody></table>'''
+
+SERVICE_ROW = '''
+<tr>
+  <td><strong>{name}</strong></td>
+  <td>{price}</td>
+  <td><span>{next_due}</span></td>
+  <td><span class="label">{status}</span></td>
+  <td><a href="clientarea.php?action=productdetails&id={id}">View</a></td>
+</tr>'''
+
+INVOICES_PAGE = '''
+<table id="tableInvoicesList"><thead><tr><th>Invoice #</th></tr></thead><tbody>{rows}</tbody></table>'''
+
+INVOICE_ROW = '''
+<tr>
+  <td><a href="viewinvoice.php?id={id}">{id}</a></td>
+  <td><span>{date}</span></td>
+  <td><span>{due}</span></td>
+  <td>${amount:.2f} USD</td>
+  <td><span class="label">{status}</span></td>
+</tr>'''
+
+SERVICE_PAGE = '''
+<div id="domain">
+  <div class="row"><div><strong>Hostname</strong></div><div>{hostname}</div></div>
+  <div class="row"><div><strong>IP Address</strong></div><div>{ip}</div></div>
+</div>'''
+
+
+class WhmcsServer(object):
+    """
+    WhmcsServer runs the mock panel in a background thread.
+
+    :param latency: seconds to wait before answering every request
+    :param failure_rate: probability of answering a request with 503 Service Unavailable
+    :param fail_paths: paths that always fail with 503
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, failure_rate=0.0, fail_paths=None,
+                 price=4.99, currency='USD', btc_due=0.0005, address='12cWmVndhmD56dzYcRuYka3Vpgjb3qdRoL'):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.fail_paths = set(fail_paths or [])
+        self.price = price
+        self.currency = currency
+        self.btc_due = btc_due
+        self.address = address
+
+        self.accounts = {}  # Email to dictionary with password and services
+        self.invoices = {}  # Token to invoice dictionary
+        self.request_count = 0
+        self._sessions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self._server = _ThreadingHTTPServer((host, port), _WhmcsRequestHandler)
+        self._server.whmcs = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    @property
+    def clientarea_url(self):
+        return self.base_url + 'clientarea.php'
+
+    def purchase_url(self, pid=1):
+        return self.base_url + 'cart.php?a=add&pid={}'.format(pid)
+
+    @property
+    def order_count(self):
+        with self._lock:
+            return len(self.invoices)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def add_account(self, email, password, services=1, status='Active'):
+        """
+        Create an account with a number of services
+        :return: the list of created services
+        """
+        with self._lock:
+            account = self.accounts.setdefault(email, {'password': password, 'services': []})
+            for _ in range(services):
+                account['services'].append(self._new_service(status))
+            return account['services']
+
+    def _new_service(self, status, pid=1):
+        identifier = next(self._ids)
+        return {
+            'id': identifier,
+            'pid': pid,
+            'name': 'VPS {}'.format(pid),
+            'status': status,
+            'next_due': (datetime.date.today() + datetime.timedelta(days=30)).isoformat(),
+            'ip': '10.{}.{}.{}'.format((identifier >> 16) & 255, (identifier >> 8) & 255, identifier & 255),
+            'hostname': 'vps{}.example.com'.format(identifier),
+            'api_key': 'KEY{}'.format(identifier),
+            'api_hash': 'HASH{}'.format(identifier),
+        }
+
+    def add_invoice(self, email, status='Unpaid'):
+        """
+        Create a renewal invoice for the services of an account
+        :return: the created invoice
+        """
+        with self._lock:
+            services = self.accounts[email]['services']
+            invoice = self._new_invoice(email, len(services))
+            invoice['status'] = status
+            return invoice
+
+    def _new_invoice(self, email, count):
+        invoice = {
+            'id': next(self._ids),
+            'token': uuid.uuid4().hex,
+            'email': email,
+            'date': datetime.date.today().isoformat(),
+            'due': (datetime.date.today() + datetime.timedelta(days=7)).isoformat(),
+            'amount': self.price * count,
+            'btcDue': self.btc_due * count,
+            'bitcoinAddress': self.address,
+            'status': 'Unpaid',
+        }
+        self.invoices[invoice['token']] = invoice
+        return invoice
+
+    def find_service(self, api_key, api_hash):
+        with self._lock:
+            for account in self.accounts.values():
+                for service in account['services']:
+                    if (service['api_key'], service['api_hash']) == (api_key, api_hash):
+                        return service
+
+    def session(self, session_id):
+        with self._lock:
+            return self._sessions.setdefault(session_id, {'cart': [], 'email': None})
+
+    def checkout(self, session, fields):
+        """
+        Turn the cart of a session into an order with a single invoice
+        :return: tuple of the invoice or None, and a list of error messages
+        """
+        required = ['firstname', 'lastname', 'email', 'password', 'address1', 'city', 'postcode']
+        errors = ['{} is required'.format(field) for field in required if not fields.get(field)]
+        if fields.get('password') != fields.get('password2'):
+            errors.append('passwords do not match')
+        if not fields.get('accepttos'):
+            errors.append('you must accept the terms of service')
+        if not session['cart']:
+            errors.append('your cart is empty')
+        if errors:
+            return None, errors
+
+        with self._lock:
+            account = self.accounts.setdefault(fields['email'], {'password': fields['password'], 'services': []})
+            for item in session['cart']:
+                account['services'].append(self._new_service('Pending', item['pid']))
+            invoice = self._new_invoice(fields['email'], len(session['cart']))
+            session['cart'] = []
+            session['email'] = fields['email']
+        return invoice, []
+
+    def login(self, session, email, password):
+        with self._lock:
+            account = self.accounts.get(email)
+            if account is None or account['password'] != password:
+                return False
+            session['email'] = email
+            return True
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _WhmcsRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_HEAD(self):
+        self._handle('HEAD')
+
+    def _handle(self, method):
+        whmcs = self.server.whmcs
+        with whmcs._lock:
+            whmcs.request_count += 1
+        if whmcs.latency:
+            time.sleep(whmcs.latency)
+
+        url = urlparse(self.path)
+        self.query = dict((key, values[-1]) for key, values in parse_qs(url.query).items())
+        self.form = {}
+        if method == 'POST':
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length).decode('utf-8')
+            self.form = dict((key, values[-1]) for key, values in parse_qs(body).items())
+
+        if url.path in whmcs.fail_paths or random.random() < whmcs.failure_rate:
+            return self._send(503, 'Service Unavailable')
+
+        self._set_session = None
+        self.session_id = self._get_session_id()
+        self.session = whmcs.session(self.session_id)
+
+        routes = {
+            '/cart.php': self._cart,
+            '/clientarea.php': self._clientarea,
+            '/dologin.php': self._dologin,
+            '/viewinvoice.php': self._viewinvoice,
+            '/invoice': self._gateway,
+            '/api/client/command.php': self._solusvm_api,
+        }
+        if url.path.startswith('/invoices/'):
+            return self._invoice_api(url.path.split('/')[-1])
+        route = routes.get(url.path)
+        if route is None:
+            return self._send(404, 'Not Found')
+        if method == 'HEAD':
+            return self._send(200, '')
+        route(method)
+
+    def _get_session_id(self):
+        for cookie in self.headers.get('Cookie', '').split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name == SESSION_COOKIE and value:
+                return value
+        self._set_session = uuid.uuid4().hex
+        return self._set_session
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8', headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        if getattr(self, '_set_session', None):
+            self.send_header('Set-Cookie', '{}={}; Path=/'.format(SESSION_COOKIE, self._set_session))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def _page(self, content):
+        self._send(200, PAGE.format(content))
+
+    def _redirect(self, location):
+        self._send(302, '', headers={'Location': location})
+
+    def _cart(self, method):
+        whmcs = self.server.whmcs
+        action = self.query.get('a')
+        if action == 'add':
+            return self._page(CONFIGURE_PAGE.format(pid=self.query.get('pid', '1')))
+        if action == 'confproduct':
+            self.session['cart'].append({'pid': int(self.query.get('pid', self.form.get('pid', 1))),
+                                         'hostname': self.query.get('hostname')})
+            return self._send(200, '')
+        if action == 'view':
+            total = '${:.2f} {}'.format(whmcs.price * len(self.session['cart']), whmcs.currency)
+            return self._page(CART_PAGE.format(total=total))
+        if action == 'checkout':
+            if method == 'POST':
+                invoice, errors = whmcs.checkout(self.session, self.form)
+                if invoice is not None:
+                    return self._redirect('viewinvoice.php?id={}'.format(invoice['id']))
+                return self._page(CHECKOUT_PAGE.format(errors=ERROR_BOX.format('<br>'.join(errors))))
+            return self._page(CHECKOUT_PAGE.format(errors=''))
+        self._send(404, 'Not Found')
+
+    def _viewinvoice(self, method):
+        whmcs = self.server.whmcs
+        for invoice in list(whmcs.invoices.values()):
+            if str(invoice['id']) == self.query.get('id'):
+                return self._page(INVOICE_PAGE.format(invoice=invoice['id'], token=invoice['token']))
+        self._send(404, 'Not Found')
+
+    def _gateway(self, method):
+        invoice = self.server.whmcs.invoices.get(self.query.get('id'))
+        if invoice is None:
+            return self._send(404, 'Not Found')
+        self._page(GATEWAY_PAGE.format(amount=invoice['btcDue'], address=invoice['bitcoinAddress']))
+
+    def _invoice_api(self, token):
+        invoice = self.server.whmcs.invoices.get(token)
+        if invoice is None:
+            return self._send(404, json.dumps({'error': 'Object not found'}), 'application/json')
+        data = {'data': {'id': token, 'btcDue': str(invoice['btcDue']),
+                         'bitcoinAddress': invoice['bitcoinAddress'], 'status': 'new'}}
+        self._send(200, json.dumps(data), 'application/json')
+
+    def _dologin(self, method):
+        if self.server.whmcs.login(self.session, self.form.get('username'), self.form.get('password')):
+            return self._redirect('clientarea.php')
+        self._redirect('clientarea.php?incorrect=true')
+
+    def _clientarea(self, method):
+        whmcs = self.server.whmcs
+        email = self.session['email']
+        if email is None or self.query.get('incorrect'):
+            return self._page(LOGIN_PAGE)
+
+        services = whmcs.accounts[email]['services']
+        action = self.query.get('action')
+        if action == 'services':
+            rows = ''.join(SERVICE_ROW.format(price='${:.2f} {}'.format(whmcs.price, whmcs.currency), **service)
+                           for service in services)
+            return self._page(SERVICES_PAGE.format(rows=rows))
+        if action == 'invoices':
+            invoices = sorted((invoice for invoice in whmcs.invoices.values() if invoice['email'] == email),
+                              key=lambda invoice: invoice['id'])
+            return self._page(INVOICES_PAGE.format(rows=''.join(INVOICE_ROW.format(**invoice)
+                                                                for invoice in invoices)))
+        if action == 'productdetails':
+            for service in services:
+                if str(service['id']) == self.query.get('id'):
+                    return self._page(SERVICE_PAGE.format(**service))
+            return self._send(404, 'Not Found')
+        self._page('<h1>Welcome back</h1>')
+
+    def _solusvm_api(self, method):
+        service = self.server.whmcs.find_service(self.form.get('key'), self.form.get('hash'))
+        if service is None:
+            return self._send(200, '<status>error</status><statusmsg>Invalid key or hash</statusmsg>')
+        vmstat = 'online' if service['status'] == 'Active' else 'offline'
+        body = '<status>success</status><statusmsg></statusmsg><vmstat>{}</vmstat>'.format(vmstat)
+        if self.form.get('action') == 'info':
+            gigabyte = 1024 ** 3
+            body += '<hostname>{}</hostname><ipaddress>{}</ipaddress>'.format(service['hostname'], service['ip'])
+            body += '<mem>{},{},{},25</mem>'.format(2 * gigabyte, gigabyte // 2, gigabyte * 3 // 2)
+            body += '<hdd>{},{},{},10</hdd>'.format(50 * gigabyte, 5 * gigabyte, 45 * gigabyte)
+            body += '<bw>{},{},{},1</bw>'.format(1000 * gigabyte, 10 * gigabyte, 990 * gigabyte)
+        self._send(200, body, content_type='text/xml')
+
+
+def main(argv=sys.argv[1:]):
+    parser = ArgumentParser(description="Run a local mock WHMCS/SolusVM panel")
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args(argv)
+
+    server = WhmcsServer(args.host, args.port, args.latency, args.failure_rate).start()
+    print("Serving mock WHMCS panel at " + server.base_url)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
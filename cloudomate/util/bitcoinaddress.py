@@ -8,7 +8,6 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-from builtins import bytes
 from builtins import int
 from builtins import range
 from hashlib import sha256
@@ -18,6 +17,12 @@ from future import standard_library
 standard_library.install_aliases()
 
 digits58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+_decode58 = dict((char, index) for index, char in enumerate(digits58))
+
+charset32 = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+_decode32 = dict((char, index) for index, char in enumerate(charset32))
+_BECH32_CONSTANT = 1
+_BECH32M_CONSTANT = 0x2bc830a3
 
 
 def _bytes_to_long(bytestring, byteorder):
@@ -55,8 +60,8 @@ def decode_base58(bitcoin_address, length):
     n = 0
     for char in bitcoin_address:
         try:
-            n = n * 58 + digits58.index(char)
-        except ValueError:
+            n = n * 58 + _decode58[char]
+        except KeyError:
             msg = "Character not part of Bitcoin's base58: '%s'"
             raise ValueError(msg % (char,))
     try:
@@ -81,12 +86,12 @@ def encode_base58(bytestring):
     except AttributeError:
         # Python version < 3.2
         n = _bytes_to_long(bytestring, 'big')
-    result = ''
+    result = []
     (n, rest) = divmod(n, 58)
     while n or rest:
-        result += digits58[rest]
+        result.append(digits58[rest])
         (n, rest) = divmod(n, 58)
-    return zeros * '1' + result[::-1]  # reverse string
+    return zeros * '1' + ''.join(reversed(result))
 
 
 def validate(bitcoin_address, magicbyte=0):
@@ -105,13 +110,10 @@ def validate(bitcoin_address, magicbyte=0):
         return False
     try:
         bcbytes = decode_base58(bitcoin_address, 25)
-    except ValueError:
+    except (ValueError, OverflowError):
         return False
     # Check magic byte (for other altcoins, fix by Frederico Reiven)
-    for mb in magicbyte:
-        if bcbytes.startswith(bytes(int(mb))):
-            break
-    else:
+    if bytearray(bcbytes)[0] not in magicbyte:
         return False
     # Compare checksum
     checksum = sha256(sha256(bcbytes[:-4]).digest()).digest()[:4]
@@ -119,5 +121,104 @@ def validate(bitcoin_address, magicbyte=0):
         return False
     # Encoded bytestring should be equal to the original address,
     # for example '14oLvT2' has a valid checksum, but is not a valid btc
-    # address
-    return bitcoin_address == encode_base58(bcbytes)
+    # address. Base58 is unique apart from leading zeros, so it suffices
+    # to compare the leading '1' characters with the leading zero bytes.
+    return _count_leading(bitcoin_address, '1') == _count_leading(bcbytes, 0)
+
+
+def _count_leading(sequence, value):
+    count = 0
+    for item in sequence:
+        if item != value:
+            break
+        count += 1
+    return count
+
+
+def _bech32_polymod(values):
+    generator = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= generator[i] if ((top >> i) & 1) else 0
+    return chk
+
+
+def _bech32_hrp_expand(hrp):
+    return [ord(x) >> 5 for x in hrp] + [0] + [ord(x) & 31 for x in hrp]
+
+
+def _convertbits(data, frombits, tobits):
+    """Regroup a list of frombits-wide values into tobits-wide values without padding
+
+    Returns None if the input has non-zero padding.
+    """
+    acc = 0
+    bits = 0
+    result = []
+    maxv = (1 << tobits) - 1
+    for value in data:
+        acc = (acc << frombits) | value
+        bits += frombits
+        while bits >= tobits:
+            bits -= tobits
+            result.append((acc >> bits) & maxv)
+    if bits >= frombits or ((acc << (tobits - bits)) & maxv):
+        return None
+    return result
+
+
+def validate_bech32(bitcoin_address, hrp='bc'):
+    """Check the integrity of a bech32 (BIP173) or bech32m (BIP350) segwit address
+
+    Returns False if the address is invalid.
+    >>> validate_bech32('bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4')
+    True
+    >>> validate_bech32('bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t5')
+    False
+    """
+    if bitcoin_address.lower() != bitcoin_address and bitcoin_address.upper() != bitcoin_address:
+        return False  # Mixed case is not allowed
+    address = bitcoin_address.lower()
+    pos = address.rfind('1')
+    if pos < 1 or pos + 7 > len(address) or len(address) > 90 or address[:pos] != hrp:
+        return False
+    try:
+        data = [_decode32[char] for char in address[pos + 1:]]
+    except KeyError:
+        return False
+
+    constant = _bech32_polymod(_bech32_hrp_expand(hrp) + data)
+    if constant not in (_BECH32_CONSTANT, _BECH32M_CONSTANT):
+        return False
+
+    # Check the witness version and program
+    version = data[0]
+    program = _convertbits(data[1:-6], 5, 8)
+    if version > 16 or program is None or not 2 <= len(program) <= 40:
+        return False
+    if version == 0:
+        return constant == _BECH32_CONSTANT and len(program) in (20, 32)
+    return constant == _BECH32M_CONSTANT
+
+
+def validate_many(bitcoin_addresses, magicbyte=(0, 5), hrp='bc'):
+    """Check the integrity of a list of base58 and bech32 addresses
+
+    :param bitcoin_addresses: iterable of addresses
+    :param magicbyte: accepted version bytes of base58 addresses, defaults to P2PKH and P2SH
+    :param hrp: human readable part of bech32 addresses
+    :return: list of booleans in the order of the addresses
+    >>> validate_many(['1AGNa15ZQXAZUgFiqJ2i7Z2DPU2J6hW62i', 'bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4', ''])
+    [True, True, False]
+    """
+    prefix = hrp + '1'
+    results = []
+    for address in bitcoin_addresses:
+        if address.lower().startswith(prefix):
+            results.append(validate_bech32(address, hrp))
+        else:
+            results.append(validate(address, magicbyte))
+    return results
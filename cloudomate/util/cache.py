@@ -0,0 +1,76 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import functools
+import threading
+import time
+from builtins import object
+
+from future import standard_library
+
+standard_library.install_aliases()
+
+
+class TimedCache(object):
+    """
+    Small thread-safe key/value cache whose entries expire after a fixed time-to-live.
+    """
+
+    def __init__(self, ttl, clock=time.time):
+        """
+        :param ttl: number of seconds an entry stays valid
+        :param clock: function returning the current time in seconds
+        """
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default if it is missing or expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if self._clock() >= expires:
+                del self._entries[key]
+                return default
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, self._clock() + self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __contains__(self, key):
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+
+def memoize(method):
+    """
+    Decorator caching the result of a method without arguments on its instance, until clear_memo is called
+    with the instance. Overriding methods are cached separately, so they can call the memoized method they
+    override.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self):
+        memo = self.__dict__.setdefault('_memo', {})
+        if method not in memo:
+            memo[method] = method(self)
+        return memo[method]
+
+    return wrapper
+
+
+def clear_memo(instance):
+    instance.__dict__.get('_memo', {}).clear()
@@ -0,0 +1,123 @@
+"""Datasets used by the offline UserGenerator
+
+For every country the names, streets and cities are common ones, and the formats describe zip codes and phone
+numbers: a # is replaced by a digit and a ? by an uppercase letter.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from future import standard_library
+
+standard_library.install_aliases()
+
+COUNTRIES = {
+    'NL': {
+        'first_names': [
+            'Daan', 'Sem', 'Lucas', 'Levi', 'Finn', 'Milan', 'Jesse', 'Bram', 'Thijs', 'Ruben', 'Lars', 'Tim',
+            'Emma', 'Julia', 'Sophie', 'Tess', 'Anna', 'Lotte', 'Sanne', 'Fleur', 'Iris', 'Eva', 'Noor', 'Lisa',
+        ],
+        'last_names': [
+            'de Jong', 'Jansen', 'de Vries', 'van den Berg', 'van Dijk', 'Bakker', 'Janssen', 'Visser', 'Smit',
+            'Meijer', 'de Boer', 'Mulder', 'de Groot', 'Bos', 'Vos', 'Peters', 'Hendriks', 'van Leeuwen',
+            'Dekker', 'Brouwer', 'de Wit', 'Dijkstra', 'Smits', 'de Graaf',
+        ],
+        'streets': [
+            'Kerkstraat', 'Schoolstraat', 'Molenweg', 'Dorpsstraat', 'Stationsweg', 'Julianastraat', 'Nieuwstraat',
+            'Beatrixstraat', 'Wilhelminastraat', 'Marktstraat', 'Parallelweg', 'Industrieweg', 'Irenestraat',
+            'Emmastraat', 'Sportlaan', 'Lindelaan',
+        ],
+        'cities': [
+            ('Amsterdam', 'Noord-Holland'), ('Haarlem', 'Noord-Holland'), ('Rotterdam', 'Zuid-Holland'),
+            ('Den Haag', 'Zuid-Holland'), ('Delft', 'Zuid-Holland'), ('Utrecht', 'Utrecht'),
+            ('Eindhoven', 'Noord-Brabant'), ('Tilburg', 'Noord-Brabant'), ('Groningen', 'Groningen'),
+            ('Zwolle', 'Overijssel'), ('Arnhem', 'Gelderland'), ('Maastricht', 'Limburg'),
+        ],
+        'company_suffixes': ['B.V.', 'Holding B.V.', 'en Zonen', 'V.O.F.'],
+        'address': '{street} {number}',
+        'zipcode': '#### ??',
+        'phonenumber': '06########',
+    },
+    'US': {
+        'first_names': [
+            'James', 'John', 'Robert', 'Michael', 'William', 'David', 'Richard', 'Joseph', 'Thomas', 'Charles',
+            'Daniel', 'Matthew', 'Mary', 'Patricia', 'Jennifer', 'Linda', 'Elizabeth', 'Barbara', 'Susan',
+            'Jessica', 'Sarah', 'Karen', 'Nancy', 'Lisa',
+        ],
+        'last_names': [
+            'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+            'Hernandez', 'Lopez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin', 'Lee',
+            'Thompson', 'White', 'Harris', 'Clark',
+        ],
+        'streets': [
+            'Main Street', 'Oak Street', 'Pine Street', 'Maple Avenue', 'Cedar Street', 'Elm Street',
+            'Washington Avenue', 'Lake Street', 'Hill Street', 'Park Avenue', 'Walnut Street', 'Sunset Boulevard',
+            'Church Street', 'Spring Street', 'Highland Avenue', 'Ridge Road',
+        ],
+        'cities': [
+            ('Springfield', 'Illinois'), ('Columbus', 'Ohio'), ('Austin', 'Texas'), ('Dallas', 'Texas'),
+            ('Denver', 'Colorado'), ('Portland', 'Oregon'), ('Madison', 'Wisconsin'), ('Phoenix', 'Arizona'),
+            ('Raleigh', 'North Carolina'), ('Albany', 'New York'), ('Sacramento', 'California'),
+            ('Tallahassee', 'Florida'),
+        ],
+        'company_suffixes': ['Inc.', 'LLC', 'Corp.', 'and Sons'],
+        'address': '{number} {street}',
+        'zipcode': '#####',
+        'phonenumber': '###-###-####',
+    },
+    'UK': {
+        'first_names': [
+            'Oliver', 'George', 'Harry', 'Jack', 'Jacob', 'Charlie', 'Thomas', 'Oscar', 'William', 'James',
+            'Henry', 'Alfie', 'Olivia', 'Amelia', 'Isla', 'Ava', 'Emily', 'Sophia', 'Grace', 'Mia', 'Poppy',
+            'Ella', 'Lily', 'Evie',
+        ],
+        'last_names': [
+            'Smith', 'Jones', 'Williams', 'Taylor', 'Brown', 'Davies', 'Evans', 'Wilson', 'Thomas', 'Johnson',
+            'Roberts', 'Robinson', 'Thompson', 'Wright', 'Walker', 'White', 'Edwards', 'Hughes', 'Green', 'Hall',
+            'Lewis', 'Harris', 'Clarke', 'Patel',
+        ],
+        'streets': [
+            'High Street', 'Station Road', 'Main Street', 'Park Road', 'Church Road', 'Church Street',
+            'London Road', 'Victoria Road', 'Green Lane', 'Manor Road', 'Church Lane', 'Park Avenue',
+            'The Avenue', 'Queens Road', 'New Road', 'Grange Road',
+        ],
+        'cities': [
+            ('London', 'Greater London'), ('Manchester', 'Greater Manchester'), ('Birmingham', 'West Midlands'),
+            ('Leeds', 'West Yorkshire'), ('Sheffield', 'South Yorkshire'), ('Bristol', 'Bristol'),
+            ('Liverpool', 'Merseyside'), ('Newcastle', 'Tyne and Wear'), ('Nottingham', 'Nottinghamshire'),
+            ('Leicester', 'Leicestershire'), ('Brighton', 'East Sussex'), ('Oxford', 'Oxfordshire'),
+        ],
+        'company_suffixes': ['Ltd', 'Limited', 'PLC', 'and Co'],
+        'address': '{number} {street}',
+        'zipcode': '??# #??',
+        'phonenumber': '07### ######',
+    },
+    'CA': {
+        'first_names': [
+            'Liam', 'Noah', 'William', 'Benjamin', 'Logan', 'Lucas', 'Ethan', 'Jacob', 'Nathan', 'Samuel',
+            'Owen', 'Leo', 'Emma', 'Olivia', 'Charlotte', 'Chloe', 'Alice', 'Sophie', 'Florence', 'Zoe', 'Lea',
+            'Abigail', 'Hannah', 'Rosalie',
+        ],
+        'last_names': [
+            'Smith', 'Brown', 'Tremblay', 'Martin', 'Roy', 'Wilson', 'MacDonald', 'Gagnon', 'Johnson', 'Taylor',
+            'Cote', 'Campbell', 'Anderson', 'Leblanc', 'Lee', 'Jones', 'White', 'Williams', 'Miller', 'Thompson',
+            'Gauthier', 'Young', 'Morin', 'Bouchard',
+        ],
+        'streets': [
+            'Main Street', 'King Street', 'Queen Street', 'Yonge Street', 'Maple Drive', 'Victoria Avenue',
+            'Church Street', 'Park Avenue', 'Wellington Street', 'Elm Street', 'Rue Principale', 'Rue Saint-Jean',
+            'Bay Street', 'Lakeshore Road', 'Dundas Street', 'Richmond Street',
+        ],
+        'cities': [
+            ('Toronto', 'Ontario'), ('Ottawa', 'Ontario'), ('Hamilton', 'Ontario'), ('Montreal', 'Quebec'),
+            ('Quebec City', 'Quebec'), ('Vancouver', 'British Columbia'), ('Victoria', 'British Columbia'),
+            ('Calgary', 'Alberta'), ('Edmonton', 'Alberta'), ('Winnipeg', 'Manitoba'), ('Halifax', 'Nova Scotia'),
+            ('Regina', 'Saskatchewan'),
+        ],
+        'company_suffixes': ['Inc.', 'Ltd.', 'Corp.', 'Enterprises'],
+        'address': '{number} {street}',
+        'zipcode': '?#? #?#',
+        'phonenumber': '###-###-####',
+    },
+}
@@ -11,47 +11,71 @@ from future import standard_library
 
 from mechanicalsoup import StatefulBrowser
 
+from cloudomate.util.fakeuserdata import COUNTRIES
+
 standard_library.install_aliases()
 
+OFFLINE = 'offline'
+ONLINE = 'online'
+SOURCES = [OFFLINE, ONLINE]
+
+# The number of users get_users tries per requested user before giving up on finding distinct usernames
+ATTEMPTS_PER_USER = 10
+
 
-class UserScraper(object):
+def get_user_source(source=OFFLINE, country='NL'):
     """
-    Scrapes fakeaddressgenerator.com for fake user data.
-    It also adds some basic additional information for server configuration.
+    :param source: OFFLINE to generate users from the bundled datasets, ONLINE to scrape fakeaddressgenerator.com
+    :return: a UserGenerator or UserScraper for the country
     """
+    if source == OFFLINE:
+        return UserGenerator(country)
+    if source == ONLINE:
+        return UserScraper(country)
+    raise ValueError('Unknown user source: {}'.format(source))
 
-    attributes = [
-        'Full Name',
-        'Street',
-        'City',
-        'State Full',
-        'Zip Code',
-        'Phone Number',
-        'Company',
-        'Username'
-    ]
 
-    pages = {
-        'NL': 'http://www.fakeaddressgenerator.com/World/Netherlands_address_generator',
-        'US': 'http://www.fakeaddressgenerator.com/World/us_address_generator',
-        'UK': 'http://www.fakeaddressgenerator.com/World/uk_address_generator',
-        'CA': 'http://www.fakeaddressgenerator.com/World/ca_address_generator',
-    }
+class UserSource(object):
+    """
+    UserSource is the common superclass of the sources of fake user data. Subclasses provide the attributes
+    shown by fakeaddressgenerator.com, to which some basic additional information for server configuration is added.
+    """
 
     def __init__(self, country='NL'):
         self.country_code = country
-        self.browser = StatefulBrowser()
-        self.page = UserScraper.pages.get(country)
 
     def get_user(self):
-        self.browser.open(self.page)
-        attrs = {}
-
-        for attr in self.attributes:
-            attrs[attr] = self._get_attribute(attr)
-
+        return self._complete(self._get_attributes())
+
+    def get_users(self, count):
+        """Get a number of users with distinct usernames
+
+        :param count: the number of users
+        :return: a list of dictionaries of section to a dictionary of settings
+        :raises ValueError: if the source does not produce count distinct usernames within ATTEMPTS_PER_USER tries
+        per user
+        """
+        users = []
+        usernames = set()
+        for _ in range(count * ATTEMPTS_PER_USER):
+            if len(users) == count:
+                break
+            attrs = self._get_attributes()
+            if attrs['Username'] not in usernames:
+                usernames.add(attrs['Username'])
+                users.append(self._complete(attrs))
+        if len(users) < count:
+            raise ValueError('Found only {} distinct usernames in {} attempts, {} were requested'
+                             .format(len(users), count * ATTEMPTS_PER_USER, count))
+        return users
+
+    def _get_attributes(self):
+        raise NotImplementedError()
+
+    def _complete(self, attrs):
         attrs['country_code'] = self.country_code
-        attrs['password'] = ''.join(random.choice(string.ascii_letters + string.digits) for _ in range(12))
+        attrs['password'] = ''.join(random.SystemRandom().choice(string.ascii_letters + string.digits)
+                                    for _ in range(12))
         attrs['email'] = attrs['Username'] + '@email.com'
         attrs['rootpw'] = attrs['password']
         attrs['ns1'] = 'ns1'
@@ -95,9 +119,90 @@ class UserScraper(object):
                 config[section][key] = attrs[attr]
         return config
 
+
+class UserScraper(UserSource):
+    """
+    Scrapes fakeaddressgenerator.com for fake user data, one page per user.
+    """
+
+    attributes = [
+        'Full Name',
+        'Street',
+        'City',
+        'State Full',
+        'Zip Code',
+        'Phone Number',
+        'Company',
+        'Username'
+    ]
+
+    pages = {
+        'NL': 'http://www.fakeaddressgenerator.com/World/Netherlands_address_generator',
+        'US': 'http://www.fakeaddressgenerator.com/World/us_address_generator',
+        'UK': 'http://www.fakeaddressgenerator.com/World/uk_address_generator',
+        'CA': 'http://www.fakeaddressgenerator.com/World/ca_address_generator',
+    }
+
+    def __init__(self, country='NL'):
+        super(UserScraper, self).__init__(country)
+        self.browser = StatefulBrowser()
+        self.page = UserScraper.pages.get(country)
+
+    def _get_attributes(self):
+        self.browser.open(self.page)
+        attrs = {}
+
+        for attr in self.attributes:
+            attrs[attr] = self._get_attribute(attr)
+        return attrs
+
     def _get_attribute(self, attribute):
         return self.browser.get_current_page() \
             .find(string=attribute) \
             .parent.parent.parent \
             .find('input') \
             .get('value')
+
+
+class UserGenerator(UserSource):
+    """
+    Generates fake user data from the bundled datasets, without any network requests.
+
+    :param seed: seed of the random generator, for reproducible users
+    """
+
+    def __init__(self, country='NL', seed=None):
+        if country not in COUNTRIES:
+            raise ValueError('No user data for country: {}'.format(country))
+        super(UserGenerator, self).__init__(country)
+        self._data = COUNTRIES[country]
+        self._random = random.Random(seed)
+
+    def _get_attributes(self):
+        data = self._data
+        first_name = self._random.choice(data['first_names'])
+        last_name = self._random.choice(data['last_names'])
+        city, state = self._random.choice(data['cities'])
+        return {
+            'Full Name': first_name + '\xa0' + last_name,
+            'Street': data['address'].format(street=self._random.choice(data['streets']),
+                                             number=self._random.randint(1, 250)),
+            'City': city,
+            'State Full': state,
+            'Zip Code': self._format(data['zipcode']),
+            'Phone Number': self._format(data['phonenumber']),
+            'Company': last_name + ' ' + self._random.choice(data['company_suffixes']),
+            'Username': first_name.lower() + last_name.replace(' ', '').lower() + self._format('###'),
+        }
+
+    def _format(self, pattern):
+        """Replace every # in a pattern by a random digit and every ? by a random uppercase letter"""
+        result = []
+        for char in pattern:
+            if char == '#':
+                result.append(self._random.choice(string.digits))
+            elif char == '?':
+                result.append(self._random.choice(string.ascii_uppercase))
+            else:
+                result.append(char)
+        return ''.join(result)
@@ -0,0 +1,100 @@
+"""Running a command over SSH on many servers at once
+
+Every server gets its own ssh process, at most a fixed number at a time. The connections are opened as
+OpenSSH control masters in a private directory, so that later commands to the same server during the run
+reuse the authenticated connection instead of logging in again. Closing the fleet ends the masters.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import shutil
+import subprocess
+import tempfile
+from builtins import object
+from builtins import str
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from future import standard_library
+
+standard_library.install_aliases()
+
+SSH_WORKERS = 16
+CONNECT_TIMEOUT = 10
+CONTROL_PERSIST = 60
+
+SshTarget = namedtuple('SshTarget', ['ip', 'password', 'user'])
+SshResult = namedtuple('SshResult', ['ip', 'exit_code', 'output'])  # exit_code is None if ssh could not be run
+
+
+class SshFleet(object):
+    """
+    SshFleet runs commands on a number of servers concurrently.
+
+    :param workers: the maximum number of concurrent ssh processes
+    :param popen: the function starting a process, subprocess.Popen by default
+    """
+
+    def __init__(self, workers=SSH_WORKERS, connect_timeout=CONNECT_TIMEOUT, popen=subprocess.Popen):
+        self.workers = workers
+        self.connect_timeout = connect_timeout
+        self._popen = popen
+        self._control_dir = tempfile.mkdtemp(prefix='cloudomate-ssh-')
+        self._targets = set()
+
+    def commandline(self, target, command=None):
+        commandline = ['sshpass', '-p', target.password, 'ssh',
+                       '-o', 'StrictHostKeyChecking=no',
+                       '-o', 'ConnectTimeout={}'.format(self.connect_timeout),
+                       '-o', 'ControlMaster=auto',
+                       '-o', 'ControlPath=' + os.path.join(self._control_dir, '%r@%h:%p'),
+                       '-o', 'ControlPersist={}'.format(CONTROL_PERSIST),
+                       target.user + '@' + target.ip]
+        if command:
+            commandline.append(command)
+        return commandline
+
+    def run(self, targets, command):
+        """Run a command on every target
+
+        :param targets: a list of SshTargets
+        :param command: the command, or a function returning the command for a target
+        :return: a list of SshResults in the order of the targets
+        """
+        if not targets:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(targets))) as executor:
+            return list(executor.map(lambda target: self._run(target, command), targets))
+
+    def _run(self, target, command):
+        if callable(command):
+            command = command(target)
+        self._targets.add(target)
+        try:
+            process = self._popen(self.commandline(target, command), stdin=subprocess.PIPE,
+                                  stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except OSError as e:
+            return SshResult(target.ip, None, str(e))
+        output, _ = process.communicate()
+        return SshResult(target.ip, process.returncode, output.decode('utf-8', 'replace'))
+
+    def close(self):
+        """End the control masters and remove their sockets"""
+        for target in self._targets:
+            commandline = self.commandline(target)
+            commandline[-1:-1] = ['-O', 'exit']
+            try:
+                self._popen(commandline, stdout=subprocess.PIPE, stderr=subprocess.PIPE).communicate()
+            except OSError:
+                pass
+        self._targets.clear()
+        shutil.rmtree(self._control_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,245 @@
+"""Timing of the HTTP requests made by hoster browsers
+
+Every request made through a browser created by Hoster._create_browser is reported to the profiler as a
+RequestEvent once profiling is enabled:
+
+profiler = get_profiler()
+profiler.enable()
+LineVast.get_options()
+profiler.print_summary()
+profiler.export_trace('trace.json')  # Open in chrome://tracing
+
+Requests does not expose name resolution and TLS handshakes separately, so they are part of the wait time
+of the first request to a host.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+import threading
+import time
+from builtins import object
+from builtins import open
+from builtins import super
+from collections import namedtuple, OrderedDict
+
+import requests
+from future import standard_library
+from future.moves.urllib.parse import urlparse
+from mechanicalsoup import StatefulBrowser
+from requests.adapters import BaseAdapter
+
+standard_library.install_aliases()
+
+RequestEvent = namedtuple('RequestEvent', ['action',  # Browser action that caused the request, e.g. get or submit
+                                           'method',
+                                           'url',
+                                           'status',
+                                           'bytes',  # Size of the response body
+                                           'start',  # Unix timestamp at which the request was sent
+                                           'wait',  # Seconds until the response headers were received
+                                           'transfer',  # Seconds spent reading the response body
+                                           'parse',  # Seconds spent parsing the page after the last hop
+                                           'thread'])
+
+
+class Profiler(object):
+    """
+    Profiler collects RequestEvents from instrumented browsers and notifies listeners.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def clear(self):
+        with self._lock:
+            self.events = []
+
+    def add_listener(self, listener):
+        """
+        :param listener: function called with every recorded RequestEvent
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def record(self, event):
+        with self._lock:
+            self.events.append(event)
+        for listener in self._listeners:
+            listener(event)
+
+    def summary(self):
+        """
+        Aggregate the recorded events per host
+        :return: ordered dictionary of host to a dictionary of totals
+        """
+        hosts = OrderedDict()
+        for event in self.events:
+            host = urlparse(event.url).netloc
+            totals = hosts.setdefault(host, {'requests': 0, 'bytes': 0, 'wait': 0.0, 'transfer': 0.0, 'parse': 0.0})
+            totals['requests'] += 1
+            totals['bytes'] += event.bytes
+            totals['wait'] += event.wait
+            totals['transfer'] += event.transfer
+            totals['parse'] += event.parse
+        return hosts
+
+    def print_summary(self, slowest=5):
+        row = "{:40}{:>10}{:>12}{:>10}{:>14}{:>10}"
+        print(row.format("Host", "Requests", "Bytes", "Wait (s)", "Transfer (s)", "Parse (s)"))
+        for host, totals in self.summary().items():
+            print(row.format(host, totals['requests'], totals['bytes'], '{:.3f}'.format(totals['wait']),
+                             '{:.3f}'.format(totals['transfer']), '{:.3f}'.format(totals['parse'])))
+
+        events = sorted(self.events, key=lambda e: e.wait + e.transfer + e.parse, reverse=True)[:slowest]
+        if events:
+            print("\nSlowest requests:")
+            for event in events:
+                print("   {:8.3f}s  {:4} {} {}".format(event.wait + event.transfer + event.parse, event.method,
+                                                      event.status, event.url))
+
+    def export_trace(self, filename):
+        """
+        Write the recorded events in the Trace Event Format used by chrome://tracing
+        :param filename: the file to write the trace to
+        """
+        trace = []
+        for event in self.events:
+            trace.append({
+                'name': '{} {}'.format(event.method, event.url),
+                'cat': event.action,
+                'ph': 'X',
+                'ts': int(event.start * 1000000),
+                'dur': int((event.wait + event.transfer + event.parse) * 1000000),
+                'pid': 1,
+                'tid': event.thread,
+                'args': {
+                    'status': event.status,
+                    'bytes': event.bytes,
+                    'wait': event.wait,
+                    'transfer': event.transfer,
+                    'parse': event.parse,
+                },
+            })
+        with open(filename, 'w', encoding='utf-8') as trace_file:
+            trace_file.write(json.dumps({'traceEvents': trace}))
+
+
+_profiler = Profiler()
+
+
+def get_profiler():
+    return _profiler
+
+
+class _TimingAdapter(BaseAdapter):
+    """
+    Wraps the transport adapter of a single request to measure it.
+    """
+
+    def __init__(self, adapter, session):
+        super().__init__()
+        self.adapter = adapter
+        self.session = session
+
+    def send(self, request, **kwargs):
+        start = time.time()
+        response = self.adapter.send(request, **kwargs)
+        headers_received = time.time()
+        if not kwargs.get('stream'):
+            response.content  # Read the body to time the transfer
+        done = time.time()
+
+        self.session.pending_events.append(RequestEvent(
+            action=self.session.action,
+            method=request.method,
+            url=request.url,
+            status=response.status_code,
+            bytes=len(response.content) if not kwargs.get('stream') else 0,
+            start=start,
+            wait=headers_received - start,
+            transfer=done - headers_received,
+            parse=0.0,
+            thread=threading.current_thread().ident,
+        ))
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class InstrumentedSession(requests.Session):
+    """
+    Session that times every request, including every hop of a redirect, while its profiler is enabled.
+    """
+
+    def __init__(self, profiler=None):
+        super().__init__()
+        self.profiler = profiler or _profiler
+        self.pending_events = []
+        self.action = 'request'
+
+    def get_adapter(self, url):
+        adapter = super().get_adapter(url)
+        if not self.profiler.enabled:
+            return adapter
+        return _TimingAdapter(adapter, self)
+
+    def flush(self, finished=None):
+        """
+        Report the pending events to the profiler, attributing the time after the last hop to parsing
+        :param finished: time at which the browser finished handling the response
+        """
+        events, self.pending_events = self.pending_events, []
+        if events and finished is not None:
+            last = events[-1]
+            events[-1] = last._replace(parse=max(finished - (last.start + last.wait + last.transfer), 0.0))
+        for event in events:
+            self.profiler.record(event)
+
+
+class InstrumentedBrowser(StatefulBrowser):
+    """
+    StatefulBrowser that reports the requests it makes to a profiler.
+    """
+
+    def __init__(self, profiler=None, **kwargs):
+        kwargs.setdefault('session', InstrumentedSession(profiler))
+        super().__init__(**kwargs)
+
+    def _instrumented(self, action, method, *args, **kwargs):
+        session = self.session
+        if not isinstance(session, InstrumentedSession) or not session.profiler.enabled:
+            return method(*args, **kwargs)
+
+        session.action = action
+        try:
+            return method(*args, **kwargs)
+        finally:
+            session.flush(time.time())
+            session.action = 'request'
+
+    def get(self, *args, **kwargs):
+        return self._instrumented('get', super().get, *args, **kwargs)
+
+    def post(self, *args, **kwargs):
+        return self._instrumented('post', super().post, *args, **kwargs)
+
+    def request(self, *args, **kwargs):
+        return self._instrumented('request', super().request, *args, **kwargs)
+
+    def submit(self, *args, **kwargs):
+        return self._instrumented('submit', super().submit, *args, **kwargs)
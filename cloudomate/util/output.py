@@ -0,0 +1,132 @@
+"""Structured output of the command line
+
+The commands write their results as rows (dictionaries) to a writer for the chosen format:
+
+json    a single JSON document, written when the command finishes
+ndjson  one JSON object per line, written and flushed as soon as a row is ready
+csv     a header followed by one line per row, nested values flattened to e.g. memory.used, written when the
+        command finishes as the header holds the columns of every row
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import csv
+import datetime
+import json
+import sys
+from builtins import object
+from collections import OrderedDict
+
+from future import standard_library
+
+standard_library.install_aliases()
+
+TEXT = 'text'
+JSON = 'json'
+NDJSON = 'ndjson'
+CSV = 'csv'
+FORMATS = [TEXT, JSON, NDJSON, CSV]
+
+
+def to_json(value):
+    """
+    Convert the named tuples returned by the hosters into values that can be serialized to JSON
+    """
+    if hasattr(value, '_asdict'):
+        return OrderedDict((key, to_json(item)) for key, item in value._asdict().items())
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, dict):
+        return OrderedDict((key, to_json(item)) for key, item in value.items())
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def flatten(row, prefix=''):
+    """
+    Flatten nested dictionaries into a single dictionary with dotted keys
+    """
+    flat = OrderedDict()
+    for key, value in row.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + '.'))
+        else:
+            flat[prefix + key] = value
+    return flat
+
+
+class JsonWriter(object):
+    """
+    Writes all rows as a JSON list, or a single row as a JSON object, when closed.
+    """
+
+    def __init__(self, stream, single=False):
+        self.stream = stream
+        self.single = single
+        self._rows = []
+
+    def write(self, row):
+        self._rows.append(to_json(row))
+
+    def close(self):
+        document = self._rows[0] if self.single and len(self._rows) == 1 else self._rows
+        self.stream.write(json.dumps(document, indent=2) + '\n')
+        self.stream.flush()
+
+
+class NdjsonWriter(object):
+    """
+    Writes every row as a line of JSON as soon as it is written.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, row):
+        self.stream.write(json.dumps(to_json(row)) + '\n')
+        self.stream.flush()
+
+    def close(self):
+        pass
+
+
+class CsvWriter(object):
+    """
+    Writes all rows as CSV when closed, the header holds the keys of every row in the order they first appear.
+    Rows without some of the keys leave those columns empty.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._rows = []
+        self._fieldnames = OrderedDict()
+
+    def write(self, row):
+        row = flatten(to_json(row))
+        self._fieldnames.update((key, None) for key in row)
+        self._rows.append(row)
+
+    def close(self):
+        writer = csv.DictWriter(self.stream, fieldnames=list(self._fieldnames), restval='', lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(self._rows)
+        self.stream.flush()
+
+
+def get_writer(output_format, stream=None, single=False):
+    """
+    :param output_format: one of JSON, NDJSON and CSV
+    :param single: whether the command produces a single row, written as an object instead of a list in JSON
+    :return: a writer with write(row) and close() methods
+    """
+    stream = stream or sys.stdout
+    if output_format == JSON:
+        return JsonWriter(stream, single)
+    if output_format == NDJSON:
+        return NdjsonWriter(stream)
+    if output_format == CSV:
+        return CsvWriter(stream)
+    raise ValueError('Unknown output format: {}'.format(output_format))
@@ -0,0 +1,94 @@
+"""Warming of the connections a purchase is going to use
+
+Before the first step of a purchase the hoster starts a prefetch in the background: a HEAD request is sent
+to the root of every host of the flow through the connection pool of the browser. The requests that follow
+then find an open TLS connection in the pool instead of opening one in the middle of the flow. The pages of
+the flow themselves are never requested, as some of them, such as an order link, change the cart.
+
+The HEAD requests are sent straight to the transport adapter of the session, so that their cookies never
+reach the browser: WHMCS keeps the cart in the session cookie, and a second session would lose it.
+Gateways fetch invoices with urlopen instead of the browser, which keeps no connections, so they are not
+warmed.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+from builtins import object
+
+import requests
+from future import standard_library
+from future.moves.urllib.parse import urlparse
+
+standard_library.install_aliases()
+
+PREFETCH_TIMEOUT = 10
+
+
+def get_root(url):
+    """
+    :return: the url of the root of the host of a url, e.g. https://linevast.de/ for a page of linevast.de
+    """
+    parsed = urlparse(url)
+    return '{}://{}/'.format(parsed.scheme, parsed.netloc)
+
+
+def warm_connection(session, url, timeout=PREFETCH_TIMEOUT):
+    """
+    Open a connection to the host of a url in the connection pool of a session and leave it open
+    """
+    url = get_root(url)
+    # Bypass the session itself (cookies, hooks and instrumentation), only its connection pool is used
+    adapter = requests.Session.get_adapter(session, url)
+    request = requests.Request('HEAD', url, headers=session.headers).prepare()
+    # Send with the settings the session would use, otherwise the connection ends up in another pool
+    settings = session.merge_environment_settings(url, {}, None, None, None)
+    response = adapter.send(request, timeout=timeout, **settings)
+    response.content  # Consume the response so that close returns the connection to the pool
+    response.close()
+
+
+class Prefetch(object):
+    """
+    Prefetch warms connections in background threads. Failures are ignored, as the purchase itself will
+    report them when it needs the connection.
+
+    :param session: the requests session whose connection pool is warmed
+    :param urls: urls of the pages the flow is going to request, a connection is opened once per host
+    """
+
+    def __init__(self, session, urls):
+        self.session = session
+        self.urls = _unique(get_root(url) for url in urls if url)
+        self.errors = []
+        self._threads = []
+
+    def start(self):
+        for url in self.urls:
+            thread = threading.Thread(target=self._run, args=(warm_connection, (self.session, url)))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _run(self, target, args):
+        try:
+            target(*args)
+        except Exception as e:
+            self.errors.append(e)
+
+    def wait(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+def _unique(urls):
+    seen = set()
+    result = []
+    for url in urls:
+        if url and url not in seen:
+            seen.add(url)
+            result.append(url)
+    return result
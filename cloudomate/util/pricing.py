@@ -0,0 +1,89 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+from builtins import round
+from collections import namedtuple
+
+from future import standard_library
+
+from cloudomate import wallet as wallet_util
+
+standard_library.install_aliases()
+
+PriceEstimate = namedtuple('PriceEstimate', ['btc',  # Estimated price in BTC, including gateway and network fee
+                                             'mbtc',  # Estimated price in mBTC
+                                             'per_core',  # mBTC per core, None if unknown
+                                             'per_memory',  # mBTC per GB of memory, None if unknown
+                                             'per_storage'])  # mBTC per GB of storage, None if unknown
+
+
+def estimate_prices(prices, gateway, rate, network_fee):
+    """
+    Estimate the price in BTC of a whole list of USD prices at once
+    :param prices: iterable of prices in USD
+    :param gateway: the gateway through which the prices are paid, which adds its fee with Gateway.estimate_price
+    :param rate: conversion rate from USD to BTC
+    :param network_fee: network fee in BTC added to every payment
+    :return: list of estimated prices in BTC
+    """
+    return [gateway.estimate_price(price * rate) + network_fee for price in prices]
+
+
+def estimate_option_prices(options, gateway, rate=None, network_fee=None):
+    """
+    Estimate the prices of a catalogue of options with a single rate and network fee lookup
+    :param options: list of VpsOption or VpnOption objects
+    :param gateway: the gateway through which the options are paid
+    :param rate: conversion rate from USD to BTC, fetched if omitted
+    :param network_fee: network fee in BTC, fetched if omitted
+    :return: list of PriceEstimate objects in the order of the options
+    """
+    options = list(options)
+    if not options:
+        return []
+    if rate is None:
+        rate = wallet_util.get_rate('USD')
+    if network_fee is None:
+        network_fee = wallet_util.get_network_fee()
+
+    estimates = estimate_prices([option.price for option in options], gateway, rate, network_fee)
+    return [_price_estimate(option, btc) for option, btc in zip(options, estimates)]
+
+
+def convert_prices(prices, currency='USD', rates=None):
+    """
+    Convert a list of prices in various currencies with a single rate lookup
+    :param prices: iterable of (amount, currency) tuples
+    :param currency: the currency to convert to
+    :param rates: conversion rates from currencies to BTC, see wallet.get_rates, fetched if omitted
+    :return: list of amounts in the currency, rounded to cents
+    """
+    prices = list(prices)
+    currencies = set(price_currency for _, price_currency in prices if price_currency != currency)
+    if currencies and rates is None:
+        rates = wallet_util.get_rates(currencies | {currency})
+    return [amount if price_currency == currency else round(amount * rates[price_currency] / rates[currency], 2)
+            for amount, price_currency in prices]
+
+
+def _price_estimate(option, btc):
+    mbtc = 1000 * btc
+    return PriceEstimate(
+        btc=btc,
+        mbtc=mbtc,
+        per_core=_unit_cost(mbtc, getattr(option, 'cores', None)),
+        per_memory=_unit_cost(mbtc, getattr(option, 'memory', None)),
+        per_storage=_unit_cost(mbtc, getattr(option, 'storage', None)),
+    )
+
+
+def _unit_cost(mbtc, amount):
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        return None
+    if amount <= 0:
+        return None
+    return mbtc / amount
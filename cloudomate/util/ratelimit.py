@@ -0,0 +1,283 @@
+"""Per-host rate limiting and circuit breaking of hoster requests
+
+Every request made by a hoster browser first takes a token from the token bucket of its host. A bucket
+halves its rate when the host answers 429 Too Many Requests or 503 Service Unavailable (and waits for the
+Retry-After header if given), and slowly climbs back to the configured rate after successful responses.
+
+A circuit breaker per host counts consecutive server errors and connection failures. After
+failure_threshold of them it opens and requests to the host fail immediately with a CircuitOpenException
+until reset_timeout has passed, after which a single trial request decides whether it closes again.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+import time
+from builtins import object
+from builtins import super
+
+from future import standard_library
+from future.moves.urllib.parse import urlparse
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError, Timeout
+
+from cloudomate.exceptions.hoster_error import CircuitOpenException
+
+standard_library.install_aliases()
+
+DEFAULT_RATE = 4.0  # Requests per second per host
+DEFAULT_BURST = 8
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30.0
+THROTTLE_STATUS_CODES = (429, 503)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class TokenBucket(object):
+    """
+    Token bucket that adapts its rate: it is halved when throttled and increased again on success.
+
+    :param rate: the maximum number of tokens added per second
+    :param burst: the maximum number of tokens in the bucket
+    :param min_rate: the rate is never halved below this rate, defaults to a sixteenth of the rate
+    """
+
+    def __init__(self, rate, burst, min_rate=None, clock=time.time):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token
+        :return: the number of seconds to wait before the token may be used
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = max(self._paused_until - now, 0.0)
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def throttle(self, retry_after=None):
+        """
+        Halve the rate and drop the remaining burst
+        :param retry_after: number of seconds to wait before the next request, if requested by the host
+        """
+        with self._lock:
+            self.rate = max(self.rate / 2, self.min_rate)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._paused_until = max(self._paused_until, self._clock() + retry_after)
+
+    def recover(self):
+        with self._lock:
+            self.rate = min(self.rate + self.max_rate / 10, self.max_rate)
+
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker that opens after a number of consecutive failures.
+    """
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, reset_timeout=RESET_TIMEOUT, clock=time.time):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._clock = clock
+        self._opened = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        :return: whether a request may be made, a half-open breaker allows a single trial request
+        """
+        with self._lock:
+            if self.state == OPEN and self._clock() - self._opened >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return self.state == CLOSED
+
+    def retry_in(self):
+        """
+        :return: the number of seconds until an open breaker allows a trial request
+        """
+        with self._lock:
+            return max(self._opened + self.reset_timeout - self._clock(), 0.0)
+
+    def release(self):
+        """
+        Allow another trial request after a trial request that ended without a success or failure
+        """
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._trial = False
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self._opened = self._clock()
+
+
+class RateLimiter(object):
+    """
+    RateLimiter keeps a token bucket and a circuit breaker per host.
+
+    :param rate: the maximum number of requests per second per host, None disables the rate limit
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, failure_threshold=FAILURE_THRESHOLD,
+                 reset_timeout=RESET_TIMEOUT, clock=time.time, sleep=time.sleep):
+        self.rate = rate
+        self.burst = burst
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._sleep = sleep
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def get_host(self, host):
+        """
+        :return: tuple of the TokenBucket (None without rate limit) and CircuitBreaker of a host
+        """
+        with self._lock:
+            if host not in self._hosts:
+                bucket = TokenBucket(self.rate, self.burst, clock=self._clock) if self.rate else None
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout, clock=self._clock)
+                self._hosts[host] = (bucket, breaker)
+            return self._hosts[host]
+
+    def before_request(self, url):
+        """
+        Wait until a request to url may be made
+        :raises CircuitOpenException: if the circuit breaker of the host is open
+        """
+        host = urlparse(url).netloc
+        bucket, breaker = self.get_host(host)
+        if not breaker.allow():
+            raise CircuitOpenException(host, breaker.retry_in())
+        if bucket is not None:
+            wait = bucket.reserve()
+            if wait > 0:
+                try:
+                    self._sleep(wait)
+                except BaseException:
+                    breaker.release()
+                    raise
+
+    def after_response(self, url, response):
+        bucket, breaker = self.get_host(urlparse(url).netloc)
+        if response.status_code in THROTTLE_STATUS_CODES and bucket is not None:
+            bucket.throttle(_retry_after(response))
+        elif bucket is not None:
+            bucket.recover()
+
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def after_error(self, url):
+        _, breaker = self.get_host(urlparse(url).netloc)
+        breaker.record_failure()
+
+    def release(self, url):
+        """
+        End a request that was neither answered nor failed at the transport, e.g. because of an invalid URL
+        """
+        _, breaker = self.get_host(urlparse(url).netloc)
+        breaker.release()
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None  # Missing, or an HTTP date which is not worth parsing for our purposes
+
+
+class LimitedAdapter(BaseAdapter):
+    """
+    Transport adapter that passes every request through a RateLimiter before sending it with another adapter.
+    """
+
+    def __init__(self, limiter, adapter):
+        super().__init__()
+        self.limiter = limiter
+        self.adapter = adapter
+
+    def send(self, request, **kwargs):
+        self.limiter.before_request(request.url)
+        recorded = False
+        try:
+            try:
+                response = self.adapter.send(request, **kwargs)
+            except (ConnectionError, Timeout):
+                recorded = True
+                self.limiter.after_error(request.url)
+                raise
+            recorded = True
+            self.limiter.after_response(request.url, response)
+            return response
+        finally:
+            if not recorded:
+                self.limiter.release(request.url)
+
+    def close(self):
+        self.adapter.close()
+
+
+_limiter = RateLimiter()
+
+
+def get_limiter():
+    return _limiter
+
+
+def set_limiter(limiter):
+    """
+    Replace the limiter used by the browsers created from now on
+    """
+    global _limiter
+    _limiter = limiter
+
+
+def attach(session, limiter=None):
+    """
+    Pass the requests of a session through a limiter
+    :param session: the requests session, e.g. the session of a StatefulBrowser
+    :param limiter: the limiter to use, defaults to the shared limiter
+    :return: the session
+    """
+    limiter = limiter or _limiter
+    for prefix in ('http://', 'https://'):
+        session.mount(prefix, LimitedAdapter(limiter, session.adapters[prefix]))
+    return session
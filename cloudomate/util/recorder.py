@@ -0,0 +1,231 @@
+"""Record and replay the HTTP conversations of hoster browsers
+
+Usage:
+
+Record the conversation of a run to a cassette file:
+with use_cassette('linevast_options.json', mode=RECORD):
+    LineVast.get_options()
+
+Replay it later without network access:
+with use_cassette('linevast_options.json', mode=REPLAY) as cassette:
+    LineVast.get_options()
+    print(cassette.play_count)
+
+Every browser created through Hoster._create_browser while a cassette is active is attached to it.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import base64
+import io
+import json
+import os
+import threading
+import time
+from builtins import object
+from builtins import open
+from contextlib import contextmanager
+
+from future import standard_library
+from requests import RequestException
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3 import HTTPResponse
+
+standard_library.install_aliases()
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# Headers that describe the transport encoding, which no longer applies to the stored body
+_TRANSPORT_HEADERS = ('content-encoding', 'transfer-encoding', 'content-length')
+
+_active_cassette = None
+
+
+class CassetteMissError(RequestException):
+    """Raised when a replayed request was not recorded in the cassette."""
+
+
+class Cassette(object):
+    """
+    Cassette stores an ordered list of HTTP interactions in a JSON file.
+    Requests are matched on method and URL; repeated requests are answered in recorded order.
+    """
+
+    def __init__(self, path, mode=REPLAY):
+        self.path = path
+        self.mode = mode
+        self.interactions = []
+        self.play_count = 0
+        self.transport_time = 0.0
+        self._positions = {}
+        self._lock = threading.Lock()
+        if mode == REPLAY:
+            self.load()
+
+    def load(self):
+        with open(self.path, 'r', encoding='utf-8') as cassette_file:
+            self.interactions = json.load(cassette_file)['interactions']
+
+    @property
+    def interactions(self):
+        return self._interactions
+
+    @interactions.setter
+    def interactions(self, interactions):
+        self._interactions = interactions
+        self._index = {}  # (method, url) to the interactions of that request in recorded order
+        for interaction in interactions:
+            self._index.setdefault(self._key(interaction), []).append(interaction)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(self.path, 'w', encoding='utf-8') as cassette_file:
+            cassette_file.write(json.dumps({'interactions': self.interactions}, indent=1, sort_keys=True))
+
+    def record(self, request, response, elapsed):
+        interaction = {
+            'request': {
+                'method': request.method,
+                'url': request.url,
+            },
+            'response': {
+                'status': response.status_code,
+                'reason': response.reason,
+                'headers': dict((key, value) for key, value in response.headers.items()
+                                if key.lower() not in _TRANSPORT_HEADERS),
+            },
+            'elapsed': elapsed,
+        }
+        interaction['response'].update(self._encode_body(response.content))
+        with self._lock:
+            self._interactions.append(interaction)
+            self._index.setdefault(self._key(interaction), []).append(interaction)
+            self.transport_time += elapsed
+
+    def play(self, request):
+        """
+        Find the next recorded interaction for a request
+        :param request: the prepared request
+        :return: the interaction dictionary
+        """
+        key = (request.method, request.url)
+        with self._lock:
+            position = self._positions.get(key, 0)
+            matches = self._index.get(key, [])
+            if position >= len(matches):
+                raise CassetteMissError('No recorded response for {} {}'.format(request.method, request.url))
+            self._positions[key] = position + 1
+            self.play_count += 1
+            return matches[position]
+
+    @staticmethod
+    def _key(interaction):
+        return interaction['request']['method'], interaction['request']['url']
+
+    @staticmethod
+    def _encode_body(content):
+        try:
+            return {'body': content.decode('utf-8'), 'encoding': 'utf-8'}
+        except UnicodeDecodeError:
+            return {'body': base64.b64encode(content).decode('ascii'), 'encoding': 'base64'}
+
+    @staticmethod
+    def decode_body(response):
+        if response['encoding'] == 'base64':
+            return base64.b64decode(response['body'])
+        return response['body'].encode('utf-8')
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    Transport adapter that sends requests through another adapter and records them to a cassette.
+    """
+
+    def __init__(self, cassette, adapter=None):
+        super(RecordingAdapter, self).__init__()
+        self.cassette = cassette
+        self.adapter = adapter or HTTPAdapter()
+
+    def send(self, request, **kwargs):
+        start = time.time()
+        response = self.adapter.send(request, **kwargs)
+        response.content  # Read the body before measuring
+        elapsed = time.time() - start
+        self.cassette.record(request, response, elapsed)
+        return response
+
+    def close(self):
+        self.adapter.close()
+
+
+class ReplayAdapter(HTTPAdapter):
+    """
+    Transport adapter that answers requests from a cassette without touching the network.
+    """
+
+    def __init__(self, cassette):
+        super(ReplayAdapter, self).__init__()
+        self.cassette = cassette
+
+    def send(self, request, **kwargs):
+        interaction = self.cassette.play(request)
+        response = interaction['response']
+        raw = HTTPResponse(
+            body=io.BytesIO(Cassette.decode_body(response)),
+            headers=response['headers'],
+            status=response['status'],
+            reason=response['reason'],
+            preload_content=False,
+            decode_content=False,
+        )
+        return self.build_response(request, raw)
+
+
+def attach(session, cassette=None):
+    """
+    Mount the adapter for a cassette on a requests session.
+    Recording wraps the adapters mounted before, such as the rate limited ones, while replaying replaces them.
+    :param session: the requests session, e.g. the session of a StatefulBrowser
+    :param cassette: the cassette to use, defaults to the active cassette
+    :return: the session
+    """
+    if cassette is None:
+        cassette = _active_cassette
+    if cassette is None:
+        return session
+
+    replay = ReplayAdapter(cassette) if cassette.mode != RECORD else None
+    for prefix in ('http://', 'https://'):
+        if replay is None:
+            session.mount(prefix, RecordingAdapter(cassette, session.adapters[prefix]))
+        else:
+            session.mount(prefix, replay)
+    return session
+
+
+def get_active_cassette():
+    return _active_cassette
+
+
+@contextmanager
+def use_cassette(path, mode=REPLAY):
+    """
+    Attach every hoster browser created inside the block to a cassette
+    :param path: path of the cassette file
+    :param mode: RECORD to record a live conversation, REPLAY to replay it offline
+    """
+    global _active_cassette
+    cassette = Cassette(path, mode)
+    previous = _active_cassette
+    _active_cassette = cassette
+    try:
+        yield cassette
+    finally:
+        _active_cassette = previous
+        if mode == RECORD:
+            cassette.save()
@@ -3,22 +3,29 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
+import copy
 from builtins import open
 from builtins import str
 from configparser import ConfigParser
 from configparser import NoOptionError
+from configparser import NoSectionError
 
 from appdirs import *
 from future import standard_library
 
 standard_library.install_aliases()
 
+PROFILE_SEPARATOR = '@'
+
 
 class Settings(object):
     def __init__(self):
         self.settings = ConfigParser()
         config_dir = user_config_dir()
         self._default_filename = os.path.join(config_dir, 'cloudomate.cfg')
+        self.profile_name = None
+        # Shared with the profile views: the compiled sections and the resolved profiles
+        self._cache = {}
 
     def read_settings(self, filename=None):
         """Read the settings object from a file.
@@ -32,9 +39,10 @@ class Settings(object):
             filename = self._default_filename
 
         if not os.path.exists(filename):
-            print("Config file: '%s' not found" % filename)
+            print("Config file: '%s' not found" % filename, file=sys.stderr)
             return False
         files = self.settings.read(filename, encoding='utf-8')
+        self._cache.clear()
         return len(files) > 0
 
     def save_settings(self, filename=None):
@@ -54,21 +62,62 @@ class Settings(object):
             print("Failed to write configuration to '{}', printing it to stdout:".format(filename), file=sys.stderr)
             self.settings.write(sys.stdout)
 
+    def for_profile(self, name):
+        """Get a view of these settings that reads the sections of a named profile first.
+
+        A section [user@alice] overrides the keys of [user] for the profile alice. The view shares the
+        parsed file with this object, so any number of identities can be used without parsing it again.
+        Settings put through the view are stored in the sections of the profile.
+
+        :param name: The name of the profile, None for the plain sections
+        :return: A Settings object for the profile
+        """
+        view = copy.copy(self)
+        view.profile_name = name
+        return view
+
+    def get_profile_names(self):
+        names = set(section.split(PROFILE_SEPARATOR, 1)[1] for section in self.settings.sections()
+                    if PROFILE_SEPARATOR in section)
+        return sorted(names)
+
+    def _compiled(self):
+        """Get all sections as dictionaries, interpolated once instead of on every lookup"""
+        compiled = self._cache.get('compiled')
+        if compiled is None:
+            compiled = dict((section, dict(self.settings.items(section))) for section in self.settings.sections())
+            self._cache['compiled'] = compiled
+        return compiled
+
+    def _lookup(self, section):
+        """Get the names of the sections to look in for a section, highest priority first"""
+        if self.profile_name:
+            return [section + PROFILE_SEPARATOR + self.profile_name, section]
+        return [section]
+
     def verify_options(self, options):
+        compiled = self._compiled()
         valid = True
         for section, keys in options.items():
-            if not self.settings.has_section(section):
+            if not any(name in compiled for name in self._lookup(section)):
                 print("Section {} does not exist".format(section))
                 valid = False
             else:
                 for key in keys:
-                    if not self.settings.has_option(section, key):
+                    if not self.has_key(section, key):
                         print("Setting {}.{} does not exist".format(section, key))
                         valid = False
         return valid
 
     def get(self, section, key):
-        return self.settings.get(section, key)
+        compiled = self._compiled()
+        key = self.settings.optionxform(key)
+        for name in self._lookup(section):
+            if key in compiled.get(name, ()):
+                return compiled[name][key]
+        if not any(name in compiled for name in self._lookup(section)):
+            raise NoSectionError(section)
+        raise NoOptionError(key, section)
 
     def get_merge(self, sections, key):
         """Get a value from a merge of specified sections.
@@ -78,22 +127,143 @@ class Settings(object):
         :return: The desired settings value
         """
         for section in sections:
-            if self.settings.has_option(section, key):
-                return self.settings.get(section, key)
+            if self.has_key(section, key):
+                return self.get(section, key)
         print("Setting {} does not exist in any of the given sections".format(key))
-        raise NoOptionError(sections[-1], key)
+        raise NoOptionError(key, sections[-1])
 
     def put(self, section, key, value):
+        # A profile view writes to the sections of its profile, leaving the other profiles as they are
+        section = self._lookup(section)[0]
         if not self.settings.has_section(section):
             self.settings.add_section(section)
 
         self.settings.set(section, key, str(value))
+        self._cache.clear()
 
     def has_key(self, section, key):
-        return self.settings.has_option(section, key)
+        compiled = self._compiled()
+        key = self.settings.optionxform(key)
+        return any(key in compiled.get(name, ()) for name in self._lookup(section))
 
     def has_key_merge(self, sections, key):
-        for section in sections:
-            if self.settings.has_option(section, key):
-                return True
-        raise False
+        return any(self.has_key(section, key) for section in sections)
+
+    def to_dict(self):
+        """Get the uninterpolated sections, with the sections of the selected profile merged into them.
+
+        :return: A dictionary of section name to a dictionary of settings
+        """
+        sections = {}
+        for section in self.settings.sections():
+            if PROFILE_SEPARATOR not in section:
+                sections[section] = dict(self.settings.items(section, raw=True))
+        if self.profile_name:
+            for section in self.settings.sections():
+                base, _, name = section.partition(PROFILE_SEPARATOR)
+                if name == self.profile_name:
+                    sections.setdefault(base, {}).update(self.settings.items(section, raw=True))
+        return sections
+
+    def profile(self, provider=None):
+        """Resolve the settings into an immutable Profile.
+
+        The sections of the selected profile override the plain sections, and the settings in the section of
+        the provider (e.g. [LineVast], matched case insensitively) override the settings with the same key in
+        the other sections. Profiles are resolved once and cached until the settings change.
+
+        :param provider: The name of the provider whose section overrides the others
+        :return: The resolved Profile
+        """
+        key = ('profile', provider.lower() if provider else None, self.profile_name)
+        profile = self._cache.get(key)
+        if profile is None:
+            profile = self._cache[key] = self._resolve(provider)
+        return profile
+
+    def _resolve(self, provider):
+        compiled = self._compiled()
+        bases = set(section.split(PROFILE_SEPARATOR, 1)[0] for section in compiled)
+        sections = {}
+        for base in bases:
+            values = {}
+            for name in reversed(self._lookup(base)):
+                values.update(compiled.get(name, {}))
+            sections[base] = values
+
+        overrides = {}
+        if provider:
+            for base in bases:
+                if base.lower() == provider.lower():
+                    overrides.update(sections[base])
+        for base, values in sections.items():
+            for key in values:
+                if key in overrides:
+                    values[key] = overrides[key]
+        return Profile(self.profile_name, provider,
+                       dict((base, ProfileSection(base, values)) for base, values in sections.items()))
+
+
+class ProfileSection(object):
+    """
+    ProfileSection holds the resolved settings of a section, accessible as attributes: profile.user.email
+    """
+    __slots__ = ('name', '_values')
+
+    def __init__(self, name, values):
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, '_values', dict(values))
+
+    def __getattr__(self, key):
+        try:
+            return self._values[key]
+        except KeyError:
+            raise AttributeError("Setting {}.{} does not exist".format(self.name, key))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Profiles can not be changed")
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def items(self):
+        return sorted(self._values.items())
+
+
+class Profile(object):
+    """
+    Profile holds the settings resolved for a provider and a named profile. It can be used in place of a
+    Settings object for reading.
+    """
+    __slots__ = ('name', 'provider', '_sections')
+
+    def __init__(self, name, provider, sections):
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'provider', provider)
+        object.__setattr__(self, '_sections', sections)
+
+    def __getattr__(self, section):
+        try:
+            return self._sections[section]
+        except KeyError:
+            raise AttributeError("Section {} does not exist".format(section))
+
+    def __setattr__(self, key, value):
+        raise AttributeError("Profiles can not be changed")
+
+    def sections(self):
+        return sorted(self._sections)
+
+    def get(self, section, key):
+        if section not in self._sections:
+            raise NoSectionError(section)
+        values = self._sections[section]
+        if key not in values:
+            raise NoOptionError(key, section)
+        return values.get(key)
+
+    def has_key(self, section, key):
+        return section in self._sections and key in self._sections[section]
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Parsing of the quantities and prices shown on the pages of hosters
+
+Every scraper reads sizes, connection speeds and prices from text such as "1024 MB", "1Gbps Port" or
+"$4.99 USD". The expressions are compiled once and the results are memoised per text, as a catalogue repeats
+the same strings for many options. Sizes are returned in GB and speeds in Gbps, the units of VpsOption and
+VpsStatus, where a KB is 1024 bytes.
+
+units.parse_gigabytes('512 MB')       # 0.5
+units.parse_gbps('100 Mbit/s')        # 0.1
+units.parse_price('€4,99 EUR')        # Price(amount=4.99, currency='EUR')
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import re
+from collections import namedtuple
+from functools import wraps
+
+from future import standard_library
+
+standard_library.install_aliases()
+
+MEMO_SIZE = 4096
+
+Price = namedtuple('Price', ['amount', 'currency'])  # Currency as ISO 4217 code, e.g. USD
+
+_NUMBER = r'(\d+(?:[.,]\d+)*)'
+_NUMBER_PATTERN = re.compile(_NUMBER)
+_SIZE_PATTERN = re.compile(_NUMBER + r'\s*([KMGTP]?)(?:i?B|bytes?)\b', re.IGNORECASE)
+_SPEED_PATTERN = re.compile(_NUMBER + r'\s*([KMGT])(?:bps|bit/s|bits/s|b/s|bit|bits)(?![a-z])', re.IGNORECASE)
+_PRICE_PATTERN = re.compile(r'([$€\xa3])?\s*' + _NUMBER + r'(?:\s*([A-Z]{3})\b)?(?:\s*([$€\xa3]))?')
+
+# Powers of 1024 relative to a GB, for sizes and powers of 1000 relative to a Gbps, for speeds
+_SIZE_EXPONENTS = {'': -3, 'K': -2, 'M': -1, 'G': 0, 'T': 1, 'P': 2}
+_SPEED_EXPONENTS = {'K': -2, 'M': -1, 'G': 0, 'T': 1}
+_CURRENCY_SYMBOLS = {'$': 'USD', '€': 'EUR', '\xa3': 'GBP'}
+
+
+def _memoised(parser):
+    """
+    Cache the results of a parser per arguments, forgetting all of them when MEMO_SIZE results are cached
+    """
+    memo = {}
+
+    @wraps(parser)
+    def parse(*args):
+        try:
+            return memo[args]
+        except KeyError:
+            pass
+        if len(memo) >= MEMO_SIZE:
+            memo.clear()
+        result = memo[args] = parser(*args)
+        return result
+
+    parse.memo = memo
+    return parse
+
+
+def _to_float(number):
+    """
+    Convert a number matched by _NUMBER, with a comma as decimal mark ("4,99") or as thousands separator
+    ("1,024.50")
+    """
+    if ',' in number and '.' not in number and re.match(r'^\d+,\d{1,2}$', number):
+        return float(number.replace(',', '.'))
+    number = number.replace(',', '')
+    if number.count('.') > 1:
+        number = number.replace('.', '')
+    return float(number)
+
+
+@_memoised
+def parse_number(text):
+    """
+    :return: the first number in the text as float
+    """
+    match = _NUMBER_PATTERN.search(text)
+    if match is None:
+        raise ValueError('No number in {!r}'.format(text))
+    return _to_float(match.group(1))
+
+
+def parse_int(text):
+    """
+    :return: the first number in the text as int
+    """
+    return int(parse_number(text))
+
+
+def to_gigabytes(value, unit):
+    """
+    :param unit: B, KB, MB, GB, TB or PB, case insensitive
+    """
+    prefix = unit.upper().rstrip('B').rstrip('I')
+    if prefix not in _SIZE_EXPONENTS:
+        raise ValueError('Unknown unit {}'.format(unit))
+    return float(value) * 1024.0 ** _SIZE_EXPONENTS[prefix]
+
+
+@_memoised
+def parse_gigabytes(text, default_unit=None):
+    """
+    :param default_unit: the unit of a number without unit, a ValueError is raised for such numbers if None
+    :return: the first size in the text in GB
+    """
+    match = _SIZE_PATTERN.search(text)
+    if match is not None:
+        return to_gigabytes(_to_float(match.group(1)), match.group(2) + 'B')
+    if default_unit is None:
+        raise ValueError('Unknown unit in string {}'.format(text))
+    return to_gigabytes(parse_number(text), default_unit)
+
+
+@_memoised
+def parse_gbps(text, default_unit='Gbps'):
+    """
+    :param default_unit: the unit of a number without unit
+    :return: the first connection speed in the text in Gbps
+    """
+    match = _SPEED_PATTERN.search(text)
+    if match is not None:
+        value, prefix = _to_float(match.group(1)), match.group(2).upper()
+    else:
+        value, prefix = parse_number(text), default_unit[0].upper()
+    if prefix not in _SPEED_EXPONENTS:
+        raise ValueError('Unknown unit in string {}'.format(text))
+    return value * 1000.0 ** _SPEED_EXPONENTS[prefix]
+
+
+@_memoised
+def parse_price(text, default_currency='USD'):
+    """
+    :param default_currency: the currency of a price without currency symbol or code
+    :return: the first Price in the text
+    """
+    match = _PRICE_PATTERN.search(text)
+    if match is None:
+        raise ValueError('No price in {!r}'.format(text))
+    symbol, number, code, suffix = match.groups()
+    currency = code or _CURRENCY_SYMBOLS.get(symbol or suffix) or default_currency
+    return Price(_to_float(number), currency)
@@ -8,23 +8,34 @@ from __future__ import unicode_literals
 import json
 import os
 import subprocess
-import sys
+from abc import abstractmethod, ABCMeta
 from builtins import object
 from builtins import str
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-from forex_python.bitcoin import BtcConverter
+import requests
 from future import standard_library
-from mechanicalsoup import StatefulBrowser
+from future.utils import with_metaclass
 
-standard_library.install_aliases()
+from cloudomate.util.cache import TimedCache
 
-if sys.version_info > (3, 0):
-    from urllib.request import urlopen
-else:
-    from urllib2 import urlopen
+standard_library.install_aliases()
 
-AVG_TX_SIZE = 226
+# Transaction size components in bytes for pay-to-pubkey-hash transactions
+TX_OVERHEAD_SIZE = 10
+TX_INPUT_SIZE = 148
+TX_OUTPUT_SIZE = 34
+AVG_TX_SIZE = TX_OVERHEAD_SIZE + TX_INPUT_SIZE + 2 * TX_OUTPUT_SIZE  # One input, payment and change output
 SATOSHI_TO_BTC = 0.00000001
+FEE_CACHE_TTL = 300
+RATE_CACHE_TTL = 60
+MAX_RATE_WORKERS = 8
+TICKER_URL = 'https://blockchain.info/ticker'
+COINDESK_URL = 'https://api.coindesk.com/v1/bpi/currentprice/{}.json'
+
+_session = requests.Session()
+_rate_cache = TimedCache(RATE_CACHE_TTL)
 
 
 def determine_currency(text):
@@ -45,32 +56,80 @@ def determine_currency(text):
 def get_rate(currency='USD'):
     """
     Return price of 1 currency in BTC
-    Supported currencies available at 
-    http://forex-python.readthedocs.io/en/latest/currencysource.html#list-of-supported-currency-codes
+    The rates come from the blockchain.info ticker, currencies it does not serve are fetched from CoinDesk with
+    blockchain.info as fallback, see get_rates
     :param currency: currency to convert to
     :return: conversion rate from currency to BTC
     """
     if currency is None:
         return None
-    b = BtcConverter()
-    factor = b.get_latest_price(currency)
-    if factor is None:
-        factor = 1.0 / fallback_get_rate(currency)
+    return get_rates([currency])[currency]
+
+
+def _fetch_rate(currency):
+    """
+    Fetch the rate of a single currency, used for currencies missing from the bulk ticker
+    """
+    factor = None
+    try:
+        response = _session.get(COINDESK_URL.format(currency), timeout=10)
+        if response.status_code == 200:
+            factor = (response.json().get('bpi') or {}).get(currency, {}).get('rate_float')
+    except (requests.RequestException, ValueError):
+        pass  # Use the fallback below
+    if not factor:
+        return fallback_get_rate(currency)
     return 1.0 / factor
 
 
 def fallback_get_rate(currency):
     # Sometimes the method above gets rate limited, in this case use
     # https: // blockchain.info / tobtc?currency = USD & value = 500
-    return float(urlopen('https://blockchain.info/tobtc?currency={0}&value=1'.format(currency)).read())
+    return float(_session.get('https://blockchain.info/tobtc?currency={0}&value=1'.format(currency), timeout=10).text)
+
+
+def _fetch_ticker_rates():
+    """
+    Fetch the rates of all currencies supported by the blockchain.info ticker in a single request
+    :return: conversion rates from currencies to BTC
+    """
+    response = _session.get(TICKER_URL, timeout=10)
+    response.raise_for_status()
+    return {currency: 1.0 / float(price['last']) for currency, price in response.json().items()
+            if float(price['last']) > 0}
 
 
 def get_rates(currencies):
     """
     Return rates for all currencies to BTC.
+    All rates are fetched in one ticker request; currencies the ticker does not serve are fetched concurrently.
     :return: conversion rates from currencies to BTC
     """
-    rates = {cur: get_rate(cur) for cur in currencies}
+    rates = {}
+    missing = []
+    for currency in set(currencies):
+        rate = None if currency is None else _rate_cache.get(currency)
+        if currency is None or rate is not None:
+            rates[currency] = rate
+        else:
+            missing.append(currency)
+
+    if missing:
+        try:
+            ticker = _fetch_ticker_rates()
+        except (requests.RequestException, ValueError):
+            ticker = {}
+        for currency in missing:
+            if currency in ticker:
+                rates[currency] = ticker[currency]
+                _rate_cache.put(currency, ticker[currency])
+
+        remaining = [currency for currency in missing if currency not in ticker]
+        if remaining:
+            with ThreadPoolExecutor(max_workers=min(len(remaining), MAX_RATE_WORKERS)) as executor:
+                for currency, rate in zip(remaining, executor.map(_fetch_rate, remaining)):
+                    rates[currency] = rate
+                    _rate_cache.put(currency, rate)
     return rates
 
 
@@ -85,22 +144,138 @@ def get_price(amount, currency='USD'):
     return price
 
 
-def _get_network_cost(speed):
-    br = StatefulBrowser(user_agent='Firefox')
-    page = br.open('https://bitcoinfees.21.co/api/v1/fees/recommended')
-    response = page.json()
-    satoshirate = float(response[speed])
-    return satoshirate
+def estimate_tx_size(inputs=1, outputs=2):
+    """
+    Estimate the size of a transaction from its shape
+    :param inputs: number of inputs spent by the transaction
+    :param outputs: number of outputs created by the transaction
+    :return: estimated size in bytes
+    """
+    return TX_OVERHEAD_SIZE + inputs * TX_INPUT_SIZE + outputs * TX_OUTPUT_SIZE
+
+
+class FeeEstimator(with_metaclass(ABCMeta)):
+    """
+    FeeEstimator is the common interface of the network fee rate sources.
+    """
 
+    @abstractmethod
+    def get_fee_rate(self, speed):
+        """Get the recommended fee rate.
 
-def get_network_fee(speed='halfHourFee'):
+        :param speed: the confirmation speed, for example halfHourFee
+        :return: Returns the fee rate in satoshi per byte
+        """
+        pass
+
+
+class RecommendedFeesEstimator(FeeEstimator):
     """
-    Give an estimate of network fee for the average bitcoin transaction for given speed.
+    Retrieves fee rates from an API serving the bitcoinfees recommended fees format,
+    e.g. {"fastestFee": 40, "halfHourFee": 20, "hourFee": 10}.
+    """
+    BITCOINFEES_URL = 'https://bitcoinfees.21.co/api/v1/fees/recommended'
+    MEMPOOL_URL = 'https://mempool.space/api/v1/fees/recommended'
+
+    def __init__(self, url=BITCOINFEES_URL):
+        self.url = url
+
+    def get_fee_rate(self, speed):
+        response = _session.get(self.url, timeout=10)
+        response.raise_for_status()
+        return float(response.json()[speed])
+
+
+class ElectrumFeeEstimator(FeeEstimator):
+    """
+    Uses the fee estimate of the local Electrum daemon, which does not distinguish between speeds.
+    """
+
+    def __init__(self, wallet_handler):
+        self._wallet_handler = wallet_handler
+
+    def get_fee_rate(self, speed):
+        return self._wallet_handler.get_fee_rate()
+
+
+class StaticFeeEstimator(FeeEstimator):
+    """
+    Always returns the same fee rate, useful as a last resort or for testing.
+    """
+
+    def __init__(self, fee_rate):
+        self.fee_rate = fee_rate
+
+    def get_fee_rate(self, speed):
+        return self.fee_rate
+
+
+class CachedFeeEstimator(FeeEstimator):
+    """
+    Asks a list of estimators in order until one succeeds and caches the result per speed.
+    """
+
+    def __init__(self, estimators, ttl=FEE_CACHE_TTL):
+        self.estimators = list(estimators)
+        self._cache = TimedCache(ttl)
+
+    def get_fee_rate(self, speed):
+        rate = self._cache.get(speed)
+        if rate is not None:
+            return rate
+
+        error = None
+        for estimator in self.estimators:
+            try:
+                rate = estimator.get_fee_rate(speed)
+            except (requests.RequestException, subprocess.CalledProcessError, KeyError, ValueError) as e:
+                error = e
+                continue
+            self._cache.put(speed, rate)
+            return rate
+        raise ValueError('No fee estimator could provide a fee rate for {0}: {1}'.format(speed, error))
+
+    def clear(self):
+        self._cache.clear()
+
+
+_fee_estimator = CachedFeeEstimator([
+    RecommendedFeesEstimator(RecommendedFeesEstimator.BITCOINFEES_URL),
+    RecommendedFeesEstimator(RecommendedFeesEstimator.MEMPOOL_URL),
+])
+
+
+def get_fee_estimator():
+    return _fee_estimator
+
+
+def set_fee_estimator(estimator):
+    """
+    Replace the fee estimator used by get_network_fee
+    :param estimator: a FeeEstimator
+    """
+    global _fee_estimator
+    _fee_estimator = estimator
+
+
+def _get_network_cost(speed, estimator=None):
+    if estimator is None:
+        estimator = _fee_estimator
+    return estimator.get_fee_rate(speed)
+
+
+def get_network_fee(speed='halfHourFee', inputs=1, outputs=2, estimator=None):
+    """
+    Give an estimate of network fee for a bitcoin transaction of the given shape for given speed.
     Supported speeds are available at https://bitcoinfees.21.co/api/v1/fees/recommended
+    :param speed: the confirmation speed
+    :param inputs: number of inputs spent by the transaction
+    :param outputs: number of outputs created by the transaction
+    :param estimator: FeeEstimator to use, defaults to the module wide estimator
     :return: network cost
     """
-    network_fee = _get_network_cost(speed) * SATOSHI_TO_BTC
-    return network_fee * AVG_TX_SIZE
+    network_fee = _get_network_cost(speed, estimator) * SATOSHI_TO_BTC
+    return network_fee * estimate_tx_size(inputs, outputs)
 
 
 class Wallet(object):
@@ -118,6 +293,8 @@ class Wallet(object):
                 wallet_command = ['/usr/bin/env', 'electrum']
         self.command = wallet_command
         self.wallet_handler = ElectrumWalletHandler(wallet_command, wallet_path)
+        self.fee_estimator = CachedFeeEstimator([ElectrumFeeEstimator(self.wallet_handler), _fee_estimator])
+        self._address_index = None
 
     def get_balance(self, confirmed=True, unconfirmed=True):
         """
@@ -157,6 +334,41 @@ class Wallet(object):
         address_output = self.wallet_handler.get_addresses()
         return address_output
 
+    def get_address_index(self, refresh=False):
+        """
+        Return the address index of the default electrum wallet, built on the first call
+        :param refresh: add the new addresses of the wallet and update the usage of the unused ones first
+        :return: AddressIndex of the wallet
+        """
+        if self._address_index is None:
+            self._address_index = AddressIndex(self.wallet_handler)
+            self._address_index.refresh()
+        elif refresh:
+            self._address_index.refresh()
+        return self._address_index
+
+    def get_network_fee(self, amount, speed='halfHourFee'):
+        """
+        Estimate the network fee for paying amount, sized by the coins the wallet would have to spend.
+        If the coins cannot be listed, a transaction spending a single coin is assumed.
+        :param amount: amount of bitcoins to be transferred
+        :param speed: the confirmation speed
+        :return: network fee in bitcoins
+        """
+        try:
+            values = sorted((float(coin['value']) for coin in self.wallet_handler.get_unspent()), reverse=True)
+        except (subprocess.CalledProcessError, KeyError, TypeError, ValueError) as e:
+            print('Failed to list the unspent coins of the wallet, assuming a single input: {0}'.format(e))
+            values = []
+        inputs = 0
+        total = 0.0
+        for value in values:
+            if total >= amount:
+                break
+            total += value
+            inputs += 1
+        return get_network_fee(speed, inputs=max(inputs, 1), outputs=2, estimator=self.fee_estimator)
+
     def pay(self, address, amount, fee=None):
         tx_fee = 0 if fee is None else fee
         if self.get_balance() < amount + tx_fee:
@@ -175,6 +387,80 @@ class Wallet(object):
         return transaction_hash
 
 
+class AddressIndex(object):
+    """
+    AddressIndex keeps the addresses of a wallet in memory for constant time ownership and usage lookups.
+    Refreshing only processes new addresses and addresses that were unused, as used addresses stay used.
+    Balances are cached until the next refresh, as the balance of any address changes with new transactions.
+    """
+
+    def __init__(self, wallet_handler):
+        self._wallet_handler = wallet_handler
+        self._used = {}  # Maps every known address to whether it has been used
+        self._unused = OrderedDict()  # Unused addresses in wallet order
+        self._balances = {}
+
+    def refresh(self):
+        """
+        Add new addresses of the wallet to the index and update the addresses that were unused
+        :return: list of addresses that were added
+        """
+        self._balances.clear()
+        new_addresses = [address for address in self._wallet_handler.get_addresses() if address not in self._used]
+        if not new_addresses and not self._unused:
+            return []
+
+        unused = set(self._wallet_handler.get_addresses(unused=True))
+        for address in list(self._unused):
+            if address not in unused:
+                self._mark_used(address)
+        for address in new_addresses:
+            if address in unused:
+                self._used[address] = False
+                self._unused[address] = None
+            else:
+                self._used[address] = True
+        return new_addresses
+
+    def is_mine(self, address):
+        return address in self._used
+
+    def is_used(self, address):
+        """
+        :return: whether the address has been used, None if it is not in the wallet
+        """
+        return self._used.get(address)
+
+    def next_unused(self):
+        """
+        :return: the first unused address of the wallet, None if there is none
+        """
+        for address in self._unused:
+            return address
+        return None
+
+    def get_balance(self, address):
+        """
+        Return the confirmed and unconfirmed balance of an address, fetched once until the next refresh
+        :param address: address of the wallet
+        :return: balance in bitcoins
+        """
+        if address not in self._balances:
+            balance = self._wallet_handler.get_address_balance(address)
+            self._balances[address] = float(balance.get('confirmed', 0.0)) + float(balance.get('unconfirmed', 0.0))
+        return self._balances[address]
+
+    def _mark_used(self, address):
+        self._used[address] = True
+        del self._unused[address]
+
+    def __contains__(self, address):
+        return self.is_mine(address)
+
+    def __len__(self):
+        return len(self._used)
+
+
 class ElectrumWalletHandler(object):
     """
     ElectrumWalletHandler ensures the correct opening and closing of the electrum wallet daemon
@@ -241,15 +527,44 @@ class ElectrumWalletHandler(object):
         balance_dict = json.loads(output)
         return balance_dict
 
-    def get_addresses(self):
+    def get_addresses(self, unused=False):
         """
         Return the list of addresses of default wallet
+        :param unused: only return addresses without transactions
         :return: 
         """
-        address = self._command(['listaddresses'])
+        command = ['listaddresses']
+        if unused:
+            command.append('--unused')
+        address = self._command(command)
         addr = json.loads(address)
         return addr
 
+    def get_address_balance(self, address):
+        """
+        Return the balance of a single address
+        :param address: address of the wallet
+        :return: dictionary with the confirmed and unconfirmed balance
+        """
+        balance = self._command(['getaddressbalance', str(address)])
+        return json.loads(balance)
+
+    def get_unspent(self):
+        """
+        Return the list of unspent outputs of default wallet
+        :return:
+        """
+        unspent = self._command(['listunspent'])
+        return json.loads(unspent)
+
+    def get_fee_rate(self):
+        """
+        Return the fee rate estimated by the electrum daemon
+        :return: fee rate in satoshi per byte
+        """
+        fee_rate = self._command(['getfeerate'])
+        return float(json.loads(fee_rate)) / 1000
+
     def _command(self, c, output=True):
         command = self.command + c
         if self._wallet_path is not None:
@@ -58,7 +58,6 @@ setup(
         'lxml',
         'MechanicalSoup',
         'bs4',
-        'forex-python',
         'parameterized',
         'fake-useragent',
         'CaseInsensitiveDict',